@@ -0,0 +1,527 @@
+#!/usr/bin/env python
+
+# Copyright 2015 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+#
+
+"""Benchmark the guest agent backup and restore data path.
+
+A synthetic backup of the requested size is streamed through
+BackupAgent.stream_backup_to_storage, the Swift StreamReader and
+RestoreRunner._unpack against a local fake of the Swift object store, once
+for every combination of chunk and segment size given. For each run the
+throughput, CPU time and peak RSS of the backup and restore phases are
+reported, along with the throughput of every in-process stream stage.
+
+Every run is done in a forked child so the peak RSS of one run does not
+hide the next. The CPU time of the commands run by the backup and restore
+runners (cat, gzip, openssl, ...) is reported separately.
+
+Example:
+
+    tools/with_venv.sh python tools/backup_benchmark.py --size 1G \\
+        --chunk-size 64K --chunk-size 1M --segment-size 256M \\
+        --compression gzip --stream-pipeline --encrypt
+"""
+
+import argparse
+import errno
+import hashlib
+import json
+import os
+import pipes
+import resource
+import shutil
+import sys
+import tempfile
+import time
+
+import mock
+
+from trove.guestagent.backup import backupagent
+from trove.guestagent.strategies.backup import base as backup_base
+from trove.guestagent.strategies.restore import base as restore_base
+from trove.guestagent.strategies.storage import swift
+
+MiB = 1024 ** 2
+SIZE_SUFFIXES = {'K': 1024, 'M': MiB, 'G': 1024 ** 3}
+# Chunk size swiftclient reads an upload body with if none is given
+SWIFTCLIENT_CHUNK_SIZE = 65536
+
+
+def parse_size(value):
+    """Parse a size such as 512, 64K, 16M or 2G into bytes."""
+    value = value.strip().upper()
+    multiplier = SIZE_SUFFIXES.get(value[-1:], 1)
+    if value[-1:] in SIZE_SUFFIXES:
+        value = value[:-1]
+    try:
+        return int(value) * multiplier
+    except ValueError:
+        raise argparse.ArgumentTypeError("Invalid size: %s" % value)
+
+
+def format_size(size):
+    for suffix, multiplier in sorted(SIZE_SUFFIXES.items(),
+                                     key=lambda item: -item[1]):
+        if size >= multiplier and not size % multiplier:
+            return '%d%s' % (size // multiplier, suffix)
+    return str(size)
+
+
+class MemoryObjectStore(object):
+    """Objects kept in memory, keyed by container and name."""
+
+    def __init__(self):
+        self.objects = {}
+        self.headers = {}
+        # Time spent storing and retrieving object data
+        self.write_time = 0.0
+        self.read_time = 0.0
+
+    def write(self, container, name, chunks):
+        data = []
+        for chunk in chunks:
+            start = time.time()
+            data.append(chunk)
+            self.write_time += time.time() - start
+        self.objects[(container, name)] = ''.join(data)
+
+    def read(self, container, name, chunk_size):
+        data = self.objects[(container, name)]
+        for offset in range(0, len(data), chunk_size):
+            start = time.time()
+            chunk = data[offset:offset + chunk_size]
+            self.read_time += time.time() - start
+            yield chunk
+
+    def size(self, container, name):
+        return len(self.objects[(container, name)])
+
+    def names(self, container):
+        return [name for (_container, name) in self.objects
+                if _container == container]
+
+
+class FileObjectStore(MemoryObjectStore):
+    """Objects written to files below a directory."""
+
+    def __init__(self, root):
+        super(FileObjectStore, self).__init__()
+        self.root = root
+
+    def _path(self, container, name):
+        return os.path.join(self.root, container, name.replace('/', '%2F'))
+
+    def write(self, container, name, chunks):
+        path = self._path(container, name)
+        if not os.path.isdir(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        with open(path, 'wb') as f:
+            for chunk in chunks:
+                start = time.time()
+                f.write(chunk)
+                self.write_time += time.time() - start
+            start = time.time()
+            os.fsync(f.fileno())
+            self.write_time += time.time() - start
+        self.objects[(container, name)] = path
+
+    def read(self, container, name, chunk_size):
+        with open(self.objects[(container, name)], 'rb') as f:
+            while True:
+                start = time.time()
+                chunk = f.read(chunk_size)
+                self.read_time += time.time() - start
+                if not chunk:
+                    break
+                yield chunk
+
+    def size(self, container, name):
+        return os.path.getsize(self.objects[(container, name)])
+
+
+class FakeSwiftConnection(object):
+    """The subset of swiftclient.client.Connection used by SwiftStorage.
+
+    Objects with an X-Object-Manifest header behave like Swift dynamic large
+    objects: they are read as the concatenation of the segments below the
+    manifest prefix and their etag is the md5 of the segment etags.
+    """
+
+    url = 'http://benchmark/v1/AUTH_benchmark'
+
+    def __init__(self, store):
+        self.store = store
+
+    def put_container(self, container):
+        pass
+
+    def put_object(self, container, obj, contents, headers=None,
+                   chunk_size=None):
+        checksum = hashlib.md5()
+
+        def _chunks():
+            if hasattr(contents, 'read'):
+                read_size = chunk_size or SWIFTCLIENT_CHUNK_SIZE
+                for chunk in iter(lambda: contents.read(read_size), ''):
+                    checksum.update(chunk)
+                    yield chunk
+            elif contents:
+                checksum.update(contents)
+                yield contents
+
+        self.store.write(container, obj, _chunks())
+        self.store.headers[(container, obj)] = dict(
+            (key.lower(), value) for key, value in (headers or {}).items())
+        return checksum.hexdigest()
+
+    def post_object(self, container, obj, headers):
+        self.store.headers[(container, obj)] = dict(
+            (key.lower(), value) for key, value in headers.items())
+
+    def _segments(self, manifest):
+        container, prefix = manifest.split('/', 1)
+        headers, listing = self.get_container(container, prefix=prefix)
+        return container, listing
+
+    def head_object(self, container, obj):
+        headers = dict(self.store.headers[(container, obj)])
+        manifest = headers.get('x-object-manifest')
+        if manifest:
+            segment_container, listing = self._segments(manifest)
+            etag = hashlib.md5(''.join(segment['hash']
+                                       for segment in listing))
+            headers['etag'] = '"%s"' % etag.hexdigest()
+            headers['content-length'] = sum(segment['bytes']
+                                            for segment in listing)
+        else:
+            etag = hashlib.md5()
+            for chunk in self.store.read(container, obj, MiB):
+                etag.update(chunk)
+            headers['etag'] = etag.hexdigest()
+            headers['content-length'] = self.store.size(container, obj)
+        return headers
+
+    def get_object(self, container, obj, resp_chunk_size=None):
+        headers = self.head_object(container, obj)
+        chunk_size = resp_chunk_size or MiB
+        manifest = headers.get('x-object-manifest')
+        if manifest:
+            segment_container, listing = self._segments(manifest)
+            body = (chunk for segment in listing
+                    for chunk in self.store.read(segment_container,
+                                                 segment['name'],
+                                                 chunk_size))
+        else:
+            body = self.store.read(container, obj, chunk_size)
+        return headers, body
+
+    def get_container(self, container, prefix='', full_listing=False):
+        listing = []
+        for name in sorted(self.store.names(container)):
+            if name.startswith(prefix):
+                etag = hashlib.md5()
+                for chunk in self.store.read(container, name, MiB):
+                    etag.update(chunk)
+                listing.append({'name': name,
+                                'hash': etag.hexdigest(),
+                                'bytes': self.store.size(container, name)})
+        return {}, listing
+
+
+class SyntheticBackup(backup_base.BackupRunner):
+    """Stream a pre-generated file through the backup pipeline."""
+    __strategy_name__ = 'syntheticbackup'
+
+    source = None
+    last_run = None
+
+    @property
+    def cmd(self):
+        return ('cat %s' % pipes.quote(self.source) +
+                self.zip_cmd + self.encrypt_cmd)
+
+    def _run(self):
+        super(SyntheticBackup, self)._run()
+        SyntheticBackup.last_run = self
+
+
+class SyntheticRestore(restore_base.RestoreRunner):
+    """Checksum the restored stream instead of writing it out."""
+    __strategy_name__ = 'syntheticrestore'
+    base_restore_cmd = 'md5sum > %(restore_location)s/restored.md5'
+
+    stream_stats = None
+
+    def _log_stream_stats(self, stream):
+        super(SyntheticRestore, self)._log_stream_stats(stream)
+        if hasattr(stream, 'stats'):
+            SyntheticRestore.stream_stats = stream.stats()
+
+
+def generate_source(path, size, compressible):
+    """Write size bytes of data, the compressible fraction of which is a
+    repeated pattern and the rest random. Returns the md5 of the data.
+    """
+    checksum = hashlib.md5()
+    pattern = os.urandom(256) * (MiB // 256)
+    with open(path, 'wb') as f:
+        remaining = size
+        while remaining:
+            block = min(remaining, MiB)
+            repeated = int(block * compressible)
+            data = pattern[:repeated] + os.urandom(block - repeated)
+            checksum.update(data)
+            f.write(data)
+            remaining -= block
+    return checksum.hexdigest()
+
+
+def _reap_children():
+    """Wait for the commands run by the runners so their CPU time counts.
+
+    Neither runner waits for its command to exit once the stream is done.
+    """
+    while True:
+        try:
+            os.waitpid(-1, 0)
+        except OSError as e:
+            if e.errno == errno.ECHILD:
+                return
+            raise
+
+
+def _rss():
+    """Current resident set size in bytes (Linux only, else 0)."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * resource.getpagesize()
+    except (IOError, IndexError, ValueError):
+        return 0
+
+
+def _usage():
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return {'wall': time.time(),
+            'user': own.ru_utime,
+            'sys': own.ru_stime,
+            'children': children.ru_utime + children.ru_stime}
+
+
+def _measure(start, size):
+    _reap_children()
+    end = _usage()
+    result = dict((key, end[key] - start[key]) for key in start)
+    result['throughput'] = (size / result['wall'] / MiB
+                            if result['wall'] else 0.0)
+    # ru_maxrss is in kilobytes on Linux
+    result['peak_rss'] = (resource.getrusage(
+        resource.RUSAGE_SELF).ru_maxrss * 1024)
+    return result
+
+
+def run_once(args, workdir, source, source_checksum, chunk_size,
+             segment_size):
+    """Back up and restore the source once; returns the measurements."""
+    if args.store == 'file':
+        store = FileObjectStore(os.path.join(workdir, 'store'))
+    else:
+        store = MemoryObjectStore()
+
+    SyntheticBackup.source = source
+    for runner in (SyntheticBackup, SyntheticRestore):
+        runner.compression = args.compression
+        runner.is_zipped = args.compression != 'none'
+        runner.is_encrypted = args.encrypt
+        runner.use_stream_pipeline = args.stream_pipeline
+    SyntheticBackup.compression_level = args.compression_level
+    SyntheticBackup.compression_threads = args.compression_threads
+    SyntheticRestore.compression_threads = args.compression_threads
+
+    restore_location = os.path.join(workdir, 'restore')
+    os.mkdir(restore_location)
+    # A forked child starts out with the peak RSS of its parent
+    start_rss = _rss()
+
+    with mock.patch.multiple(
+            swift,
+            CHUNK_SIZE=chunk_size,
+            MAX_FILE_SIZE=segment_size,
+            UPLOAD_CONCURRENCY=args.upload_concurrency,
+            DOWNLOAD_CONCURRENCY=args.download_concurrency,
+            create_swift_client=lambda context: FakeSwiftConnection(store)):
+        with mock.patch.object(backupagent, 'conductor_api'), \
+                mock.patch.object(backupagent, 'get_filesystem_volume_stats',
+                                  return_value={'used': 0.0}):
+            storage = swift.SwiftStorage(None)
+            agent = backupagent.BackupAgent()
+            backup_info = {'id': 'benchmark',
+                           'datastore': 'benchmark',
+                           'datastore_version': 'benchmark'}
+
+            start = _usage()
+            agent.stream_backup_to_storage(None, backup_info,
+                                           SyntheticBackup, storage,
+                                           extra_opts='')
+            backup = _measure(start, args.size)
+            stream = SyntheticBackup.last_run.stream
+            backup['stages'] = stream.stats() if stream else []
+            backup['store'] = store.write_time
+            segments = [name for name in store.names(swift.BACKUP_CONTAINER)
+                        if name.startswith('benchmark_')]
+
+            location = '%s/%s/%s' % (FakeSwiftConnection.url,
+                                     swift.BACKUP_CONTAINER,
+                                     SyntheticBackup.last_run.manifest)
+            checksum = storage.connection.head_object(
+                swift.BACKUP_CONTAINER,
+                SyntheticBackup.last_run.manifest)['etag'].strip('"')
+            metadata = storage.load_metadata(location, checksum)
+
+            start = _usage()
+            restore = SyntheticRestore(
+                storage, location=location, checksum=checksum,
+                restore_location=restore_location,
+                compression=metadata.get('compression'))
+            restore.restore()
+            restored = _measure(start, args.size)
+            restored['stages'] = SyntheticRestore.stream_stats or []
+            restored['store'] = store.read_time
+
+    with open(os.path.join(restore_location, 'restored.md5')) as f:
+        verified = f.read().split()[0] == source_checksum
+
+    return {'chunk_size': chunk_size,
+            'segment_size': segment_size,
+            'segments': len(segments),
+            'start_rss': start_rss,
+            'verified': verified,
+            'backup': backup,
+            'restore': restored}
+
+
+def run_in_child(*args):
+    """Run a benchmark in a forked child to measure its own peak RSS."""
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if not pid:
+        os.close(read_fd)
+        try:
+            result = run_once(*args)
+        except Exception as e:
+            result = {'error': '%s: %s' % (type(e).__name__, e)}
+        with os.fdopen(write_fd, 'w') as f:
+            json.dump(result, f)
+        os._exit(0)
+
+    os.close(write_fd)
+    with os.fdopen(read_fd) as f:
+        result = json.load(f)
+    os.waitpid(pid, 0)
+    return result
+
+
+def report(result):
+    if 'error' in result:
+        print("chunk %-6s segment %-6s  FAILED: %s" % (
+            format_size(result['chunk_size']),
+            format_size(result['segment_size']), result['error']))
+        return
+    print("chunk %-6s segment %-6s segments %-5d verified %-5s "
+          "start RSS %.1f MB" % (
+              format_size(result['chunk_size']),
+              format_size(result['segment_size']),
+              result['segments'], result['verified'],
+              result['start_rss'] / float(MiB)))
+    for phase in ('backup', 'restore'):
+        stats = result[phase]
+        print("  %-8s %8.2f MB/s  wall %7.2fs  user %7.2fs  sys %7.2fs  "
+              "commands %7.2fs  store %7.2fs  peak RSS %7.1f MB" % (
+                  phase, stats['throughput'], stats['wall'], stats['user'],
+                  stats['sys'], stats['children'], stats['store'],
+                  stats['peak_rss'] / float(MiB)))
+        for stage in stats['stages']:
+            print("    %-12s %8.2f MB/s  %7.2fs  %d bytes in, %d bytes out"
+                  % (stage['stage'], stage['throughput'], stage['elapsed'],
+                     stage['bytes_in'], stage['bytes_out']))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Benchmark the backup and restore data path.')
+    parser.add_argument('--size', type=parse_size, default=parse_size('256M'),
+                        help='Size of the synthetic backup (default 256M).')
+    parser.add_argument('--compressible', type=float, default=0.5,
+                        help='Fraction of the data that compresses well '
+                             '(default 0.5).')
+    parser.add_argument('--chunk-size', type=parse_size, action='append',
+                        help='backup_chunk_size to run with; may be given '
+                             'several times (default 64K).')
+    parser.add_argument('--segment-size', type=parse_size, action='append',
+                        help='backup_segment_max_size to run with; may be '
+                             'given several times (default 2G).')
+    parser.add_argument('--store', choices=('memory', 'file'),
+                        default='memory',
+                        help='Keep the fake Swift objects in memory or in '
+                             'files below --workdir (default memory).')
+    parser.add_argument('--workdir',
+                        help='Directory for the source data and the file '
+                             'store (default a temporary directory).')
+    parser.add_argument('--compression', default='gzip',
+                        help='Compression codec (default gzip).')
+    parser.add_argument('--compression-level', type=int)
+    parser.add_argument('--compression-threads', type=int)
+    parser.add_argument('--encrypt', action='store_true',
+                        help='Encrypt the backup stream.')
+    parser.add_argument('--stream-pipeline', action='store_true',
+                        help='Compress and encrypt in process.')
+    parser.add_argument('--upload-concurrency', type=int, default=1)
+    parser.add_argument('--download-concurrency', type=int, default=1)
+    parser.add_argument('--json', action='store_true',
+                        help='Print the results as JSON.')
+    args = parser.parse_args()
+
+    chunk_sizes = args.chunk_size or [parse_size('64K')]
+    segment_sizes = args.segment_size or [parse_size('2G')]
+
+    workdir = tempfile.mkdtemp(dir=args.workdir, prefix='backup-benchmark-')
+    try:
+        source = os.path.join(workdir, 'source.dat')
+        source_checksum = generate_source(source, args.size,
+                                          args.compressible)
+        results = []
+        for segment_size in segment_sizes:
+            for chunk_size in chunk_sizes:
+                run_dir = tempfile.mkdtemp(dir=workdir)
+                result = run_in_child(args, run_dir, source,
+                                      source_checksum, chunk_size,
+                                      segment_size)
+                result.update(chunk_size=chunk_size,
+                              segment_size=segment_size)
+                shutil.rmtree(run_dir)
+                results.append(result)
+                if not args.json:
+                    report(result)
+        if args.json:
+            print(json.dumps(results, indent=2, sort_keys=True))
+    finally:
+        shutil.rmtree(workdir)
+
+    return 0 if all(result.get('verified') for result in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
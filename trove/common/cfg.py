@@ -121,6 +121,19 @@ common_opts = [
                help='Page size for listing databases.'),
     cfg.IntOpt('instances_page_size', default=20,
                help='Page size for listing instances.'),
+    cfg.IntOpt('instances_server_cache_ttl', default=0,
+               help='Seconds the API caches the Nova servers of a tenant for '
+               'instance listings. The servers are listed again once an '
+               'instance of the listing has been updated, e.g. by the '
+               'taskmanager, but server status changes made in Nova alone '
+               'can show up this much later, so keep it short. 0 lists the '
+               'servers for every request.'),
+    cfg.IntOpt('flavor_cache_ttl', default=300,
+               help='Seconds a Nova flavor looked up by id is cached for. '
+               '0 looks flavors up every time.'),
+    cfg.IntOpt('flavor_cache_size', default=1000,
+               help='Maximum number of Nova flavors kept in the flavor '
+               'cache of each service.'),
     cfg.IntOpt('clusters_page_size', default=20,
                help='Page size for listing clusters.'),
     cfg.IntOpt('backups_page_size', default=20,
@@ -143,16 +156,45 @@ common_opts = [
     cfg.IntOpt('agent_replication_snapshot_timeout', default=36000,
                help='Maximum time (in seconds) to wait for taking a Guest '
                     'Agent replication snapshot.'),
+    cfg.IntOpt('agent_call_concurrency', default=20,
+               help='Maximum number of Guest Agents a single operation calls '
+                    'at the same time when it makes the same request to '
+                    'many instances.'),
+    cfg.IntOpt('replica_failover_concurrency', default=10,
+               help='Maximum number of replicas the Taskmanager switches to '
+                    'a new replication source at the same time during '
+                    'promote-to-replica-source and eject-replica-source.'),
+    cfg.IntOpt('replica_create_concurrency', default=1,
+               help='Maximum number of replicas the Taskmanager provisions '
+                    'at the same time when several replicas are created '
+                    'from one snapshot. The snapshot is taken first, then '
+                    'all replicas, the first one included, are provisioned '
+                    'from it.'),
     # The guest_id opt definition must match the one in cmd/guest.py
     cfg.StrOpt('guest_id', default=None, help="ID of the Guest Instance."),
     cfg.IntOpt('state_change_wait_time', default=3 * 60,
                help='Maximum time (in seconds) to wait for a state change.'),
     cfg.IntOpt('agent_heartbeat_time', default=10,
-               help='Maximum time (in seconds) for the Guest Agent to reply '
-                    'to a heartbeat request.'),
+               deprecated_for_removal=True,
+               help='Deprecated and unused. Whether a guest is reachable is '
+                    'decided by agent_heartbeat_expiry and '
+                    'agent_keepalive_max_interval.'),
     cfg.IntOpt('agent_heartbeat_expiry', default=60,
                help='Time (in seconds) after which a guest is considered '
                     'unreachable'),
+    cfg.IntOpt('agent_keepalive_max_interval', default=300,
+               help='Maximum time (in seconds) between two heartbeats of a '
+                    'Guest Agent whose status does not change. Status '
+                    'changes are reported at once, heartbeats without '
+                    'change are sent at an interval doubling from '
+                    'report_interval up to this value. A guest is '
+                    'considered unreachable after twice this time if it is '
+                    'longer than agent_heartbeat_expiry. This also delays '
+                    'failover: a dead replica source can only be ejected '
+                    'once it is considered unreachable, i.e. after 600 '
+                    'seconds with the defaults. Set it to at most half of '
+                    'agent_heartbeat_expiry to keep the ejection window at '
+                    'agent_heartbeat_expiry.'),
     cfg.IntOpt('num_tries', default=3,
                help='Number of times to check if a volume exists.'),
     cfg.StrOpt('volume_fstype', default='ext3',
@@ -183,6 +225,27 @@ common_opts = [
     cfg.IntOpt('trove_conductor_workers',
                help='Number of workers for the Conductor service. The default '
                'will be the number of CPUs available.'),
+    cfg.FloatOpt('conductor_heartbeat_coalesce_interval', default=0,
+                 help='Seconds the Conductor buffers guest heartbeats for '
+                 'before writing them to the database in a single '
+                 'transaction. Only the newest heartbeat of each instance is '
+                 'written. 0 writes every heartbeat as it arrives.'),
+    cfg.IntOpt('conductor_lastseen_cache_size', default=10000,
+               help='Number of instance and message type pairs whose last '
+               'seen message time the Conductor keeps in memory to discard '
+               'late messages without a database read.'),
+    cfg.FloatOpt('conductor_lastseen_flush_interval', default=0,
+                 help='Seconds between writes of the last seen message times '
+                 'to the database. 0 writes them with every message. With '
+                 'a positive interval each Conductor worker only checks the '
+                 'times it has seen itself, so messages are only '
+                 'guaranteed to be applied in order across several workers '
+                 'when this is 0.'),
+    cfg.BoolOpt('status_change_notifications', default=False,
+                help='Tell the Taskmanagers when the service status of an '
+                'instance or the state of a backup changes, or when a '
+                'cluster instance is deleted, so tasks waiting on them '
+                'resume without waiting for their next poll.'),
     cfg.BoolOpt('use_nova_server_config_drive', default=False,
                 help='Use config drive for file injection when booting '
                 'instance.'),
@@ -271,8 +334,22 @@ common_opts = [
                help='Swift container to put backups in.'),
     cfg.BoolOpt('backup_use_gzip_compression', default=True,
                 help='Compress backups using gzip.'),
+    cfg.IntOpt('backup_compression_level', default=None,
+               help='Compression level passed to the backup compression '
+               'codec. The codec default is used if not set.'),
+    cfg.IntOpt('backup_compression_threads', default=None,
+               help='Number of threads used by backup compression codecs '
+               'that support it (pigz, zstd). Every available core is used '
+               'if not set.'),
     cfg.BoolOpt('backup_use_openssl_encryption', default=True,
                 help='Encrypt backups using OpenSSL.'),
+    cfg.BoolOpt('backup_use_stream_pipeline', default=False,
+                help='Encrypt and decrypt backup streams inside the guest '
+                'agent, along with compression for codecs that support it, '
+                'instead of piping them through openssl and gzip '
+                'processes. The output is compatible with the OpenSSL 1.0 '
+                'and gzip commands. Encryption requires the cryptography '
+                'library; the shell pipes are used if it is missing.'),
     cfg.StrOpt('backup_aes_cbc_key', default='default_aes_cbc_key',
                help='Default OpenSSL aes_cbc key.'),
     cfg.BoolOpt('backup_use_snet', default=False,
@@ -286,6 +363,24 @@ common_opts = [
     cfg.IntOpt('backup_segment_max_size', default=2 * (1024 ** 3),
                help='Maximum size (in bytes) of each segment of the backup '
                'file.'),
+    cfg.IntOpt('backup_upload_concurrency', default=1,
+               help='Number of backup segments to upload to the Swift '
+               'container concurrently. Values greater than 1 stream each '
+               'segment to its upload through a buffer bounded by '
+               'backup_upload_buffer_size.'),
+    cfg.IntOpt('backup_upload_buffer_size', default=128 * (1024 ** 2),
+               help='Maximum size (in bytes) of backup data buffered for the '
+               'uploads in flight when backup_upload_concurrency is greater '
+               'than 1.'),
+    cfg.IntOpt('backup_download_concurrency', default=1,
+               help='Number of backup segments to download from the Swift '
+               'container concurrently during a restore. Values greater '
+               'than 1 fetch the segments behind the backup manifest in '
+               'parallel and feed them to the restore process in order.'),
+    cfg.IntOpt('backup_download_buffer_size', default=128 * (1024 ** 2),
+               help='Maximum size (in bytes) of downloaded backup data '
+               'buffered ahead of the restore process when '
+               'backup_download_concurrency is greater than 1.'),
     cfg.StrOpt('remote_dns_client',
                default='trove.common.remote.dns_client',
                help='Client to send DNS calls to.'),
@@ -311,6 +406,9 @@ common_opts = [
                help='Transformer for exists notifications.'),
     cfg.IntOpt('exists_notification_interval', default=3600,
                help='Seconds to wait between pushing events.'),
+    cfg.IntOpt('exists_notification_batch_size', default=500,
+               help='Number of instances loaded from the database at a time '
+                    'while generating exists events.'),
     cfg.DictOpt('notification_service_id',
                 default={'mysql': '2f3ff068-2bfb-4f70-9a9d-a6bb65bc084b',
                          'percona': 'fd1723f5-68d2-409c-994f-a4a197892a17',
@@ -351,6 +449,24 @@ common_opts = [
                help='The guest info filename found in the injected config '
                     'location.  If a full path is specified then it will '
                     'be used as the path to the guest info file'),
+    cfg.BoolOpt('guest_root_helper', default=False,
+                help='Run the file commands the guest agent needs root for '
+                     'through a long-lived helper process started once with '
+                     'sudo, instead of spawning sudo for every command.'),
+    cfg.StrOpt('guest_root_helper_socket',
+               default='/var/run/trove/guest-root-helper.sock',
+               help='Path of the Unix socket the guest root helper listens '
+                    'on.'),
+    cfg.IntOpt('guest_root_helper_start_timeout', default=10,
+               help='Maximum time (in seconds) to wait for the guest root '
+                    'helper to start before falling back to sudo.'),
+    cfg.BoolOpt('status_probe_enabled', default=True,
+                help='Check the status of the database over a connection '
+                     'kept open by the guest agent, before falling back to '
+                     'the command line tools.'),
+    cfg.IntOpt('status_probe_timeout', default=5,
+               help='Maximum time (in seconds) to wait for the in-process '
+                    'status probe of the guest agent.'),
     cfg.DictOpt('datastore_registry_ext', default=dict(),
                 help='Extension for default datastore managers. '
                      'Allows the use of custom managers for each of '
@@ -439,6 +555,10 @@ mysql_opts = [
                help='Default strategy to perform backups.',
                deprecated_name='backup_strategy',
                deprecated_group='DEFAULT'),
+    cfg.StrOpt('backup_compression', default=None,
+               help='Compression codec used for new backups: none, gzip, '
+               'pigz, zstd or lz4. Defaults to gzip or none, following '
+               'backup_use_gzip_compression.'),
     cfg.StrOpt('replication_strategy', default='MysqlGTIDReplication',
                help='Default strategy for replication.'),
     cfg.StrOpt('replication_namespace',
@@ -496,6 +616,10 @@ percona_opts = [
                help='Default strategy to perform backups.',
                deprecated_name='backup_strategy',
                deprecated_group='DEFAULT'),
+    cfg.StrOpt('backup_compression', default=None,
+               help='Compression codec used for new backups: none, gzip, '
+               'pigz, zstd or lz4. Defaults to gzip or none, following '
+               'backup_use_gzip_compression.'),
     cfg.StrOpt('replication_strategy', default='MysqlGTIDReplication',
                help='Default strategy for replication.'),
     cfg.StrOpt('replication_namespace',
@@ -557,6 +681,10 @@ redis_opts = [
                help='Default strategy to perform backups.',
                deprecated_name='backup_strategy',
                deprecated_group='DEFAULT'),
+    cfg.StrOpt('backup_compression', default=None,
+               help='Compression codec used for new backups: none, gzip, '
+               'pigz, zstd or lz4. Defaults to gzip or none, following '
+               'backup_use_gzip_compression.'),
     cfg.DictOpt('backup_incremental_strategy', default={},
                 help='Incremental Backup Runner based on the default '
                 'strategy. For strategies that do not implement an '
@@ -599,6 +727,10 @@ cassandra_opts = [
                help='Default strategy to perform backups.',
                deprecated_name='backup_strategy',
                deprecated_group='DEFAULT'),
+    cfg.StrOpt('backup_compression', default=None,
+               help='Compression codec used for new backups: none, gzip, '
+               'pigz, zstd or lz4. Defaults to gzip or none, following '
+               'backup_use_gzip_compression.'),
     cfg.DictOpt('backup_incremental_strategy', default={},
                 help='Incremental Backup Runner based on the default '
                 'strategy. For strategies that do not implement an '
@@ -643,6 +775,13 @@ couchbase_opts = [
                help='Default strategy to perform backups.',
                deprecated_name='backup_strategy',
                deprecated_group='DEFAULT'),
+    cfg.IntOpt('backup_parallel_jobs', default=2,
+               help='Number of buckets the CbBackupStream strategy dumps at '
+                    'the same time.'),
+    cfg.StrOpt('backup_compression', default=None,
+               help='Compression codec used for new backups: none, gzip, '
+               'pigz, zstd or lz4. Defaults to gzip or none, following '
+               'backup_use_gzip_compression.'),
     cfg.DictOpt('backup_incremental_strategy', default={},
                 help='Incremental Backup Runner based on the default '
                 'strategy. For strategies that do not implement an '
@@ -691,9 +830,15 @@ mongodb_opts = [
                      'in the security group (only applicable '
                      'if trove_security_groups_support is True).'),
     cfg.StrOpt('backup_strategy', default='MongoDump',
-               help='Default strategy to perform backups.',
+               help='Default strategy to perform backups. MongoDumpArchive '
+                    'streams the dump without staging it on the data volume '
+                    '(requires MongoDB 3.2 or later).',
                deprecated_name='backup_strategy',
                deprecated_group='DEFAULT'),
+    cfg.StrOpt('backup_compression', default=None,
+               help='Compression codec used for new backups: none, gzip, '
+               'pigz, zstd or lz4. Defaults to gzip or none, following '
+               'backup_use_gzip_compression.'),
     cfg.DictOpt('backup_incremental_strategy', default={},
                 help='Incremental Backup Runner based on the default '
                 'strategy. For strategies that do not implement an '
@@ -767,6 +912,14 @@ postgresql_opts = [
                      'if trove_security_groups_support is True).'),
     cfg.StrOpt('backup_strategy', default='PgDump',
                help='Default strategy to perform backups.'),
+    cfg.IntOpt('backup_parallel_jobs', default=4,
+               help='Number of parallel jobs the PgDumpParallel strategy '
+                    'dumps and restores each database with (requires '
+                    'PostgreSQL 9.3 or later).'),
+    cfg.StrOpt('backup_compression', default=None,
+               help='Compression codec used for new backups: none, gzip, '
+               'pigz, zstd or lz4. Defaults to gzip or none, following '
+               'backup_use_gzip_compression.'),
     cfg.DictOpt('backup_incremental_strategy', default={},
                 help='Incremental Backup Runner based on the default '
                 'strategy. For strategies that do not implement an '
@@ -792,6 +945,21 @@ postgresql_opts = [
     cfg.StrOpt('device_path', default='/dev/vdb'),
     cfg.ListOpt('ignore_users', default=['os_admin', 'postgres', 'root']),
     cfg.ListOpt('ignore_dbs', default=['postgres']),
+    cfg.IntOpt('connection_pool_size', default=0,
+               help='Number of idle local connections the guest agent keeps '
+                    'open to run its administrative queries. Queries are run '
+                    'through psql instead if set to 0, if psycopg2 is not '
+                    'installed or if the connection fails. The pool is '
+                    'disabled for the rest of the process after the server '
+                    'rejects its authentication, so connection_user must be '
+                    'mapped to the guest agent OS user before enabling it.'),
+    cfg.StrOpt('connection_user', default='postgres',
+               help='Database user the guest agent connects as over the '
+                    'local socket. The server must accept the connection '
+                    'from the guest agent OS user, e.g. through a pg_ident '
+                    'mapping.'),
+    cfg.StrOpt('socket_dir', default='/var/run/postgresql',
+               help='Directory of the PostgreSQL server Unix socket.'),
 ]
 
 # Apache CouchDB
@@ -817,6 +985,10 @@ couchdb_opts = [
                help='Device path for volume if volume support is enabled.'),
     cfg.StrOpt('backup_strategy', default=None,
                help='Default strategy to perform backups.'),
+    cfg.StrOpt('backup_compression', default=None,
+               help='Compression codec used for new backups: none, gzip, '
+               'pigz, zstd or lz4. Defaults to gzip or none, following '
+               'backup_use_gzip_compression.'),
     cfg.StrOpt('replication_strategy', default=None,
                help='Default strategy for replication.'),
     cfg.StrOpt('backup_namespace', default=None,
@@ -851,6 +1023,10 @@ vertica_opts = [
                      'if trove_security_groups_support is True).'),
     cfg.StrOpt('backup_strategy', default=None,
                help='Default strategy to perform backups.'),
+    cfg.StrOpt('backup_compression', default=None,
+               help='Compression codec used for new backups: none, gzip, '
+               'pigz, zstd or lz4. Defaults to gzip or none, following '
+               'backup_use_gzip_compression.'),
     cfg.DictOpt('backup_incremental_strategy', default={},
                 help='Incremental Backup Runner based on the default '
                 'strategy. For strategies that do not implement an '
@@ -913,6 +1089,10 @@ db2_opts = [
                help='Device path for volume if volume support is enabled.'),
     cfg.StrOpt('backup_strategy', default=None,
                help='Default strategy to perform backups.'),
+    cfg.StrOpt('backup_compression', default=None,
+               help='Compression codec used for new backups: none, gzip, '
+               'pigz, zstd or lz4. Defaults to gzip or none, following '
+               'backup_use_gzip_compression.'),
     cfg.StrOpt('replication_strategy', default=None,
                help='Default strategy for replication.'),
     cfg.BoolOpt('root_on_create', default=False,
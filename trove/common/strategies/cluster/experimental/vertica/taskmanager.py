@@ -17,6 +17,7 @@ from oslo_log import log as logging
 from trove.common import cfg
 from trove.common.i18n import _
 from trove.common.strategies.cluster import base
+from trove.guestagent import api as guest_api
 from trove.instance.models import DBInstance
 from trove.instance.models import Instance
 from trove.taskmanager import api as task_api
@@ -72,9 +73,13 @@ class VerticaClusterTasks(task_models.ClusterTasks):
             LOG.debug("Configuring password-less SSH on cluster members.")
             try:
                 for user in authorized_users_without_password:
-                    pub_key = [guest.get_public_keys(user) for guest in guests]
-                    for guest in guests:
-                        guest.authorize_public_keys(user, pub_key)
+                    public_keys = guest_api.call_guests(
+                        guests, 'get_public_keys', user)
+                    public_keys.raise_on_failure()
+                    pub_key = public_keys.results.values()
+                    guest_api.call_guests(
+                        guests, 'authorize_public_keys', user,
+                        pub_key).raise_on_failure()
 
                 LOG.debug("Installing cluster with members: %s." % member_ips)
                 guests[0].install_cluster(member_ips)
@@ -23,6 +23,7 @@ import time
 import types
 import uuid
 
+import eventlet.event
 from eventlet.timeout import Timeout
 import jinja2
 from oslo_concurrency import processutils
@@ -199,6 +200,70 @@ def poll_until(retriever, condition=lambda value: value,
     return lc.wait()
 
 
+class StatusWaiters(object):
+    """Wakes up the greenthreads waiting on the status of some objects.
+
+    Waiters register an event under the ids of the objects they wait on and
+    are woken as soon as a change to one of them is reported to notify.
+    """
+
+    def __init__(self):
+        self._events = collections.defaultdict(set)
+
+    def register(self, keys):
+        event = eventlet.event.Event()
+        for key in keys:
+            self._events[key].add(event)
+        return event
+
+    def unregister(self, keys, event):
+        for key in keys:
+            events = self._events.get(key)
+            if events is not None:
+                events.discard(event)
+                if not events:
+                    del self._events[key]
+
+    def notify(self, key):
+        for event in self._events.pop(key, ()):
+            if not event.ready():
+                event.send()
+
+
+STATUS_WAITERS = StatusWaiters()
+
+
+def wait_until(retriever, condition=lambda value: value, keys=(),
+               sleep_time=1, time_out=None, waiters=STATUS_WAITERS):
+    """Retrieves object until it passes condition, then returns it.
+
+    Works like poll_until, but the object is retrieved again as soon as a
+    change to any of keys is reported to the waiters instead of only every
+    sleep_time seconds, which is kept as the fallback poll interval.
+
+    """
+    keys = list(keys)
+    start_time = time.time()
+    while True:
+        # Register before retrieving so a change reported in between is
+        # not missed
+        event = waiters.register(keys)
+        try:
+            obj = retriever()
+            if condition(obj):
+                return obj
+            wait_time = sleep_time
+            if time_out is not None:
+                remaining = time_out - (time.time() - start_time)
+                if remaining <= 0:
+                    raise exception.PollTimeOut
+                wait_time = min(wait_time, remaining)
+            with Timeout(wait_time, False):
+                event.wait()
+        finally:
+            waiters.unregister(keys, event)
+
+
 # Copied from nova.api.openstack.common in the old code.
 def get_id_from_href(href):
     """Return the id or uuid portion of a url.
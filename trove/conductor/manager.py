@@ -12,19 +12,22 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import eventlet
 from oslo_log import log as logging
 import oslo_messaging as messaging
 from oslo_service import periodic_task
 
 from trove.backup import models as bkup_models
 from trove.common import cfg
-from trove.common import exception
 from trove.common.i18n import _
 from trove.common.instance import ServiceStatus
 from trove.common.rpc import version as rpc_version
-from trove.conductor.models import LastSeen
+from trove.common import utils
+from trove.conductor.models import LastSeenCache
+from trove.db import get_db_api
 from trove.extensions.mysql import models as mysql_models
 from trove.instance import models as t_models
+from trove.taskmanager import api as task_api
 
 LOG = logging.getLogger(__name__)
 CONF = cfg.CONF
@@ -36,6 +39,14 @@ class Manager(periodic_task.PeriodicTasks):
 
     def __init__(self):
         super(Manager, self).__init__(CONF)
+        self.heartbeat_coalesce_interval = (
+            CONF.conductor_heartbeat_coalesce_interval)
+        # The newest buffered heartbeat of each instance
+        self._heartbeats = {}
+        self._heartbeat_flush = None
+        self._last_seen = LastSeenCache(
+            CONF.conductor_lastseen_cache_size,
+            CONF.conductor_lastseen_flush_interval)
 
     def _message_too_old(self, instance_id, method_name, sent):
         fields = {
@@ -51,47 +62,134 @@ class Manager(periodic_task.PeriodicTasks):
                         "compare.") % instance_id)
             return False
 
-        seen = None
-        try:
-            seen = LastSeen.load(instance_id=instance_id,
-                                 method_name=method_name)
-        except exception.NotFound:
-            # This is fine.
-            pass
-
-        if seen is None:
-            LOG.debug("[Instance %s] Did not find any previous message. "
-                      "Creating." % instance_id)
-            seen = LastSeen.create(instance_id=instance_id,
-                                   method_name=method_name,
-                                   sent=sent)
-            seen.save()
-            return False
-
-        last_sent = float(seen.sent)
-        if last_sent < sent:
-            LOG.debug("[Instance %s] Rec'd message is younger than last "
-                      "seen. Updating." % instance_id)
-            seen.sent = sent
-            seen.save()
-            return False
-
-        else:
+        if self._last_seen.message_too_old(instance_id, method_name, sent):
             LOG.info(_("[Instance %s] Rec'd message is older than last seen. "
                        "Discarding.") % instance_id)
             return True
+        return False
 
     def heartbeat(self, context, instance_id, payload, sent=None):
         LOG.debug("Instance ID: %s" % str(instance_id))
         LOG.debug("Payload: %s" % str(payload))
+        if self.heartbeat_coalesce_interval > 0:
+            self._buffer_heartbeat(context, instance_id, payload, sent)
+            return
         status = t_models.InstanceServiceStatus.find_by(
             instance_id=instance_id)
         if self._message_too_old(instance_id, 'heartbeat', sent):
             return
+        old_status_id = status.status_id
         if payload.get('service_status') is not None:
             status.set_status(ServiceStatus.from_description(
                 payload['service_status']))
         status.save()
+        if status.status_id != old_status_id:
+            self._notify_status_change(context, instance_id)
+
+    def _notify_status_change(self, context, object_id):
+        """Wake up the taskmanager tasks waiting on the object."""
+        if not CONF.status_change_notifications:
+            return
+        try:
+            task_api.API(context).notify_status_change(object_id)
+        except Exception:
+            # The waiters fall back to polling
+            LOG.exception(_("Failed to notify the taskmanagers of a status "
+                            "change of %s.") % object_id)
+
+    def _buffer_heartbeat(self, context, instance_id, payload, sent):
+        """Hold a heartbeat until the next flush, replacing any older
+        heartbeat buffered for the instance.
+        """
+        if payload.get('service_status') is not None:
+            # Reject a bad status while the guest can still be told
+            ServiceStatus.from_description(payload['service_status'])
+
+        if sent is not None:
+            last_sent = self._last_seen.peek(instance_id, 'heartbeat')
+            if last_sent is not None and last_sent >= sent:
+                LOG.info(_("[Instance %s] Rec'd message is older than last "
+                           "seen. Discarding.") % instance_id)
+                return
+
+        buffered = self._heartbeats.get(instance_id)
+        if buffered is not None:
+            if (sent is not None and buffered['sent'] is not None and
+                    buffered['sent'] >= sent):
+                LOG.debug("[Instance %s] Rec'd message is older than the "
+                          "buffered one. Discarding." % instance_id)
+                return
+            if payload.get('service_status') is None:
+                # Keep the status change reported by the older heartbeat
+                payload = dict(payload,
+                               service_status=buffered['service_status'])
+
+        self._heartbeats[instance_id] = {
+            'context': context,
+            'sent': sent,
+            'service_status': payload.get('service_status'),
+        }
+        if self._heartbeat_flush is None:
+            self._heartbeat_flush = eventlet.spawn_after(
+                self.heartbeat_coalesce_interval, self._flush_heartbeats)
+
+    def _flush_heartbeats(self):
+        self._heartbeat_flush = None
+        heartbeats, self._heartbeats = self._heartbeats, {}
+        if not heartbeats:
+            return
+        LOG.debug("Writing heartbeats of %d instances." % len(heartbeats))
+        try:
+            self._save_heartbeats(heartbeats)
+        except Exception:
+            LOG.exception(_("Failed to write the heartbeats of %d "
+                            "instances.") % len(heartbeats))
+
+    def _save_heartbeats(self, heartbeats):
+        """Write buffered heartbeats with one query to load the service
+        statuses and a single transaction to update them.
+        """
+        statuses = dict(
+            (status.instance_id, status) for status in
+            t_models.InstanceServiceStatus.find_all_in('instance_id',
+                                                       list(heartbeats)))
+        for instance_id in set(heartbeats) - set(statuses):
+            LOG.error(_("[Instance %s] No service status found. "
+                        "Discarding heartbeat.") % instance_id)
+
+        sent_times = dict((instance_id, heartbeat['sent'])
+                          for instance_id, heartbeat in heartbeats.items()
+                          if instance_id in statuses and
+                          heartbeat['sent'] is not None)
+        accepted = self._last_seen.accept('heartbeat', sent_times)
+        for instance_id in set(sent_times) - accepted:
+            LOG.info(_("[Instance %s] Rec'd message is older than last "
+                       "seen. Discarding.") % instance_id)
+
+        updated_at = utils.utcnow()
+        status_rows = []
+        changed = []
+        for instance_id, status in statuses.items():
+            if instance_id in sent_times and instance_id not in accepted:
+                continue
+            service_status = heartbeats[instance_id]['service_status']
+            if service_status is not None:
+                old_status_id = status.status_id
+                status.set_status(ServiceStatus.from_description(
+                    service_status))
+                if status.status_id != old_status_id:
+                    changed.append(instance_id)
+            status_rows.append({'id': status.id,
+                                'status_id': status.status_id,
+                                'status_description':
+                                    status.status_description,
+                                'updated_at': updated_at})
+
+        get_db_api().bulk_save(
+            updates=[(t_models.InstanceServiceStatus, ['id'], status_rows)])
+        for instance_id in changed:
+            self._notify_status_change(heartbeats[instance_id]['context'],
+                                       instance_id)
 
     def update_backup(self, context, instance_id, backup_id,
                       sent=None, **backup_fields):
@@ -124,6 +222,7 @@ class Manager(periodic_task.PeriodicTasks):
                         "%(found)s") % fields)
             return
 
+        old_state = backup.state
         for k, v in backup_fields.items():
             if hasattr(backup, k):
                 fields = {
@@ -133,6 +232,8 @@ class Manager(periodic_task.PeriodicTasks):
                 LOG.debug("Backup %(key)s: %(value)s" % fields)
                 setattr(backup, k, v)
         backup.save()
+        if backup.state != old_state:
+            self._notify_status_change(context, backup_id)
 
     def report_root(self, context, instance_id, user):
         mysql_models.RootHistory.create(context, instance_id, user)
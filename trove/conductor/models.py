@@ -12,8 +12,13 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import collections
+
+import eventlet
 from oslo_log import log as logging
 
+from trove.common import exception
+from trove.common.i18n import _
 from trove.db import get_db_api
 
 LOG = logging.getLogger(__name__)
@@ -47,7 +52,184 @@ class LastSeen(object):
                                     method_name=method_name)
         return seen
 
+    @classmethod
+    def load_all(cls, instance_ids, method_name):
+        return get_db_api().find_all_in(cls, 'instance_id', instance_ids,
+                                        method_name=method_name)
+
     @classmethod
     def create(cls, instance_id, method_name, sent):
         seen = LastSeen(instance_id, method_name, sent)
         return seen.save()
+
+
+class LastSeenCache(object):
+    """LRU cache of the sent time of the last message of each type from
+    each instance, in front of the conductor_lastseen table.
+
+    Accepted times are written to the table with every message, or in the
+    background every flush_interval seconds if one is given. The table is
+    only ever moved forward, so conductor workers sharing it never undo
+    each other's updates, and each worker picks up the newer times written
+    by the others whenever it writes its own. In the background mode a
+    worker only checks the times it has cached, so it may still apply a
+    message older than one another worker already accepted.
+    """
+
+    def __init__(self, size, flush_interval=0):
+        self.size = size
+        self.flush_interval = flush_interval
+        # (instance_id, method_name) -> sent; None if there is no row yet
+        self._cache = collections.OrderedDict()
+        # Accepted times waiting for the next flush
+        self._dirty = {}
+        self._flush = None
+
+    def _get(self, key):
+        if key in self._dirty:
+            return self._dirty[key]
+        sent = self._cache.pop(key)
+        self._cache[key] = sent
+        return sent
+
+    def _remember(self, key, sent):
+        self._cache.pop(key, None)
+        if self.size > 0:
+            self._cache[key] = sent
+            while len(self._cache) > self.size:
+                self._cache.popitem(last=False)
+
+    def _load(self, method_name, instance_ids):
+        """Return the last seen times of the instances, loading the ones
+        that aren't cached with a single query.
+        """
+        seen = {}
+        missing = []
+        for instance_id in instance_ids:
+            key = (instance_id, method_name)
+            if key in self._dirty or key in self._cache:
+                seen[instance_id] = self._get(key)
+            else:
+                missing.append(instance_id)
+        if missing:
+            seen.update((instance_id, None) for instance_id in missing)
+            for last_seen in LastSeen.load_all(missing, method_name):
+                seen[last_seen.instance_id] = last_seen.sent
+        for instance_id in missing:
+            self._remember((instance_id, method_name), seen[instance_id])
+        return seen
+
+    def peek(self, instance_id, method_name):
+        """The last seen time if it is cached, without loading it."""
+        key = (instance_id, method_name)
+        if key in self._dirty:
+            return self._dirty[key]
+        return self._cache.get(key)
+
+    def message_too_old(self, instance_id, method_name, sent):
+        """Record sent unless the instance already sent a newer message."""
+        key = (instance_id, method_name)
+        last_sent = self.peek(instance_id, method_name)
+        if last_sent is not None and last_sent >= sent:
+            return True
+        if self.flush_interval > 0:
+            return not self.accept(method_name, {instance_id: sent})
+
+        # Write through; the conditional update doubles as the check
+        if key in self._cache and last_sent is None:
+            updated = (self._insert(method_name, instance_id, sent) or
+                       self._update(method_name, instance_id, sent))
+        else:
+            updated = (self._update(method_name, instance_id, sent) or
+                       self._insert(method_name, instance_id, sent))
+        if updated:
+            self._remember(key, sent)
+        else:
+            # Another worker wrote a newer time; load it when next needed
+            self._cache.pop(key, None)
+        return not updated
+
+    def accept(self, method_name, messages):
+        """Record the sent times of a batch of messages of one type.
+
+        :param messages: The sent time of the message from each instance.
+        :type messages: dict
+        :returns: The instances whose message is newer than the last one
+                  seen from them.
+        """
+        seen = self._load(method_name, list(messages))
+        accepted = dict(
+            (instance_id, sent) for instance_id, sent in messages.items()
+            if seen[instance_id] is None or seen[instance_id] < sent)
+        if self.flush_interval > 0:
+            for instance_id, sent in accepted.items():
+                key = (instance_id, method_name)
+                self._dirty[key] = sent
+                self._remember(key, sent)
+            if accepted and self._flush is None:
+                self._flush = eventlet.spawn_after(self.flush_interval,
+                                                   self.flush)
+        else:
+            self._write(method_name, accepted)
+        return set(accepted)
+
+    def flush(self):
+        """Write the times accepted since the last flush."""
+        self._flush = None
+        dirty, self._dirty = self._dirty, {}
+        by_method = collections.defaultdict(dict)
+        for (instance_id, method_name), sent in dirty.items():
+            by_method[method_name][instance_id] = sent
+        for method_name, accepted in by_method.items():
+            try:
+                self._write(method_name, accepted)
+            except Exception:
+                LOG.exception(_("Failed to write the last seen %(method)s "
+                                "times of %(count)d instances.") %
+                              {'method': method_name,
+                               'count': len(accepted)})
+
+    def _write(self, method_name, accepted):
+        """Write accepted times, then cache any newer times found in the
+        table instead.
+        """
+        if not accepted:
+            return
+        get_db_api().bulk_update_if_greater(
+            LastSeen, ['instance_id', 'method_name'], 'sent',
+            [{'instance_id': instance_id, 'method_name': method_name,
+              'sent': sent} for instance_id, sent in accepted.items()])
+
+        seen = dict((last_seen.instance_id, last_seen.sent)
+                    for last_seen in LastSeen.load_all(list(accepted),
+                                                       method_name))
+        for instance_id, sent in accepted.items():
+            key = (instance_id, method_name)
+            if instance_id not in seen and not (
+                    self._insert(method_name, instance_id, sent) or
+                    self._update(method_name, instance_id, sent)):
+                # Another worker wrote a newer time; load it when needed
+                self._cache.pop(key, None)
+                continue
+            last_sent = seen.get(instance_id, sent)
+            if key in self._dirty and self._dirty[key] >= last_sent:
+                # Accepted again while this batch was being written
+                continue
+            self._dirty.pop(key, None)
+            self._remember(key, last_sent)
+
+    def _update(self, method_name, instance_id, sent):
+        return get_db_api().update_if_greater(
+            LastSeen, 'sent', sent,
+            instance_id=instance_id, method_name=method_name) > 0
+
+    def _insert(self, method_name, instance_id, sent):
+        # A plain insert; saving the model would overwrite an existing row
+        try:
+            get_db_api().bulk_save(inserts=[(LastSeen, [{
+                'instance_id': instance_id,
+                'method_name': method_name,
+                'sent': sent}])])
+        except exception.DBConstraintError:
+            return False
+        return True
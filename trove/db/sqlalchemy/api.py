@@ -13,12 +13,17 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import sqlalchemy
 import sqlalchemy.exc
+from sqlalchemy import orm
 
 from trove.common import exception
 from trove.db.sqlalchemy import migration
 from trove.db.sqlalchemy import session
 
+# Maximum number of values in a single IN clause
+IN_QUERY_BATCH_SIZE = 500
+
 
 def list(query_func, *args, **kwargs):
     return query_func(*args, **kwargs).all()
@@ -50,6 +55,18 @@ def find_by(model, **kwargs):
     return _query_by(model, **kwargs).first()
 
 
+def find_all_in(model, field, values, **conditions):
+    # Long lists are split to stay below the bound parameter limits of
+    # the database (e.g. 999 for sqlite)
+    values = tuple(values)
+    column = getattr(model, field)
+    models = []
+    for start in range(0, len(values), IN_QUERY_BATCH_SIZE):
+        models.extend(_query_by(model, **conditions).filter(
+            column.in_(values[start:start + IN_QUERY_BATCH_SIZE])).all())
+    return models
+
+
 def save(model):
     try:
         db_session = session.get_session()
@@ -61,6 +78,83 @@ def save(model):
                                           error=str(error.orig))
 
 
+def bulk_save(updates=(), inserts=()):
+    """Apply batches of updates and inserts in a single transaction.
+
+    :param updates: (model, key_fields, rows) tuples. Every row is a dict
+                    holding the key fields selecting the record to update
+                    and the new values of its other fields; all the rows
+                    of a batch must have the same fields.
+    :param inserts: (model, rows) tuples of records to insert.
+    """
+    db_session = session.get_session()
+    try:
+        with db_session.begin():
+            for model, key_fields, rows in updates:
+                if rows:
+                    db_session.execute(
+                        _bulk_update_statement(model, key_fields, rows[0]),
+                        [_bulk_update_params(key_fields, row)
+                         for row in rows])
+            for model, rows in inserts:
+                if rows:
+                    db_session.execute(_table(model).insert(), rows)
+    except sqlalchemy.exc.IntegrityError as error:
+        raise exception.DBConstraintError(model_name=model.__name__,
+                                          error=str(error.orig))
+
+
+def update_if_greater(model, field, value, **conditions):
+    """Set field to value where it is NULL or lower than value.
+
+    The comparison and the write are a single statement, so concurrent
+    writers can only ever move the field forward. Returns the number of
+    rows updated.
+    """
+    column = getattr(model, field)
+    return _query_by(model, **conditions).filter(
+        sqlalchemy.or_(column.is_(None), column < value)).update(
+            {field: value}, synchronize_session=False)
+
+
+def bulk_update_if_greater(model, key_fields, field, rows):
+    """update_if_greater for a batch of rows, in a single transaction.
+
+    Every row is a dict of the key fields selecting the record to update
+    and the new value of field.
+    """
+    if not rows:
+        return
+    table = _table(model)
+    value = sqlalchemy.bindparam('value_' + field)
+    statement = _bulk_update_statement(model, key_fields, rows[0]).where(
+        sqlalchemy.or_(table.c[field].is_(None), table.c[field] < value))
+    db_session = session.get_session()
+    with db_session.begin():
+        db_session.execute(statement,
+                           [_bulk_update_params(key_fields, row)
+                            for row in rows])
+
+
+def _table(model):
+    return orm.class_mapper(model).mapped_table
+
+
+def _bulk_update_statement(model, key_fields, row):
+    # Bind parameters can't share the names of the columns they update
+    table = _table(model)
+    return table.update().where(sqlalchemy.and_(*[
+        table.c[field] == sqlalchemy.bindparam('key_' + field)
+        for field in key_fields])).values(**dict(
+            (field, sqlalchemy.bindparam('value_' + field))
+            for field in row if field not in key_fields))
+
+
+def _bulk_update_params(key_fields, row):
+    return dict((('key_' if field in key_fields else 'value_') + field, value)
+                for field, value in row.items())
+
+
 def delete(model):
     db_session = session.get_session()
     model = db_session.merge(model)
@@ -12,14 +12,17 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 import datetime
+import time
 
 from oslo_log import log as logging
 
 from trove.common import cfg
-from trove.common import exception
+from trove.common.i18n import _
 from trove.common import remote
 from trove.common import utils
+from trove.datastore import models as datastore_models
 from trove.extensions.mysql import models as mysql_models
+from trove.flavor.models import FLAVOR_CACHE
 from trove.instance import models as imodels
 from trove.instance import models as instance_models
 from trove.instance.models import load_instance, InstanceServiceStatus
@@ -79,9 +82,11 @@ def load_mgmt_instance(cls, context, id, include_deleted):
 
 
 class SimpleMgmtInstance(imodels.BaseInstance):
-    def __init__(self, context, db_info, server, datastore_status):
+    def __init__(self, context, db_info, server, datastore_status,
+                 ds_version=None, ds=None):
         super(SimpleMgmtInstance, self).__init__(context, db_info, server,
-                                                 datastore_status)
+                                                 datastore_status,
+                                                 ds_version=ds_version, ds=ds)
 
     @property
     def status(self):
@@ -173,12 +178,17 @@ def _load_servers(instances, find_server):
 
 
 def publish_exist_events(transformer, admin_context):
+    start = time.time()
     notifier = rpc.get_notifier("taskmanager")
     notifications = transformer()
     # clear out admin_context.auth_token so it does not get logged
     admin_context.auth_token = None
+    count = 0
     for notification in notifications:
         notifier.info(admin_context, "trove.instance.exists", notification)
+        count += 1
+    LOG.info(_("Published %(count)d exists events in %(time).2f seconds.")
+             % {'count': count, 'time': time.time() - start})
 
 
 class NotificationTransformer(object):
@@ -224,27 +234,55 @@ class NotificationTransformer(object):
             instance.datastore_version.manager, CONF.notification_service_id)
         return payload
 
+    def _load_instances(self):
+        """Load the instances with their service statuses a batch at a
+        time, each batch with one query for the statuses.
+        """
+        datastore_versions = {}
+        datastores = {}
+        db_query = instance_models.DBInstance.find_all(deleted=False)
+        marker = None
+        while True:
+            db_infos = db_query.limit(CONF.exists_notification_batch_size,
+                                      marker)
+            if not db_infos:
+                return
+            marker = db_infos[-1].id
+            service_statuses = dict(
+                (service_status.instance_id, service_status)
+                for service_status in InstanceServiceStatus.find_all_in(
+                    'instance_id', [db_info.id for db_info in db_infos]))
+            for db_info in db_infos:
+                service_status = service_statuses.get(db_info.id)
+                if service_status is None:
+                    # There is a small window of opportunity during when the
+                    # db resource for an instance exists, but no
+                    # InstanceServiceStatus for it has yet been created. We
+                    # skip sending the notification message for all such
+                    # instances. These instance are too new and will get
+                    # picked up the next round of notifications.
+                    LOG.debug("InstanceServiceStatus not found for %s. "
+                              "Will wait to send notification." % db_info.id)
+                    continue
+                version_id = db_info.datastore_version_id
+                if version_id not in datastore_versions:
+                    datastore_versions[version_id] = (
+                        datastore_models.DatastoreVersion.load_by_uuid(
+                            version_id))
+                ds_version = datastore_versions[version_id]
+                if ds_version.datastore_id not in datastores:
+                    datastores[ds_version.datastore_id] = (
+                        datastore_models.Datastore.load(
+                            ds_version.datastore_id))
+                yield SimpleMgmtInstance(
+                    None, db_info, None, service_status,
+                    ds_version=ds_version,
+                    ds=datastores[ds_version.datastore_id])
+
     def __call__(self):
         audit_start, audit_end = NotificationTransformer._get_audit_period()
-        messages = []
-        db_infos = instance_models.DBInstance.find_all(deleted=False)
-        for db_info in db_infos:
-            try:
-                service_status = InstanceServiceStatus.find_by(
-                    instance_id=db_info.id)
-            except exception.ModelNotFoundError:
-                # There is a small window of opportunity during when the db
-                # resource for an instance exists, but no InstanceServiceStatus
-                # for it has yet been created. We skip sending the notification
-                # message for all such instances. These instance are too new
-                # and will get picked up the next round of notifications.
-                LOG.debug("InstanceServiceStatus not found for %s. "
-                          "Will wait to send notification." % db_info.id)
-                continue
-            instance = SimpleMgmtInstance(None, db_info, None, service_status)
-            message = self.transform_instance(instance, audit_start, audit_end)
-            messages.append(message)
-        return messages
+        for instance in self._load_instances():
+            yield self.transform_instance(instance, audit_start, audit_end)
 
 
 class NovaNotificationTransformer(NotificationTransformer):
@@ -252,17 +290,11 @@ class NovaNotificationTransformer(NotificationTransformer):
         super(NovaNotificationTransformer, self).__init__(**kwargs)
         self.context = kwargs['context']
         self.nova_client = remote.create_admin_nova_client(self.context)
-        self._flavor_cache = {}
 
     def _lookup_flavor(self, flavor_id):
-        if flavor_id in self._flavor_cache:
-            LOG.debug("Flavor cache hit for %s" % flavor_id)
-            return self._flavor_cache[flavor_id]
-        # fetch flavor resource from nova
-        LOG.info("Flavor cache miss for %s" % flavor_id)
-        flavor = self.nova_client.flavors.get(flavor_id)
-        self._flavor_cache[flavor_id] = flavor.name if flavor else 'unknown'
-        return self._flavor_cache[flavor_id]
+        flavor = FLAVOR_CACHE.get(self.context, flavor_id,
+                                  client=self.nova_client)
+        return flavor.name if flavor else 'unknown'
 
     def __call__(self):
         audit_start, audit_end = NotificationTransformer._get_audit_period()
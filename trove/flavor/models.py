@@ -16,11 +16,64 @@
 """Model classes that form the core of instance flavor functionality."""
 
 
+import collections
+import time
+
 from novaclient import exceptions as nova_exceptions
+from oslo_log import log as logging
+
+from trove.common import cfg
 from trove.common import exception
 from trove.common.models import NovaRemoteModelBase
 from trove.common.remote import create_nova_client
 
+CONF = cfg.CONF
+LOG = logging.getLogger(__name__)
+
+
+class FlavorCache(object):
+    """Process wide cache of the Nova flavors looked up by id.
+
+    Flavors are cached per tenant, since a tenant may not have access to
+    the private flavors of another. Entries expire after ttl seconds and
+    the least recently used ones are dropped beyond size entries.
+    """
+
+    def __init__(self, ttl, size):
+        self.ttl = ttl
+        self.size = size
+        self._flavors = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, context, flavor_id, client=None):
+        """Return the flavor, looking it up with the given Nova client
+        (or one for the context) when it is not cached.
+        """
+        key = (context.tenant if context else None, str(flavor_id))
+        now = time.time()
+        expires, flavor = self._flavors.pop(key, (0, None))
+        if expires > now:
+            self.hits += 1
+            self._flavors[key] = (expires, flavor)
+            return flavor
+
+        self.misses += 1
+        LOG.debug("Flavor cache miss for %s.", flavor_id)
+        client = client or create_nova_client(context)
+        flavor = client.flavors.get(flavor_id)
+        if self.ttl > 0 and self.size > 0:
+            self._flavors[key] = (now + self.ttl, flavor)
+            while len(self._flavors) > self.size:
+                self._flavors.popitem(last=False)
+        return flavor
+
+    def clear(self):
+        self._flavors.clear()
+
+
+FLAVOR_CACHE = FlavorCache(CONF.flavor_cache_ttl, CONF.flavor_cache_size)
+
 
 class Flavor(object):
 
@@ -32,8 +85,7 @@ class Flavor(object):
             return
         if flavor_id and context:
             try:
-                client = create_nova_client(context)
-                self.flavor = client.flavors.get(flavor_id)
+                self.flavor = FLAVOR_CACHE.get(context, flavor_id)
             except nova_exceptions.NotFound as e:
                 raise exception.NotFound(uuid=flavor_id)
             except nova_exceptions.ClientException as e:
@@ -17,6 +17,9 @@
 Handles all request to the Platform or Guest VM
 """
 
+import collections
+
+import eventlet
 from eventlet import Timeout
 from oslo_log import log as logging
 import oslo_messaging as messaging
@@ -35,6 +38,66 @@ AGENT_HIGH_TIMEOUT = CONF.agent_call_high_timeout
 AGENT_SNAPSHOT_TIMEOUT = CONF.agent_replication_snapshot_timeout
 
 
+class GuestCallResults(object):
+    """Outcome of the same call made to many guests, keyed by guest id.
+
+    'results' holds the return values of the successful calls and
+    'failures' the exceptions raised by the others, both in call order.
+    """
+
+    def __init__(self):
+        self.results = collections.OrderedDict()
+        self.failures = collections.OrderedDict()
+
+    def raise_on_failure(self):
+        """Re-raise the error of the first guest whose call failed."""
+        for error in self.failures.values():
+            raise error
+
+
+def call_guests(guests, method_name, *args, **kwargs):
+    """Call the same API method on many guests concurrently.
+
+    The guests are called at most CONF.agent_call_concurrency at a time.
+    A failed or timed-out call does not affect the calls to other guests.
+
+    :param guests:          Guest API clients to call.
+    :type guests:           list of API
+
+    :param method_name:     Name of the API method to call.
+    :type method_name:      string
+
+    :param timeout:         Maximum time (in seconds) to wait for each
+                            guest, in addition to the RPC timeout of the
+                            method. None to rely on the RPC timeout only.
+    :type timeout:          integer
+
+    :returns:               GuestCallResults
+    """
+    timeout = kwargs.pop('timeout', None)
+
+    def _call_guest(guest):
+        try:
+            with Timeout(timeout):
+                return getattr(guest, method_name)(*args, **kwargs), None
+        except Timeout:
+            return None, exception.GuestTimeout()
+        except Exception as e:
+            return None, e
+
+    call_results = GuestCallResults()
+    pool = eventlet.GreenPool(CONF.agent_call_concurrency)
+    for guest, (result, error) in zip(guests, pool.imap(_call_guest, guests)):
+        if error is None:
+            call_results.results[guest.id] = result
+        else:
+            LOG.error(_("Calling %(method)s on guest %(id)s failed: "
+                        "%(error)s") % {'method': method_name,
+                                        'id': guest.id, 'error': error})
+            call_results.failures[guest.id] = error
+    return call_results
+
+
 class API(object):
     """API for interacting with the guest manager."""
 
@@ -103,6 +103,7 @@ class BackupAgent(object):
                     raise BackupError(note)
 
                 meta = bkup.metadata()
+                meta['compression'] = bkup.codec.name
                 meta['datastore'] = backup_info['datastore']
                 meta['datastore_version'] = backup_info[
                     'datastore_version']
@@ -163,9 +164,14 @@ class BackupAgent(object):
                 CONF.storage_strategy,
                 CONF.storage_namespace)(context)
 
+            # Pick the decoder matching the codec the backup was taken with
+            metadata = storage.load_metadata(backup_info['location'],
+                                             backup_info['checksum'])
+
             runner = restore_runner(storage, location=backup_info['location'],
                                     checksum=backup_info['checksum'],
-                                    restore_location=restore_location)
+                                    restore_location=restore_location,
+                                    compression=metadata.get('compression'))
             backup_info['restore_location'] = restore_location
             LOG.debug("Restoring instance from backup %(id)s to "
                       "%(restore_location)s.", backup_info)
@@ -0,0 +1,157 @@
+# Copyright 2015 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Compression codecs applied to backup streams.
+
+Each codec knows the shell pipe stages used to compress a backup and to
+decompress it again on restore. The name of the codec used for a backup is
+recorded in the backup metadata so the matching decoder can be picked on
+restore regardless of the codec currently configured.
+
+Codecs that can run inside the guest agent also provide stream stages,
+which are used instead of the shell pipes when backups are streamed in
+process.
+"""
+
+from trove.guestagent.common import stream
+
+
+class UnknownCompressionCodec(Exception):
+    """Unknown backup compression codec."""
+
+
+class Codec(object):
+    """Base class for backup compression codecs."""
+
+    # The name recorded in the backup metadata
+    name = None
+    # The extension appended to the backup manifest
+    extension = ''
+
+    def __init__(self, level=None, threads=None):
+        self.level = level
+        self.threads = threads
+
+    @property
+    def level_arg(self):
+        return ' -%d' % self.level if self.level else ''
+
+    @property
+    def compress_cmd(self):
+        """Pipe stage appended to the backup command."""
+        return ''
+
+    @property
+    def decompress_cmd(self):
+        """Pipe stage prepended to the restore command."""
+        return ''
+
+    def compress_stage(self):
+        """In-process compression stage, or None to use compress_cmd."""
+        return None
+
+    def decompress_stage(self):
+        """In-process decompression stage, or None to use decompress_cmd."""
+        return None
+
+
+class NoCompression(Codec):
+    name = 'none'
+
+
+class Gzip(Codec):
+    name = 'gzip'
+    extension = '.gz'
+
+    @property
+    def compress_cmd(self):
+        return ' | gzip%s' % self.level_arg
+
+    @property
+    def decompress_cmd(self):
+        return 'gzip -d -c | '
+
+    def compress_stage(self):
+        return stream.GzipStage(level=self.level)
+
+    def decompress_stage(self):
+        return stream.GunzipStage()
+
+
+class Pigz(Gzip):
+    """Parallel gzip; the output is readable by gzip and vice versa."""
+    name = 'pigz'
+
+    @property
+    def threads_arg(self):
+        return ' -p %d' % self.threads if self.threads else ''
+
+    @property
+    def compress_cmd(self):
+        return ' | pigz%s%s' % (self.level_arg, self.threads_arg)
+
+    @property
+    def decompress_cmd(self):
+        return 'pigz -d -c%s | ' % self.threads_arg
+
+    def compress_stage(self):
+        # Keep compressing on several cores with the pigz process
+        return None
+
+
+class Zstd(Codec):
+    name = 'zstd'
+    extension = '.zst'
+
+    @property
+    def compress_cmd(self):
+        # -T0 lets zstd use one thread per available core
+        return ' | zstd -q -c%s -T%d' % (self.level_arg, self.threads or 0)
+
+    @property
+    def decompress_cmd(self):
+        return 'zstd -q -d -c | '
+
+
+class Lz4(Codec):
+    name = 'lz4'
+    extension = '.lz4'
+
+    @property
+    def compress_cmd(self):
+        return ' | lz4 -q -c%s' % self.level_arg
+
+    @property
+    def decompress_cmd(self):
+        return 'lz4 -q -d -c | '
+
+
+CODECS = dict((codec.name, codec)
+              for codec in (NoCompression, Gzip, Pigz, Zstd, Lz4))
+
+
+def register_codec(codec):
+    """Make a Codec subclass available under its name."""
+    CODECS[codec.name] = codec
+
+
+def get_codec(name, level=None, threads=None):
+    try:
+        codec = CODECS[name]
+    except KeyError:
+        raise UnknownCompressionCodec(
+            "Unknown compression codec: %s (known codecs: %s)"
+            % (name, ', '.join(sorted(CODECS))))
+    return codec(level=level, threads=threads)
@@ -14,13 +14,17 @@
 #    under the License.
 
 import abc
+import contextlib
+import copy
 import os
 import re
 import six
+import time
 
 from trove.guestagent.common import guestagent_utils
 from trove.guestagent.common import operating_system
 from trove.guestagent.common.operating_system import FileMode
+from trove.guestagent.common import root_helper
 
 
 class ConfigurationManager(object):
@@ -78,6 +82,9 @@ class ConfigurationManager(object):
         self._codec = codec
         self._requires_root = requires_root
         self._value_cache = None
+        self._file_cache = ParsedFileCache(codec)
+        self._batch_depth = 0
+        self._refresh_pending = False
 
         if not override_strategy:
             # Use OneFile strategy by default. Store the revisions in a
@@ -98,8 +105,8 @@ class ConfigurationManager(object):
     def get_value(self, key, default=None):
         """Return the current value at a given key or 'default'.
         """
-        if self._value_cache is None:
-            self._refresh_cache()
+        if self._value_cache is None or self._refresh_pending:
+            self._update_cache()
 
         return self._value_cache.get(key, default)
 
@@ -110,8 +117,7 @@ class ConfigurationManager(object):
         :returns:        Configuration file as a Python dict.
         """
 
-        base_options = operating_system.read_file(
-            self._base_config_path, codec=self._codec)
+        base_options = self._file_cache.read(self._base_config_path)
 
         updates = self._override_strategy.parse_updates()
         guestagent_utils.update_dict(updates, base_options)
@@ -132,14 +138,16 @@ class ConfigurationManager(object):
             self._override_strategy.remove(self.USER_GROUP)
             self._override_strategy.remove(self.SYSTEM_GROUP)
 
-            operating_system.write_file(
-                self._base_config_path, options, as_root=self._requires_root)
-            operating_system.chown(
-                self._base_config_path, self._owner, self._group,
-                as_root=self._requires_root)
-            operating_system.chmod(
-                self._base_config_path, FileMode.ADD_READ_ALL,
-                as_root=self._requires_root)
+            with root_helper.batch():
+                operating_system.write_file(
+                    self._base_config_path, options,
+                    as_root=self._requires_root)
+                operating_system.chown(
+                    self._base_config_path, self._owner, self._group,
+                    as_root=self._requires_root)
+                operating_system.chmod(
+                    self._base_config_path, FileMode.ADD_READ_ALL,
+                    as_root=self._requires_root)
 
             self._refresh_cache()
 
@@ -187,7 +195,27 @@ class ConfigurationManager(object):
         self._override_strategy.remove(group_name, change_id)
         self._refresh_cache()
 
+    @contextlib.contextmanager
+    def batch_update(self):
+        """Apply several changes to the configuration and refresh the
+        cached values only once, when the block exits.
+        """
+        self._batch_depth += 1
+        try:
+            yield
+        finally:
+            self._batch_depth -= 1
+            if self._batch_depth == 0 and self._refresh_pending:
+                self._update_cache()
+
     def _refresh_cache(self):
+        if self._batch_depth > 0:
+            self._refresh_pending = True
+        else:
+            self._update_cache()
+
+    def _update_cache(self):
+        self._refresh_pending = False
         self._value_cache = self.parse_configuration()
 
 
@@ -298,6 +326,7 @@ class ImportOverrideStrategy(ConfigurationOverrideStrategy):
         self._group = group
         self._codec = codec
         self._requires_root = requires_root
+        self._file_cache = ParsedFileCache(codec)
 
     def apply(self, group_name, change_id, options):
         revision_file = self._find_revision_file(group_name, change_id)
@@ -311,18 +340,19 @@ class ImportOverrideStrategy(ConfigurationOverrideStrategy):
                 self._revision_ext)
         else:
             # Update the existing file.
-            current = operating_system.read_file(
-                revision_file, codec=self._codec)
+            current = self._file_cache.read(revision_file)
             options = guestagent_utils.update_dict(options, current)
 
-        operating_system.write_file(
-            revision_file, options, codec=self._codec,
-            as_root=self._requires_root)
-        operating_system.chown(
-            revision_file, self._owner, self._group,
-            as_root=self._requires_root)
-        operating_system.chmod(
-            revision_file, FileMode.ADD_READ_ALL, as_root=self._requires_root)
+        with root_helper.batch():
+            operating_system.write_file(
+                revision_file, options, codec=self._codec,
+                as_root=self._requires_root)
+            operating_system.chown(
+                revision_file, self._owner, self._group,
+                as_root=self._requires_root)
+            operating_system.chmod(
+                revision_file, FileMode.ADD_READ_ALL,
+                as_root=self._requires_root)
 
     def remove(self, group_name, change_id=None):
         removed = set()
@@ -338,11 +368,12 @@ class ImportOverrideStrategy(ConfigurationOverrideStrategy):
         for path in removed:
             operating_system.remove(path, force=True,
                                     as_root=self._requires_root)
+            self._file_cache.discard(path)
 
     def parse_updates(self):
         parsed_options = {}
         for path in self._collect_revision_files():
-            options = operating_system.read_file(path, codec=self._codec)
+            options = self._file_cache.read(path)
             guestagent_utils.update_dict(options, parsed_options)
 
         return parsed_options
@@ -434,6 +465,7 @@ class OneFileOverrideStrategy(ConfigurationOverrideStrategy):
         self._requires_root = requires_root
         self._base_revision_file = guestagent_utils.build_file_path(
             self._revision_dir, self.BASE_REVISION_NAME, self.REVISION_EXT)
+        self._file_cache = ParsedFileCache(codec)
 
         self._import_strategy.configure(
             base_config_path, owner, group, codec, requires_root)
@@ -451,6 +483,7 @@ class OneFileOverrideStrategy(ConfigurationOverrideStrategy):
             # configuration file on the first 'apply()'.
             operating_system.remove(self._base_revision_file, force=True,
                                     as_root=self._requires_root)
+            self._file_cache.discard(self._base_revision_file)
 
     def _regenerate_base_configuration(self):
         """Gather all configuration changes and apply them in order on the base
@@ -464,10 +497,55 @@ class OneFileOverrideStrategy(ConfigurationOverrideStrategy):
                 self._base_config_path, self._base_revision_file,
                 force=True, preserve=True, as_root=self._requires_root)
 
-        base_revision = operating_system.read_file(
-            self._base_revision_file, codec=self._codec)
+        base_revision = self._file_cache.read(self._base_revision_file)
         changes = self._import_strategy.parse_updates()
         updated_revision = guestagent_utils.update_dict(changes, base_revision)
         operating_system.write_file(
             self._base_config_path, updated_revision, codec=self._codec,
             as_root=self._requires_root)
+
+
+class ParsedFileCache(object):
+    """Keeps the parsed contents of configuration files so that a file
+    gets read and deserialized again only once it has changed on disk.
+
+    A file is considered unchanged as long as its inode, size and
+    modification time stay the same. Files modified less than
+    MIN_AGE seconds before being read are not cached as a later change
+    may not be reflected in their modification time yet.
+    """
+
+    MIN_AGE = 2
+
+    def __init__(self, codec):
+        """
+        :param codec                Codec used to deserialize the files.
+        :type codec                 StreamCodec
+        """
+        self._codec = codec
+        self._entries = {}
+
+    def read(self, path):
+        """Return the parsed contents of a given file.
+        The returned object can be freely modified by the caller.
+        """
+        try:
+            stat = os.stat(path)
+        except OSError:
+            self.discard(path)
+            return operating_system.read_file(path, codec=self._codec)
+
+        signature = (stat.st_ino, stat.st_size, stat.st_mtime)
+        entry = self._entries.get(path)
+        if entry is not None and entry[0] == signature:
+            return copy.deepcopy(entry[1])
+
+        contents = operating_system.read_file(path, codec=self._codec)
+        if time.time() - stat.st_mtime >= self.MIN_AGE:
+            self._entries[path] = (signature, copy.deepcopy(contents))
+        else:
+            self.discard(path)
+        return contents
+
+    def discard(self, path):
+        self._entries.pop(path, None)
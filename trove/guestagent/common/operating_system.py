@@ -27,6 +27,7 @@ from trove.common import exception
 from trove.common.i18n import _
 from trove.common.stream_codecs import IdentityCodec
 from trove.common import utils
+from trove.guestagent.common import root_helper
 
 REDHAT = 'redhat'
 DEBIAN = 'debian'
@@ -350,9 +351,10 @@ def create_directory(dir_path, user=None, group=None, force=True, **kwargs):
     """
 
     if dir_path:
-        _create_directory(dir_path, force, **kwargs)
-        if user or group:
-            chown(dir_path, user, group, **kwargs)
+        with root_helper.batch():
+            _create_directory(dir_path, force, **kwargs)
+            if user or group:
+                chown(dir_path, user, group, **kwargs)
     else:
         raise exception.UnprocessableEntity(
             _("Cannot create a blank directory."))
@@ -603,7 +605,11 @@ def _execute_shell_cmd(cmd, options, *args, **kwargs):
 
     cmd_flags = _build_command_options(options)
     cmd_args = cmd_flags + list(args)
-    utils.execute_with_timeout(cmd, *cmd_args, **exec_args)
+    if exec_args.get('run_as_root') and root_helper.is_enabled():
+        root_helper.execute(cmd, *cmd_args,
+                            timeout=exec_args.get('timeout', 30))
+    else:
+        utils.execute_with_timeout(cmd, *cmd_args, **exec_args)
 
 
 def _build_command_options(options):
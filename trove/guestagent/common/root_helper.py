@@ -0,0 +1,310 @@
+# Copyright 2015 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Long-lived helper process running the guest agent's root file commands.
+
+The guest agent starts the helper once through sudo and then sends it
+batches of file commands (chown, chmod, cp, ...) over a Unix socket
+instead of spawning a new sudo subprocess for every one of them.
+If the helper cannot be reached the commands are run through sudo as
+before.
+"""
+
+import contextlib
+import errno
+import json
+import os
+import socket
+import SocketServer
+import struct
+import subprocess
+import sys
+import threading
+import time
+
+from oslo_concurrency import processutils
+from oslo_log import log as logging
+
+from trove.common import cfg
+from trove.common import exception
+from trove.common.i18n import _
+from trove.common import utils
+
+CONF = cfg.CONF
+LOG = logging.getLogger(__name__)
+
+# Only the file commands issued by operating_system may be run by the helper.
+ALLOWED_COMMANDS = ('chmod', 'chown', 'cp', 'mkdir', 'mv', 'rm')
+
+# Not exposed by the Python 2 socket module.
+SO_PEERCRED = getattr(socket, 'SO_PEERCRED', 17)
+
+DEFAULT_TIMEOUT = 30
+
+
+class RootHelperUnavailable(Exception):
+    """The helper process could not be reached."""
+
+
+class _RequestHandler(SocketServer.StreamRequestHandler):
+
+    def handle(self):
+        line = self.rfile.readline()
+        if not line:
+            return
+        try:
+            commands = json.loads(line)['commands']
+            response = {'error': _run_commands(commands)}
+        except (ValueError, KeyError, TypeError) as e:
+            response = {'error': {'index': 0, 'cmd': '', 'exit_code': None,
+                                  'stdout': '', 'stderr': '',
+                                  'description': 'Invalid request: %s' % e}}
+        self.wfile.write(json.dumps(response) + '\n')
+
+
+def _run_commands(commands):
+    """Run the given commands in order, stopping at the first failure.
+
+    :returns: None on success, a description of the failed command
+              otherwise.
+    """
+    for index, cmd in enumerate(commands):
+        if not cmd or cmd[0] not in ALLOWED_COMMANDS:
+            return {'index': index, 'cmd': ' '.join(cmd), 'exit_code': None,
+                    'stdout': '', 'stderr': '',
+                    'description': 'Command not allowed: %s' % cmd[:1]}
+        try:
+            processutils.execute(*cmd)
+        except processutils.ProcessExecutionError as e:
+            return {'index': index, 'cmd': e.cmd, 'exit_code': e.exit_code,
+                    'stdout': e.stdout, 'stderr': e.stderr,
+                    'description': e.description}
+    return None
+
+
+class RootHelperServer(SocketServer.ThreadingUnixStreamServer):
+    """Serves command batches from the owner of the socket only."""
+
+    daemon_threads = True
+
+    def __init__(self, socket_path, owner_uid):
+        self.owner_uid = owner_uid
+        socket_dir = os.path.dirname(socket_path)
+        if socket_dir and not os.path.isdir(socket_dir):
+            os.makedirs(socket_dir, 0o755)
+        try:
+            os.unlink(socket_path)
+        except OSError as e:
+            if e.errno != errno.ENOENT:
+                raise
+        SocketServer.ThreadingUnixStreamServer.__init__(
+            self, socket_path, _RequestHandler)
+        os.chown(socket_path, owner_uid, -1)
+        os.chmod(socket_path, 0o600)
+
+    def verify_request(self, request, client_address):
+        creds = request.getsockopt(socket.SOL_SOCKET, SO_PEERCRED,
+                                   struct.calcsize('3i'))
+        _pid, uid, _gid = struct.unpack('3i', creds)
+        return uid in (0, self.owner_uid)
+
+
+def serve(socket_path, owner_uid, parent_pid, poll_interval=5):
+    """Serve requests until the parent guest agent process goes away."""
+    server = RootHelperServer(socket_path, owner_uid)
+    server.timeout = poll_interval
+    try:
+        while _is_running(parent_pid):
+            server.handle_request()
+    finally:
+        server.server_close()
+        try:
+            os.unlink(socket_path)
+        except OSError:
+            pass
+
+
+def _is_running(pid):
+    try:
+        os.kill(pid, 0)
+        return True
+    except OSError as e:
+        return e.errno == errno.EPERM
+
+
+class RootHelperClient(object):
+    """Sends command batches to the helper, starting it on first use."""
+
+    def __init__(self, socket_path, start_timeout):
+        self._socket_path = socket_path
+        self._start_timeout = start_timeout
+        self._started = False
+
+    def run(self, commands, timeout=DEFAULT_TIMEOUT):
+        """Run the given commands as root, in order.
+
+        :raises: :class:`RootHelperUnavailable` if nothing was sent to the
+                 helper.
+        :raises: :class:`ProcessExecutionError` if a command failed.
+        """
+        sock = self._connect()
+        try:
+            sock.settimeout(timeout)
+            sock.sendall(json.dumps({'commands': commands}) + '\n')
+            response = sock.makefile('r').readline()
+        except socket.timeout:
+            msg = (_("Time out after waiting %(time)s seconds when running "
+                     "commands through the root helper: %(cmds)s.") %
+                   {'time': timeout, 'cmds': commands})
+            LOG.error(msg)
+            raise exception.ProcessExecutionError(msg)
+        except socket.error as e:
+            # The commands may have been partially run, do not retry them.
+            raise exception.ProcessExecutionError(
+                _("Root helper connection failed: %s") % e)
+        finally:
+            sock.close()
+
+        if not response:
+            raise exception.ProcessExecutionError(
+                _("Root helper closed the connection."))
+        error = json.loads(response)['error']
+        if error:
+            raise exception.ProcessExecutionError(
+                stdout=error['stdout'], stderr=error['stderr'],
+                exit_code=error['exit_code'], cmd=error['cmd'],
+                description=error['description'])
+
+    def _connect(self):
+        try:
+            return self._try_connect()
+        except socket.error:
+            pass
+
+        # Only the first caller starts the helper, the others fall back to
+        # sudo meanwhile.
+        if not self._started:
+            self._started = True
+            return self._start()
+        raise RootHelperUnavailable(
+            _("Root helper is not listening on %s.") % self._socket_path)
+
+    def _try_connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.connect(self._socket_path)
+        except socket.error:
+            sock.close()
+            raise
+        return sock
+
+    def _start(self):
+        LOG.debug("Starting the root helper on %s." % self._socket_path)
+        try:
+            process = subprocess.Popen(
+                ['sudo', '-n', sys.executable, '-m', __name__,
+                 self._socket_path, str(os.getuid()), str(os.getpid())],
+                close_fds=True)
+        except OSError as e:
+            raise RootHelperUnavailable(
+                _("Could not start the root helper: %s") % e)
+
+        deadline = time.time() + self._start_timeout
+        while process.poll() is None and time.time() < deadline:
+            try:
+                return self._try_connect()
+            except socket.error:
+                time.sleep(0.1)
+        raise RootHelperUnavailable(
+            _("Root helper did not start listening on %s.")
+            % self._socket_path)
+
+
+_client = None
+_batch = threading.local()
+
+
+def _get_client():
+    global _client
+    if _client is None:
+        _client = RootHelperClient(CONF.guest_root_helper_socket,
+                                   CONF.guest_root_helper_start_timeout)
+    return _client
+
+
+def is_enabled():
+    return CONF.guest_root_helper
+
+
+def execute(*cmd, **kwargs):
+    """Run a command as root through the helper.
+
+    Inside a 'batch' the command is deferred until the batch ends.
+    The command is run through sudo if the helper is unavailable.
+    """
+    timeout = kwargs.pop('timeout', DEFAULT_TIMEOUT)
+    if kwargs:
+        raise processutils.UnknownArgumentError(
+            _("Got unknown keyword args: %r") % kwargs)
+
+    commands = getattr(_batch, 'commands', None)
+    if commands is not None:
+        commands.append((list(cmd), timeout))
+    else:
+        _run([(list(cmd), timeout)])
+
+
+@contextlib.contextmanager
+def batch():
+    """Send all root commands issued in the block to the helper at once.
+
+    The commands are run when the block exits, and dropped if it raises.
+    Commands not run as root are not deferred. Nested blocks join the
+    outermost one.
+    """
+    if not is_enabled() or getattr(_batch, 'commands', None) is not None:
+        yield
+        return
+
+    _batch.commands = []
+    try:
+        yield
+        commands = _batch.commands
+    finally:
+        _batch.commands = None
+    if commands:
+        _run(commands)
+
+
+def _run(commands):
+    timeouts = [timeout for _cmd, timeout in commands]
+    total_timeout = None if None in timeouts else sum(timeouts)
+    try:
+        _get_client().run([cmd for cmd, _timeout in commands],
+                          timeout=total_timeout)
+    except RootHelperUnavailable as e:
+        LOG.debug("Running commands through sudo: %s" % e)
+        for cmd, timeout in commands:
+            utils.execute_with_timeout(*cmd, run_as_root=True,
+                                       root_helper='sudo', timeout=timeout)
+
+
+def main():
+    socket_path, owner_uid, parent_pid = sys.argv[1:4]
+    serve(socket_path, int(owner_uid), int(parent_pid))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,307 @@
+# Copyright 2015 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""In-process stages for backup and restore streams.
+
+The stages produce the same formats as the 'gzip' and
+'openssl enc -aes-256-cbc -salt' pipes they replace, so a backup written
+by either path can be restored by the other.
+"""
+
+import collections
+import hashlib
+import os
+import time
+import zlib
+
+import six
+
+try:
+    from cryptography.hazmat.backends import default_backend
+    from cryptography.hazmat.primitives.ciphers import algorithms
+    from cryptography.hazmat.primitives.ciphers import Cipher
+    from cryptography.hazmat.primitives.ciphers import modes
+    from cryptography.hazmat.primitives import padding
+except ImportError:
+    Cipher = None
+
+# Whether the encryption stages can be used in this environment
+ENCRYPTION_AVAILABLE = Cipher is not None
+
+# Header written by 'openssl enc -salt' ahead of the salt
+OPENSSL_SALT_MAGIC = b'Salted__'
+SALT_SIZE = 8
+AES_KEY_SIZE = 32
+AES_BLOCK_SIZE = 16
+
+
+class StreamError(Exception):
+    """Error processing a backup stream."""
+
+
+def _view(buf, length):
+    """Zero-copy, read-only view of the first length bytes of buf."""
+    if six.PY2:
+        return buffer(buf, 0, length)
+    return memoryview(buf)[:length]
+
+
+class Stage(object):
+    """Base class for a stream transformation.
+
+    Keeps track of the bytes going in and out of the stage and the time
+    spent in it so the throughput of each stage can be reported.
+    """
+
+    name = None
+
+    def __init__(self):
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.elapsed = 0.0
+
+    def process(self, data):
+        start = time.time()
+        result = self._process(data)
+        self.elapsed += time.time() - start
+        self.bytes_in += len(data)
+        self.bytes_out += len(result)
+        return result
+
+    def finish(self):
+        """Return any data still held by the stage at the end of stream."""
+        start = time.time()
+        result = self._finish()
+        self.elapsed += time.time() - start
+        self.bytes_out += len(result)
+        return result
+
+    @property
+    def throughput(self):
+        """Input processed by the stage, in MB/s."""
+        if not self.elapsed:
+            return 0.0
+        return self.bytes_in / self.elapsed / (1024 ** 2)
+
+    def stats(self):
+        return {'stage': self.name,
+                'bytes_in': self.bytes_in,
+                'bytes_out': self.bytes_out,
+                'elapsed': self.elapsed,
+                'throughput': self.throughput}
+
+    def _process(self, data):
+        raise NotImplementedError()
+
+    def _finish(self):
+        return b''
+
+
+class GzipStage(Stage):
+    """Compress to the gzip format."""
+
+    name = 'gzip'
+
+    def __init__(self, level=None):
+        super(GzipStage, self).__init__()
+        self._compressor = zlib.compressobj(
+            level or zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED,
+            16 + zlib.MAX_WBITS)
+
+    def _process(self, data):
+        return self._compressor.compress(data)
+
+    def _finish(self):
+        return self._compressor.flush()
+
+
+class GunzipStage(Stage):
+    """Decompress from the gzip format."""
+
+    name = 'gunzip'
+
+    def __init__(self):
+        super(GunzipStage, self).__init__()
+        self._decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+
+    def _process(self, data):
+        return self._decompressor.decompress(data)
+
+    def _finish(self):
+        return self._decompressor.flush()
+
+
+def _evp_bytes_to_key(password, salt):
+    """Derive the key and IV the way 'openssl enc' (1.0) does by default.
+
+    This is EVP_BytesToKey with a single round of MD5.
+    """
+    if isinstance(password, six.text_type):
+        password = password.encode('utf-8')
+    derived = b''
+    block = b''
+    while len(derived) < AES_KEY_SIZE + AES_BLOCK_SIZE:
+        block = hashlib.md5(block + password + salt).digest()
+        derived += block
+    return (derived[:AES_KEY_SIZE],
+            derived[AES_KEY_SIZE:AES_KEY_SIZE + AES_BLOCK_SIZE])
+
+
+def _aes_cbc(password, salt):
+    key, iv = _evp_bytes_to_key(password, salt)
+    return Cipher(algorithms.AES(key), modes.CBC(iv),
+                  backend=default_backend())
+
+
+class EncryptStage(Stage):
+    """Encrypt like 'openssl enc -aes-256-cbc -salt -pass pass:<key>'."""
+
+    name = 'encrypt'
+
+    def __init__(self, key, salt=None):
+        super(EncryptStage, self).__init__()
+        if not ENCRYPTION_AVAILABLE:
+            raise StreamError("The cryptography library is required to "
+                              "encrypt backups in process.")
+        salt = salt or os.urandom(SALT_SIZE)
+        self._encryptor = _aes_cbc(key, salt).encryptor()
+        self._padder = padding.PKCS7(AES_BLOCK_SIZE * 8).padder()
+        self._header = OPENSSL_SALT_MAGIC + salt
+
+    def _process(self, data):
+        result = self._encryptor.update(self._padder.update(bytes(data)))
+        if self._header:
+            result = self._header + result
+            self._header = None
+        return result
+
+    def _finish(self):
+        result = (self._encryptor.update(self._padder.finalize()) +
+                  self._encryptor.finalize())
+        if self._header:
+            result = self._header + result
+            self._header = None
+        return result
+
+
+class DecryptStage(Stage):
+    """Decrypt the output of 'openssl enc -aes-256-cbc -salt'."""
+
+    name = 'decrypt'
+
+    def __init__(self, key):
+        super(DecryptStage, self).__init__()
+        if not ENCRYPTION_AVAILABLE:
+            raise StreamError("The cryptography library is required to "
+                              "decrypt backups in process.")
+        self._key = key
+        self._header = b''
+        self._decryptor = None
+        self._unpadder = padding.PKCS7(AES_BLOCK_SIZE * 8).unpadder()
+
+    def _process(self, data):
+        data = bytes(data)
+        if self._decryptor is None:
+            # The salt header may be split across chunks
+            self._header += data
+            header_size = len(OPENSSL_SALT_MAGIC) + SALT_SIZE
+            if len(self._header) < header_size:
+                return b''
+            if not self._header.startswith(OPENSSL_SALT_MAGIC):
+                raise StreamError("The backup stream is not salted.")
+            salt = self._header[len(OPENSSL_SALT_MAGIC):header_size]
+            data = self._header[header_size:]
+            self._decryptor = _aes_cbc(self._key, salt).decryptor()
+        return self._unpadder.update(self._decryptor.update(data))
+
+    def _finish(self):
+        if self._decryptor is None:
+            raise StreamError("The backup stream ended before the salt.")
+        try:
+            return (self._unpadder.update(self._decryptor.finalize()) +
+                    self._unpadder.finalize())
+        except ValueError:
+            raise StreamError("Bad decrypt; the backup stream is truncated "
+                              "or the key is wrong.")
+
+
+class StreamPipeline(object):
+    """Pull data from a source through a chain of stages.
+
+    The source is either a file-like object or an iterable of chunks. File
+    sources supporting readinto are read into a single reusable buffer that
+    is handed to the first stage without copying, so the data is only
+    touched by the stages themselves.
+    """
+
+    def __init__(self, source, stages, buffer_size=2 ** 16):
+        if not stages:
+            raise StreamError("A stream pipeline needs at least one stage.")
+        self.stages = stages
+        self.end_of_stream = False
+        self._pending = collections.deque()
+        if hasattr(source, 'read'):
+            self._source = source
+            self._chunks = None
+            self._buffer = bytearray(buffer_size)
+            self._readinto = getattr(source, 'readinto', None)
+        else:
+            self._chunks = iter(source)
+
+    def _read_source(self):
+        if self._chunks is not None:
+            return next(self._chunks, b'')
+        if self._readinto is not None:
+            length = self._readinto(self._buffer)
+            return _view(self._buffer, length) if length else b''
+        return self._source.read(len(self._buffer))
+
+    def _fill(self):
+        data = self._read_source()
+        if data:
+            for stage in self.stages:
+                data = stage.process(data)
+                if not data:
+                    break
+        else:
+            # Flush every stage through the stages that follow it
+            self.end_of_stream = True
+            for stage in self.stages:
+                data = (stage.process(data) if data else b'') + stage.finish()
+        if data:
+            self._pending.append(data)
+
+    def read(self, chunk_size):
+        """Return up to chunk_size bytes; an empty result is end of stream."""
+        while not self._pending and not self.end_of_stream:
+            self._fill()
+        if not self._pending:
+            return b''
+        chunk = self._pending.popleft()
+        if len(chunk) > chunk_size:
+            self._pending.appendleft(chunk[chunk_size:])
+            chunk = chunk[:chunk_size]
+        return chunk
+
+    def __iter__(self):
+        while True:
+            while not self._pending and not self.end_of_stream:
+                self._fill()
+            if not self._pending:
+                return
+            yield self._pending.popleft()
+
+    def stats(self):
+        return [stage.stats() for stage in self.stages]
@@ -221,11 +221,35 @@ class CouchbaseApp(object):
         return
 
 
+class CouchbaseStatusProbe(service.HttpStatusProbe):
+    """Reads the cluster membership of the node from the REST API."""
+
+    name = 'couchbase'
+
+    def __init__(self, timeout):
+        super(CouchbaseStatusProbe, self).__init__(
+            timeout, 'localhost', int(system.COUCHBASE_WEBADMIN_PORT))
+
+    def _check(self):
+        node = self._get_json('/nodes/self', 'root',
+                              CouchbaseRootAccess.get_password())
+        if node["clusterMembership"] == "active":
+            return rd_instance.ServiceStatuses.RUNNING
+        return rd_instance.ServiceStatuses.SHUTDOWN
+
+
 class CouchbaseAppStatus(service.BaseDbStatus):
     """
     Handles all of the status updating for the couchbase guest agent.
     """
+    def _create_status_probe(self):
+        return CouchbaseStatusProbe(CONF.status_probe_timeout)
+
     def _get_actual_db_status(self):
+        status = self._probe_db_status()
+        if status is not None:
+            return status
+
         self.ip_address = netutils.get_my_ipv4()
         pwd = None
         try:
@@ -17,6 +17,7 @@ CONF = cfg.CONF
 
 TIME_OUT = 1200
 COUCHBASE_DUMP_DIR = '/tmp/backups'
+COUCHBASE_BUCKETS_DUMP_DIR = COUCHBASE_DUMP_DIR + '/buckets'
 COUCHBASE_CONF_DIR = '/etc/couchbase'
 COUCHBASE_WEBADMIN_PORT = '8091'
 COUCHBASE_REST_API = 'http://localhost:' + COUCHBASE_WEBADMIN_PORT
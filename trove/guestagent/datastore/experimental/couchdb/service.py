@@ -212,6 +212,21 @@ class CouchDBApp(object):
         self.start_db(True)
 
 
+class CouchDBStatusProbe(service.HttpStatusProbe):
+    """Reads the welcome message of the CouchDB server."""
+
+    name = 'couchdb'
+
+    def __init__(self, timeout):
+        super(CouchDBStatusProbe, self).__init__(
+            timeout, '127.0.0.1', int(system.COUCHDB_HTTPD_PORT))
+
+    def _check(self):
+        if self._get_json('/')["couchdb"] == 'Welcome':
+            return rd_instance.ServiceStatuses.RUNNING
+        return rd_instance.ServiceStatuses.SHUTDOWN
+
+
 class CouchDBAppStatus(service.BaseDbStatus):
     """
         Handles all of the status updating for the CouchDB guest agent.
@@ -220,7 +235,14 @@ class CouchDBAppStatus(service.BaseDbStatus):
         The response will be similar to:
           {"couchdb":"Welcome","version":"1.6.0"}
     """
+    def _create_status_probe(self):
+        return CouchDBStatusProbe(CONF.status_probe_timeout)
+
     def _get_actual_db_status(self):
+        status = self._probe_db_status()
+        if status is not None:
+            return status
+
         try:
             out, err = utils.execute_with_timeout(
                 system.COUCHDB_SERVER_STATUS, shell=True
@@ -15,6 +15,7 @@
 
 import json
 import os
+import pipes
 import re
 import tempfile
 
@@ -340,6 +341,15 @@ class MongoDBApp(object):
     def admin_cmd_auth_params(self):
         return MongoDBAdmin().cmd_admin_auth_params
 
+    def archive_cmd(self, tool):
+        """Shell command running a MongoDB tool (mongodump, mongorestore)
+        on a single archive written to its stdout or read from its stdin.
+        Log output is silenced so that only errors go to stderr.
+        """
+        params = ' '.join(pipes.quote(param)
+                          for param in self.admin_cmd_auth_params())
+        return '%s --archive --quiet %s' % (tool, params)
+
     def get_key_file(self):
         return system.MONGO_KEY_FILE
 
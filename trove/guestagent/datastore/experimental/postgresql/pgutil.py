@@ -17,14 +17,27 @@ import os
 import tempfile
 import uuid
 
+from eventlet import hubs
 from oslo_log import log as logging
 
+try:
+    import psycopg2
+    from psycopg2 import extensions as pg_extensions
+except ImportError:
+    psycopg2 = None
+
+from trove.common import cfg
+from trove.common import exception
 from trove.common import utils
 from trove.guestagent.common import operating_system
 from trove.guestagent.common.operating_system import FileMode
 
+CONF = cfg.CONF
 LOG = logging.getLogger(__name__)
 
+# Number of rows fetched at a time from a server-side cursor.
+CURSOR_ITERSIZE = 500
+
 
 def execute(*command, **kwargs):
     """Execute a command as the 'postgres' user."""
@@ -55,27 +68,232 @@ def result(filename):
     with open(filename, 'r+') as file_handle:
         for line in file_handle:
             if line != "":
-                yield line.split(',')
+                yield line.rstrip('\n').split(',')
     operating_system.remove(filename, as_root=True)
-    raise StopIteration()
+
+
+def _green_wait(conn, timeout=None):
+    """Wait for a psycopg2 connection by yielding to other greenthreads
+    instead of blocking the whole guest agent.
+    """
+
+    while True:
+        state = conn.poll()
+        if state == pg_extensions.POLL_OK:
+            return
+        elif state == pg_extensions.POLL_READ:
+            hubs.trampoline(conn.fileno(), read=True)
+        elif state == pg_extensions.POLL_WRITE:
+            hubs.trampoline(conn.fileno(), write=True)
+        else:
+            raise psycopg2.OperationalError(
+                "Bad result from poll: %r" % state)
+
+
+class ConnectionPool(object):
+    """Keeps long-lived local connections to the database.
+
+    A new connection is opened whenever no idle one is left, so nested
+    queries never wait on the pool. At most 'size' idle connections are
+    kept open.
+    """
+
+    def __init__(self, size, **connect_args):
+        self._size = size
+        self._connect_args = connect_args
+        self._idle = []
+
+    def get(self):
+        while self._idle:
+            conn = self._idle.pop()
+            if not conn.closed:
+                return conn
+        return psycopg2.connect(**self._connect_args)
+
+    def put(self, conn):
+        if conn.closed:
+            return
+        if len(self._idle) < self._size:
+            self._idle.append(conn)
+        else:
+            conn.close()
+
+    def discard(self, conn):
+        try:
+            conn.close()
+        except psycopg2.Error:
+            pass
+
+
+_pool = None
+# Set once the server rejects the pool's authentication.
+_pool_disabled = False
+
+# Fragments of the server messages for a rejected authentication.
+AUTH_FAILURE_MESSAGES = ('authentication failed', 'pg_hba.conf')
+
+
+def _get_pool():
+    """Return the connection pool or None if queries should go through
+    the psql client.
+    """
+
+    global _pool
+    if _pool_disabled:
+        return None
+    if _pool is None and psycopg2 is not None:
+        ds_conf = CONF.get(CONF.datastore_manager)
+        if ds_conf.connection_pool_size > 0:
+            pg_extensions.set_wait_callback(_green_wait)
+            _pool = ConnectionPool(
+                ds_conf.connection_pool_size, database='postgres',
+                user=ds_conf.connection_user, host=ds_conf.socket_dir)
+    return _pool
+
+
+def _connect(pool):
+    """Take a connection from the pool or return None if none can be made.
+    """
+
+    global _pool_disabled
+    try:
+        return pool.get()
+    except psycopg2.Error as e:
+        if any(msg in str(e) for msg in AUTH_FAILURE_MESSAGES):
+            LOG.warning('Local db rejected the connection pool '
+                        'authentication, running all statements through '
+                        'psql from now on: {0}'.format(e))
+            _pool_disabled = True
+        else:
+            LOG.debug('Falling back to psql, cannot connect to local db: '
+                      '{0}'.format(e))
+        return None
+
+
+def _statement_error(statement, error):
+    return exception.ProcessExecutionError(
+        cmd=statement, stderr=str(error),
+        description='Local db statement failed.')
+
+
+def _prepare_cursor(conn, timeout, name=None):
+    """Get a cursor on a connection, limiting the statement run time."""
+
+    with conn.cursor() as cursor:
+        cursor.execute('SET statement_timeout = %s',
+                       ((timeout or 0) * 1000,))
+    return conn.cursor(name=name)
+
+
+def _execute_on_connection(pool, conn, statement, timeout):
+    try:
+        conn.autocommit = True
+        with _prepare_cursor(conn, timeout) as cursor:
+            cursor.execute(statement)
+            status = cursor.statusmessage
+    except psycopg2.Error as e:
+        pool.discard(conn)
+        raise _statement_error(statement, e)
+    pool.put(conn)
+    return status, ''
+
+
+def _query_on_connection(pool, conn, statement, timeout):
+    try:
+        conn.autocommit = False
+        cursor = _prepare_cursor(conn, timeout,
+                                 name='trove_%s' % uuid.uuid4().hex)
+        cursor.itersize = CURSOR_ITERSIZE
+        cursor.execute(statement)
+    except psycopg2.Error as e:
+        pool.discard(conn)
+        raise _statement_error(statement, e)
+    return _fetch(pool, conn, cursor, statement)
+
+
+def _csv_value(value):
+    """Format a column value the way the psql CSV output does."""
+
+    if value is None:
+        return ''
+    elif isinstance(value, bool):
+        return 't' if value else 'f'
+    return str(value)
+
+
+def _fetch(pool, conn, cursor, statement):
+    """A generator over the rows of a server-side cursor that returns
+    the connection to the pool once done.
+
+    Rows are lists of strings like the ones read from the CSV output of
+    the psql client, so callers get the same values on either path.
+    """
+
+    released = False
+    try:
+        for row in cursor:
+            yield [_csv_value(value) for value in row]
+        cursor.close()
+        conn.rollback()
+        pool.put(conn)
+        released = True
+    except psycopg2.Error as e:
+        raise _statement_error(statement, e)
+    finally:
+        if not released:
+            pool.discard(conn)
 
 
 def psql(statement, timeout=30):
-    """Execute a statement using the psql client."""
+    """Execute a statement on the local db.
+
+    The statement is run on a pooled local connection if possible and
+    through the psql client otherwise.
+    """
 
     LOG.debug('Sending to local db: {0}'.format(statement))
+    pool = _get_pool()
+    conn = _connect(pool) if pool else None
+    if conn is not None:
+        return _execute_on_connection(pool, conn, statement, timeout)
     return execute('psql', '-c', statement, timeout=timeout)
 
 
 def query(statement, timeout=30):
     """Execute a pgsql query and get a generator of results.
 
-    This method will pipe a CSV format of the query results into a temporary
-    file. The return value is a generator object that feeds from this file.
+    The query is run through a server-side cursor on a pooled local
+    connection if possible. Otherwise this method will pipe a CSV format
+    of the query results into a temporary file and the returned
+    generator feeds from this file.
     """
 
-    filename = os.path.join(tempfile.gettempdir(), str(uuid.uuid4()))
     LOG.debug('Querying: {0}'.format(statement))
+    pool = _get_pool()
+    if pool is not None:
+        return _pooled_query(pool, statement, timeout)
+    return _psql_query(statement, timeout)
+
+
+def _pooled_query(pool, statement, timeout):
+    """A generator over the results of a query on a pooled connection.
+
+    The connection is only checked out once iteration starts, so a result
+    that is never iterated does not hold a connection or an open
+    transaction.
+    """
+
+    conn = _connect(pool)
+    if conn is None:
+        rows = _psql_query(statement, timeout)
+    else:
+        rows = _query_on_connection(pool, conn, statement, timeout)
+    for row in rows:
+        yield row
+
+
+def _psql_query(statement, timeout):
+    filename = os.path.join(tempfile.gettempdir(), str(uuid.uuid4()))
     psql(
         "Copy ({statement}) To '{filename}' With CSV".format(
             statement=statement,
@@ -103,8 +103,10 @@ class Manager(periodic_task.PeriodicTasks):
                 LOG.debug('Mounted the volume.')
             self._app.install_if_needed(packages)
             LOG.info(_('Writing redis configuration.'))
-            self._app.configuration_manager.save_configuration(config_contents)
-            self._app.apply_initial_guestagent_configuration()
+            with self._app.configuration_manager.batch_update():
+                self._app.configuration_manager.save_configuration(
+                    config_contents)
+                self._app.apply_initial_guestagent_configuration()
             self._app.restart()
             LOG.info(_('Redis instance has been setup and configured.'))
         except Exception:
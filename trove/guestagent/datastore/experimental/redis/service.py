@@ -238,10 +238,11 @@ class RedisApp(object):
             LOG.debug(format, self.status)
             raise RuntimeError(format % self.status)
         LOG.info(_("Initiating config."))
-        self.configuration_manager.save_configuration(config_contents)
-        # The configuration template has to be updated with
-        # guestagent-controlled settings.
-        self.apply_initial_guestagent_configuration()
+        with self.configuration_manager.batch_update():
+            self.configuration_manager.save_configuration(config_contents)
+            # The configuration template has to be updated with
+            # guestagent-controlled settings.
+            self.apply_initial_guestagent_configuration()
         self.start_redis(True)
 
     def reset_configuration(self, configuration):
@@ -179,6 +179,38 @@ def get_datadir(reset_cache=False):
     return DATADIR
 
 
+class MySqlStatusProbe(service.StatusProbe):
+    """Pings MySQL over a pooled connection of the admin user."""
+
+    name = 'mysql'
+
+    def __init__(self, timeout):
+        super(MySqlStatusProbe, self).__init__(timeout)
+        self._engine = None
+
+    def _check(self):
+        if self._engine is None:
+            self._engine = sqlalchemy.create_engine(
+                "mysql://%s:%s@localhost:3306" % (ADMIN_USER_NAME,
+                                                  get_auth_password()),
+                pool_size=1, pool_recycle=7200,
+                connect_args={'connect_timeout': self.timeout,
+                              'read_timeout': self.timeout},
+                listeners=[KeepAliveConnection()])
+        connection = self._engine.connect()
+        try:
+            connection.execute(text("SELECT 1"))
+        finally:
+            connection.close()
+        return rd_instance.ServiceStatuses.RUNNING
+
+    def close(self):
+        if self._engine is not None:
+            self._engine.dispose()
+            # Rebuilt with the current admin password by the next probe
+            self._engine = None
+
+
 class MySqlAppStatus(service.BaseDbStatus):
     @classmethod
     def get(cls):
@@ -186,7 +218,15 @@ class MySqlAppStatus(service.BaseDbStatus):
             cls._instance = MySqlAppStatus()
         return cls._instance
 
+    def _create_status_probe(self):
+        return MySqlStatusProbe(CONF.status_probe_timeout)
+
     def _get_actual_db_status(self):
+        # Only the command line tools tell a blocked or crashed server
+        # from a stopped one.
+        if self._probe_db_status() == rd_instance.ServiceStatuses.RUNNING:
+            LOG.info(_("MySQL Service Status is RUNNING."))
+            return rd_instance.ServiceStatuses.RUNNING
         try:
             out, err = utils.execute_with_timeout(
                 "/usr/bin/mysqladmin",
@@ -271,6 +311,34 @@ class MySqlAdmin(object):
                     mysql_db.name = db['table_schema']
                     user.databases.append(mysql_db.serialize())
 
+    def _associate_users_dbs(self, client, users):
+        """Internal. Populate the databases attribute of several MySQLUsers
+        with a single query.
+        """
+        if not users:
+            return
+        grantees = dict(("'%s'@'%s'" % (user.name, user.host), user)
+                        for user in users)
+        LOG.debug("Associating dbs to %d users." % len(grantees))
+        params = dict(('grantee%d' % index, grantee)
+                      for index, grantee in enumerate(sorted(grantees)))
+        q = sql_query.Query()
+        q.columns = ["grantee", "table_schema"]
+        q.tables = ["information_schema.SCHEMA_PRIVILEGES"]
+        q.group = ["grantee", "table_schema"]
+        q.where = ["privilege_type != 'USAGE'",
+                   "grantee IN (%s)" % ", ".join(
+                       ":%s" % param for param in sorted(params))]
+        t = text(str(q))
+        db_result = client.execute(t, **params)
+        for db in db_result:
+            LOG.debug("\t db: %s." % db)
+            user = grantees.get(db['grantee'])
+            if user is not None:
+                mysql_db = models.MySQLDatabase()
+                mysql_db.name = db['table_schema']
+                user.databases.append(mysql_db.serialize())
+
     def change_passwords(self, users):
         """Change the passwords of one or more existing users."""
         LOG.debug("Changing the password of some users.")
@@ -536,9 +604,11 @@ class MySqlAdmin(object):
                 mysql_user = models.MySQLUser()
                 mysql_user.name = row['User']
                 mysql_user.host = row['Host']
-                self._associate_dbs(mysql_user)
                 next_marker = row['Marker']
-                users.append(mysql_user.serialize())
+                users.append(mysql_user)
+            # Look up the databases of the whole page at once
+            self._associate_users_dbs(client, users)
+            users = [user.serialize() for user in users]
         if result.rowcount <= limit:
             next_marker = None
         LOG.debug("users = " + str(users))
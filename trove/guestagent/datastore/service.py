@@ -14,6 +14,9 @@
 #    under the License.
 
 
+import base64
+import httplib
+import json
 import time
 
 from oslo_log import log as logging
@@ -29,6 +32,78 @@ LOG = logging.getLogger(__name__)
 CONF = cfg.CONF
 
 
+class StatusProbe(object):
+    """
+    Determines the status of the DB application from within the guest
+    agent, over a connection kept open between probes.
+
+    Subclasses implement _check(), which returns the status or raises if
+    the status could not be determined. The time taken by the last probe
+    is kept in 'latency'.
+    """
+
+    name = None
+
+    def __init__(self, timeout):
+        self.timeout = timeout
+        self.latency = None
+
+    def probe(self):
+        """Return the status of the DB application, or None if the probe
+        could not determine it.
+        """
+        start = time.time()
+        try:
+            return self._check()
+        except Exception as e:
+            LOG.debug("Status probe %(name)s failed: %(error)s" %
+                      {'name': self.name, 'error': e})
+            self.close()
+            return None
+        finally:
+            self.latency = time.time() - start
+            LOG.debug("Status probe %(name)s took %(latency).3f seconds." %
+                      {'name': self.name, 'latency': self.latency})
+
+    def _check(self):
+        raise NotImplementedError()
+
+    def close(self):
+        """Drop the connection, the next probe opens a new one."""
+        pass
+
+
+class HttpStatusProbe(StatusProbe):
+    """Probes the DB application over a keep-alive HTTP connection."""
+
+    def __init__(self, timeout, host, port):
+        super(HttpStatusProbe, self).__init__(timeout)
+        self.host = host
+        self.port = port
+        self._connection = None
+
+    def _get_json(self, path, user=None, password=None):
+        if self._connection is None:
+            self._connection = httplib.HTTPConnection(
+                self.host, self.port, timeout=self.timeout)
+        headers = {}
+        if user is not None:
+            headers['Authorization'] = 'Basic %s' % base64.b64encode(
+                '%s:%s' % (user, password))
+        self._connection.request('GET', path, headers=headers)
+        response = self._connection.getresponse()
+        body = response.read()
+        if response.status != httplib.OK:
+            raise httplib.HTTPException(
+                "GET %s returned %s" % (path, response.status))
+        return json.loads(body)
+
+    def close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+
 class BaseDbStatus(object):
     """
     Answers the question "what is the status of the DB application on
@@ -47,9 +122,16 @@ class BaseDbStatus(object):
     These modes are exited and functionality to update() returns when
     end_install_or_restart() is called, at which point the status again
     reflects the actual status of the DB app.
+    update() reports status changes at once. An unchanged status is
+    reported again at an interval doubling from report_interval up to
+    agent_keepalive_max_interval, which keeps the guest alive for the
+    conductor.
 
     This is a base class, subclasses must implement real logic for
     determining current status of DB in _get_actual_db_status()
+    Subclasses may also provide a StatusProbe in _create_status_probe(),
+    which _get_actual_db_status() consults through _probe_db_status()
+    before falling back to the command line tools.
     """
 
     _instance = None
@@ -59,6 +141,9 @@ class BaseDbStatus(object):
             raise RuntimeError("Cannot instantiate twice.")
         self.status = None
         self.restart_mode = False
+        self._probe = None
+        self._last_heartbeat = None
+        self._heartbeat_interval = CONF.report_interval
 
     def begin_install(self):
         """Called right before DB is prepared."""
@@ -82,6 +167,22 @@ class BaseDbStatus(object):
     def _get_actual_db_status(self):
         raise NotImplementedError()
 
+    def _create_status_probe(self):
+        """Return the StatusProbe of the datastore, if it has one."""
+        return None
+
+    def _probe_db_status(self):
+        """Return the status reported by the in-process probe, or None if
+        it is disabled or could not determine the status.
+        """
+        if not CONF.status_probe_enabled:
+            return None
+        if self._probe is None:
+            self._probe = self._create_status_probe()
+            if self._probe is None:
+                return None
+        return self._probe.probe()
+
     @property
     def is_installed(self):
         """
@@ -115,8 +216,25 @@ class BaseDbStatus(object):
                                              heartbeat,
                                              sent=timeutils.float_utcnow())
         LOG.debug("Successfully cast set_status.")
+        if status == self.status and self._last_heartbeat is not None:
+            self._heartbeat_interval = min(
+                self._heartbeat_interval * 2,
+                max(CONF.agent_keepalive_max_interval, CONF.report_interval))
+        else:
+            self._heartbeat_interval = CONF.report_interval
+        self._last_heartbeat = time.time()
         self.status = status
 
+    @property
+    def _heartbeat_due(self):
+        """True if an unchanged status should be reported again."""
+        if self._last_heartbeat is None:
+            return True
+        # Allow for the periodic task firing a bit early.
+        elapsed = (time.time() - self._last_heartbeat +
+                   CONF.report_interval / 2.0)
+        return elapsed >= self._heartbeat_interval
+
     def update(self):
         """Find and report status of DB on this machine.
         The database is updated and the status is also returned.
@@ -124,7 +242,11 @@ class BaseDbStatus(object):
         if self.is_installed and not self._is_restarting:
             LOG.debug("Determining status of DB server.")
             status = self._get_actual_db_status()
-            self.set_status(status)
+            if status != self.status or self._heartbeat_due:
+                self.set_status(status)
+            else:
+                LOG.debug("DB status %s unchanged, skipping heartbeat."
+                          % status)
         else:
             LOG.info(_("DB server is not installed or is in restart mode, so "
                        "for now we'll skip determining the status of DB on "
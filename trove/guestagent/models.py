@@ -28,13 +28,22 @@ LOG = logging.getLogger(__name__)
 
 CONF = cfg.CONF
 
-AGENT_HEARTBEAT = CONF.agent_heartbeat_time
-
 
 def persisted_models():
     return {'agent_heartbeats': AgentHeartBeat}
 
 
+def heartbeat_expiry():
+    """Time after which a guest that sent no heartbeat is unreachable.
+
+    Guests whose status does not change only send a heartbeat every
+    agent_keepalive_max_interval seconds, one of them may be lost. A dead
+    replica source cannot be ejected before this time has passed either.
+    """
+    return timedelta(seconds=max(CONF.agent_heartbeat_expiry,
+                                 2 * CONF.agent_keepalive_max_interval))
+
+
 class AgentHeartBeat(dbmodels.DatabaseModelBase):
     """Defines the state of a Guest Agent."""
 
@@ -89,5 +98,4 @@ class AgentHeartBeat(dbmodels.DatabaseModelBase):
 
     @staticmethod
     def is_active(agent):
-        return (datetime.now() - agent.updated_at <
-                timedelta(seconds=AGENT_HEARTBEAT))
+        return datetime.now() - agent.updated_at < heartbeat_expiry()
@@ -17,12 +17,19 @@ import os
 import signal
 
 from oslo_log import log as logging
+from oslo_utils import strutils
 
 from eventlet.green import subprocess
 from trove.common import cfg, utils
+from trove.common.i18n import _
+from trove.guestagent.common import compression
+from trove.guestagent.common import stream
 from trove.guestagent.strategy import Strategy
 
 CONF = cfg.CONF
+CONFIG_MANAGER = CONF.get('mysql'
+                          if not CONF.datastore_manager
+                          else CONF.datastore_manager)
 
 LOG = logging.getLogger(__name__)
 
@@ -42,14 +49,21 @@ class BackupRunner(Strategy):
 
     # The actual system call to run the backup
     cmd = None
+    # Standard input of the backup command, if it is fed by the runner
+    process_stdin = None
     is_zipped = CONF.backup_use_gzip_compression
+    compression = CONFIG_MANAGER.backup_compression
+    compression_level = CONF.backup_compression_level
+    compression_threads = CONF.backup_compression_threads
     is_encrypted = CONF.backup_use_openssl_encryption
     encrypt_key = CONF.backup_aes_cbc_key
+    use_stream_pipeline = CONF.backup_use_stream_pipeline
 
     def __init__(self, filename, **kwargs):
         self.base_filename = filename
         self.process = None
         self.pid = None
+        self.stream = None
         kwargs.update({'filename': filename})
         self.command = self.cmd % kwargs
         super(BackupRunner, self).__init__()
@@ -59,12 +73,37 @@ class BackupRunner(Strategy):
         return type(self).__name__
 
     def _run(self):
-        LOG.debug("BackupRunner running cmd: %s", self.command)
+        LOG.debug("BackupRunner running cmd: %s",
+                  strutils.mask_password(self.command))
         self.process = subprocess.Popen(self.command, shell=True,
+                                        stdin=self.process_stdin,
                                         stdout=subprocess.PIPE,
                                         stderr=subprocess.PIPE,
                                         preexec_fn=os.setsid)
         self.pid = self.process.pid
+        stages = self._stream_stages()
+        if stages:
+            self.stream = stream.StreamPipeline(self.process.stdout, stages)
+
+    @property
+    def in_process(self):
+        """Whether the stream is encrypted by the guest agent itself.
+
+        Compression is done in process too if the codec supports it; the
+        shell pipe of the codec is used otherwise, ahead of encryption.
+        """
+        return (self.use_stream_pipeline and
+                (stream.ENCRYPTION_AVAILABLE or not self.is_encrypted))
+
+    def _stream_stages(self):
+        stages = []
+        if self.in_process:
+            compress_stage = self.codec.compress_stage()
+            if compress_stage:
+                stages.append(compress_stage)
+            if self.is_encrypted:
+                stages.append(stream.EncryptStage(self.encrypt_key))
+        return stages
 
     def __enter__(self):
         """Start up the process."""
@@ -92,6 +131,12 @@ class BackupRunner(Strategy):
             if not self.check_process():
                 raise BackupError
 
+        if self.stream:
+            for stats in self.stream.stats():
+                LOG.info(_("Backup stream stage %(stage)s: %(bytes_in)d "
+                           "bytes in, %(bytes_out)d bytes out, "
+                           "%(throughput).2f MB/s."), stats)
+
         self._run_post_backup()
 
         return True
@@ -111,16 +156,28 @@ class BackupRunner(Strategy):
                            self.zip_manifest,
                            self.encrypt_manifest)
 
+    @property
+    def codec(self):
+        """The compression codec applied to the backup stream."""
+        name = self.compression or ('gzip' if self.is_zipped else 'none')
+        return compression.get_codec(name,
+                                     level=self.compression_level,
+                                     threads=self.compression_threads)
+
     @property
     def zip_cmd(self):
-        return ' | gzip' if self.is_zipped else ''
+        if self.in_process and self.codec.compress_stage():
+            return ''
+        return self.codec.compress_cmd
 
     @property
     def zip_manifest(self):
-        return '.gz' if self.is_zipped else ''
+        return self.codec.extension
 
     @property
     def encrypt_cmd(self):
+        if self.in_process:
+            return ''
         return (' | openssl enc -aes-256-cbc -salt -pass pass:%s' %
                 self.encrypt_key) if self.is_encrypted else ''
 
@@ -133,6 +190,8 @@ class BackupRunner(Strategy):
         return True
 
     def read(self, chunk_size):
+        if self.stream:
+            return self.stream.read(chunk_size)
         return self.process.stdout.read(chunk_size)
 
     def _run_pre_backup(self):
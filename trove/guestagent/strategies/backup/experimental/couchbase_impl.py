@@ -14,10 +14,21 @@
 #    under the License.
 #
 
+import base64
 import json
+import os
+import signal
+import StringIO
+import tarfile
+import urllib2
 
+import eventlet
+from eventlet.green import subprocess
+from eventlet import greenthread
+from eventlet import queue
 from oslo_log import log as logging
 
+from trove.common import cfg
 from trove.common import exception
 from trove.common.i18n import _
 from trove.common import utils
@@ -27,6 +38,7 @@ from trove.guestagent.datastore.experimental.couchbase import system
 from trove.guestagent.strategies.backup import base
 
 
+CONF = cfg.CONF
 LOG = logging.getLogger(__name__)
 OUTFILE = '/tmp' + system.BUCKETS_JSON
 
@@ -106,3 +118,163 @@ class CbBackup(base.BackupRunner):
         except exception.ProcessExecutionError as p:
             LOG.error(p)
             raise p
+
+
+class CbBackupStream(base.BackupRunner):
+    """
+    Implementation of Backup Strategy for Couchbase streaming the bucket
+    dumps into the backup as soon as each of them is done.
+
+    The buckets are dumped concurrently and every dump is removed once
+    added to the tar stream, so only the dumps in progress take up
+    space in the dump dir.
+    """
+    __strategy_name__ = 'cbbackupstream'
+
+    # The tar stream is written to the stdin of the command.
+    process_stdin = subprocess.PIPE
+
+    def __init__(self, *args, **kwargs):
+        self.password = None
+        self.buckets_config = None
+        self.error = None
+        self._writer = None
+        self._dump_pool = None
+        super(CbBackupStream, self).__init__(*args, **kwargs)
+
+    @property
+    def cmd(self):
+        return 'cat' + self.zip_cmd + self.encrypt_cmd
+
+    def _run_pre_backup(self):
+        operating_system.remove(system.COUCHBASE_DUMP_DIR, force=True)
+        operating_system.create_directory(system.COUCHBASE_BUCKETS_DUMP_DIR)
+        self.password = service.CouchbaseRootAccess.get_password()
+        self.buckets_config = self._get_buckets_config(self.password)
+
+    def _get_buckets_config(self, password):
+        request = urllib2.Request(
+            system.COUCHBASE_REST_API + '/pools/default/buckets')
+        request.add_header('Authorization', 'Basic %s' %
+                           base64.b64encode('root:' + password))
+        try:
+            return urllib2.urlopen(request, timeout=300).read()
+        except urllib2.URLError as e:
+            raise base.BackupError(
+                _("Could not get the buckets configuration: %s") % e)
+
+    def _run(self):
+        super(CbBackupStream, self)._run()
+        self._writer = eventlet.spawn(self._write_archive, self.process.stdin)
+
+    def _write_archive(self, output):
+        pool = self._dump_pool = eventlet.GreenPool(
+            CONF.couchbase.backup_parallel_jobs)
+        try:
+            archive = tarfile.open(fileobj=output, mode='w|')
+            # Keep the ownership of the dump dirs on restore.
+            for path in (system.COUCHBASE_DUMP_DIR,
+                         system.COUCHBASE_BUCKETS_DUMP_DIR):
+                archive.add(path, arcname=self._arcname(path),
+                            recursive=False)
+            self._add_contents(archive, system.BUCKETS_JSON,
+                               self.buckets_config)
+            if self.password != "password":
+                # Not default password, backup generated root password.
+                # Added as is to keep its restricted mode and owner.
+                archive.add(system.pwd_file, arcname=self._arcname(
+                    system.COUCHBASE_DUMP_DIR + system.SECRET_KEY))
+
+            buckets = [bucket['name']
+                       for bucket in json.loads(self.buckets_config)
+                       if bucket['bucketType'] != 'memcached']
+            if not buckets:
+                LOG.info(_("All buckets are memcached.  Skipping backup."))
+
+            done = queue.LightQueue()
+
+            def _dump(bucket):
+                try:
+                    done.put((self._dump_bucket(bucket), None))
+                except Exception as e:
+                    done.put((None, e))
+
+            for bucket in buckets:
+                pool.spawn_n(_dump, bucket)
+            for _bucket in buckets:
+                bucket_dir, error = done.get()
+                if error is not None:
+                    raise error
+                archive.add(bucket_dir, arcname=self._arcname(bucket_dir))
+                operating_system.remove(bucket_dir, force=True)
+            archive.close()
+        except Exception as e:
+            LOG.exception(_("Error streaming the Couchbase backup."))
+            self.error = e
+            pool.waitall()
+            operating_system.remove(system.COUCHBASE_DUMP_DIR, force=True)
+        finally:
+            output.close()
+
+    def _dump_bucket(self, bucket):
+        bucket_dir = os.path.join(system.COUCHBASE_BUCKETS_DUMP_DIR, bucket)
+        LOG.debug("Dumping bucket %s." % bucket)
+        utils.execute_with_timeout('/opt/couchbase/bin/cbbackup',
+                                   system.COUCHBASE_REST_API, bucket_dir,
+                                   '-b', bucket,
+                                   '-u', 'root', '-p', self.password,
+                                   timeout=600)
+        return bucket_dir
+
+    def _add_contents(self, archive, name, contents):
+        """Add a file with given contents to the dump dir in the archive.
+        """
+        info = tarfile.TarInfo(
+            self._arcname(system.COUCHBASE_DUMP_DIR + name))
+        info.size = len(contents)
+        info.mode = 0o644
+        archive.addfile(info, StringIO.StringIO(contents))
+
+    @staticmethod
+    def _arcname(path):
+        # Extracted relative to the root directory.
+        return path.lstrip('/')
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is not None:
+            self._abort()
+        return super(CbBackupStream, self).__exit__(exc_type, exc_value,
+                                                    traceback)
+
+    def _abort(self):
+        """Stop the writer, the bucket dumps and the backup command and
+        remove the dump dir, when the backup stream is not read to the end.
+        """
+        LOG.debug("Aborting the Couchbase backup stream.")
+        if self._writer is not None:
+            self._writer.kill()
+        if self._dump_pool is not None:
+            for dump in list(self._dump_pool.coroutines_running):
+                greenthread.kill(dump)
+        try:
+            # Dumps killed while running leave their cbbackup behind.
+            utils.execute_with_timeout(
+                'pkill', '-f', system.COUCHBASE_BUCKETS_DUMP_DIR,
+                check_exit_code=[0, 1])
+        except exception.ProcessExecutionError:
+            LOG.exception(_("Could not stop the bucket dumps."))
+        if self.process is not None:
+            try:
+                os.killpg(self.process.pid, signal.SIGTERM)
+            except OSError:
+                # Already stopped
+                pass
+        operating_system.remove(system.COUCHBASE_DUMP_DIR, force=True)
+
+    def check_process(self):
+        if self._writer is not None:
+            self._writer.wait()
+        return self.error is None
+
+    def _run_post_backup(self):
+        operating_system.remove(system.COUCHBASE_DUMP_DIR, force=True)
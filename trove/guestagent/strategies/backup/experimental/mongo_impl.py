@@ -108,3 +108,25 @@ class MongoDump(base.BackupRunner):
 
         LOG.debug("Estimated size for databases: " + str(dbstats))
         return sum(dbstats.values())
+
+
+class MongoDumpArchive(base.BackupRunner):
+    """Implementation of Backup Strategy streaming a single-archive
+    mongodump (MongoDB 3.2 or later) straight into the backup stream,
+    without staging the dump on the data volume.
+    """
+    __strategy_name__ = 'mongodumparchive'
+
+    def __init__(self, *args, **kwargs):
+        self.status = mongo_service.MongoDBAppStatus()
+        self.app = mongo_service.MongoDBApp(self.status)
+        super(MongoDumpArchive, self).__init__(*args, **kwargs)
+
+    @property
+    def cmd(self):
+        """Streams the archive to the stdout. Log output is silenced as
+        anything written to stderr fails the backup.
+        """
+        # The command gets %-formatted by the runner.
+        cmd = self.app.archive_cmd('mongodump').replace('%', '%%')
+        return cmd + self.zip_cmd + self.encrypt_cmd
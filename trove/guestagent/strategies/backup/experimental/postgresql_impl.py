@@ -13,12 +13,23 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import os
+
 from oslo_log import log as logging
 
+from trove.common import cfg
+from trove.common import exception
+from trove.guestagent.common import operating_system
+from trove.guestagent.datastore.experimental.postgresql import pgutil
 from trove.guestagent.strategies.backup import base
 
+CONF = cfg.CONF
 LOG = logging.getLogger(__name__)
 
+PGSQL_DUMP_DIR = CONF.postgresql.mount_point + "/dump"
+PGSQL_GLOBALS_FILE = PGSQL_DUMP_DIR + "/globals.sql"
+PGSQL_DATABASES_DIR = PGSQL_DUMP_DIR + "/databases"
+
 
 class PgDump(base.BackupRunner):
     """Implementation of Backup Strategy for pg_dump."""
@@ -28,3 +39,48 @@ class PgDump(base.BackupRunner):
     def cmd(self):
         cmd = 'sudo -u postgres pg_dumpall '
         return cmd + self.zip_cmd + self.encrypt_cmd
+
+
+class PgDumpParallel(base.BackupRunner):
+    """Implementation of Backup Strategy dumping every database with
+    parallel pg_dump jobs in the directory format.
+    The dumps are staged in the dump dir and streamed as a tar container.
+    """
+    __strategy_name__ = 'pg_dump_parallel'
+
+    @property
+    def cmd(self):
+        cmd = 'sudo tar cPf - ' + PGSQL_DUMP_DIR
+        return cmd + self.zip_cmd + self.encrypt_cmd
+
+    def _run_pre_backup(self):
+        """Dump the global objects and each database into the dump dir."""
+        self.cleanup()
+        operating_system.create_directory(
+            PGSQL_DATABASES_DIR, user='postgres', group='postgres',
+            as_root=True)
+        try:
+            # The dumps run for as long as the databases require.
+            pgutil.execute('pg_dumpall', '--globals-only',
+                           '-f', PGSQL_GLOBALS_FILE, timeout=None)
+            jobs = str(CONF.postgresql.backup_parallel_jobs)
+            for database in self._list_databases():
+                LOG.debug("Dumping database %s." % database)
+                pgutil.execute(
+                    'pg_dump', '--format=directory', '--jobs', jobs,
+                    '--file', os.path.join(PGSQL_DATABASES_DIR, database),
+                    database, timeout=None)
+        except exception.ProcessExecutionError:
+            LOG.debug("Caught exception when creating the dump")
+            self.cleanup()
+            raise
+
+    def _list_databases(self):
+        return [row[0].strip()
+                for row in pgutil.query(pgutil.DatabaseQuery.list())]
+
+    def cleanup(self):
+        operating_system.remove(PGSQL_DUMP_DIR, force=True, as_root=True)
+
+    def _run_post_backup(self):
+        self.cleanup()
@@ -18,7 +18,10 @@ from eventlet.green import subprocess
 from oslo_log import log as logging
 
 from trove.common import cfg
+from trove.common.i18n import _
 from trove.common import utils
+from trove.guestagent.common import compression
+from trove.guestagent.common import stream as stream_pipeline
 from trove.guestagent.strategy import Strategy
 
 LOG = logging.getLogger(__name__)
@@ -27,6 +30,7 @@ CHUNK_SIZE = CONF.backup_chunk_size
 BACKUP_USE_GZIP = CONF.backup_use_gzip_compression
 BACKUP_USE_OPENSSL = CONF.backup_use_openssl_encryption
 BACKUP_DECRYPT_KEY = CONF.backup_aes_cbc_key
+BACKUP_USE_STREAM_PIPELINE = CONF.backup_use_stream_pipeline
 
 
 class RestoreError(Exception):
@@ -50,11 +54,17 @@ class RestoreRunner(Strategy):
     is_zipped = BACKUP_USE_GZIP
     is_encrypted = BACKUP_USE_OPENSSL
     decrypt_key = BACKUP_DECRYPT_KEY
+    use_stream_pipeline = BACKUP_USE_STREAM_PIPELINE
+
+    # The compression codec recorded in the backup metadata
+    compression = None
+    compression_threads = CONF.backup_compression_threads
 
     def __init__(self, storage, **kwargs):
         self.storage = storage
         self.location = kwargs.pop('location')
         self.checksum = kwargs.pop('checksum')
+        self.compression = kwargs.pop('compression', self.compression)
         self.restore_location = kwargs.get('restore_location')
         self.restore_cmd = (self.decrypt_cmd +
                             self.unzip_cmd +
@@ -76,10 +86,11 @@ class RestoreRunner(Strategy):
         return content_length
 
     def _run_restore(self):
-        return self._unpack(self.location, self.checksum, self.restore_cmd)
+        return self._unpack(self.location, self.checksum, self.restore_cmd,
+                            self.compression)
 
-    def _unpack(self, location, checksum, command):
-        stream = self.storage.load(location, checksum)
+    def _unpack(self, location, checksum, command, compression=None):
+        stream = self._load_stream(location, checksum, compression)
         process = subprocess.Popen(command, shell=True,
                                    stdin=subprocess.PIPE,
                                    stderr=subprocess.PIPE)
@@ -90,17 +101,72 @@ class RestoreRunner(Strategy):
         process.stdin.close()
         utils.raise_if_process_errored(process, RestoreError)
         LOG.debug("Restored %s bytes from stream." % content_length)
+        self._log_stream_stats(stream)
 
         return content_length
 
+    def _load_stream(self, location, checksum, compression=None):
+        """Load a backup, decrypting and decompressing it in process if
+        the stream pipeline is enabled.
+        """
+        stream = self.storage.load(location, checksum)
+        stages = self._stream_stages(compression)
+        if stages:
+            stream = stream_pipeline.StreamPipeline(stream, stages)
+        return stream
+
+    def _log_stream_stats(self, stream):
+        if isinstance(stream, stream_pipeline.StreamPipeline):
+            for stats in stream.stats():
+                LOG.info(_("Restore stream stage %(stage)s: %(bytes_in)d "
+                           "bytes in, %(bytes_out)d bytes out, "
+                           "%(throughput).2f MB/s."), stats)
+
+    @property
+    def in_process(self):
+        """Whether the stream is decrypted by the guest agent itself.
+
+        Decompression is done in process too if the codec supports it; the
+        shell pipe of the codec is used otherwise, after decryption.
+        """
+        return (self.use_stream_pipeline and
+                (stream_pipeline.ENCRYPTION_AVAILABLE or
+                 not self.is_encrypted))
+
+    def _stream_stages(self, compression=None):
+        stages = []
+        if self.in_process:
+            if self.is_encrypted:
+                stages.append(stream_pipeline.DecryptStage(self.decrypt_key))
+            decompress_stage = self.get_codec(compression).decompress_stage()
+            if decompress_stage:
+                stages.append(decompress_stage)
+        return stages
+
+    def decompress_cmd(self, compression=None):
+        """Pipe stage decompressing a backup taken with the given codec."""
+        codec = self.get_codec(compression)
+        if self.in_process and codec.decompress_stage():
+            return ''
+        return codec.decompress_cmd
+
     @property
     def decrypt_cmd(self):
-        if self.is_encrypted:
+        if self.is_encrypted and not self.in_process:
             return ('openssl enc -d -aes-256-cbc -salt -pass pass:%s | '
                     % self.decrypt_key)
         else:
             return ''
 
+    def get_codec(self, name=None):
+        """Return the codec to decompress a backup with.
+
+        Backups taken before the codec was recorded in their metadata were
+        compressed with gzip if backup_use_gzip_compression was set.
+        """
+        name = name or ('gzip' if self.is_zipped else 'none')
+        return compression.get_codec(name, threads=self.compression_threads)
+
     @property
     def unzip_cmd(self):
-        return 'gzip -d -c | ' if self.is_zipped else ''
+        return self.decompress_cmd(self.compression)
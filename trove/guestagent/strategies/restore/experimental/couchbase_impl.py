@@ -178,7 +178,7 @@ class CbBackup(base.RestoreRunner):
 
                     # Restore
                     restore_cmd = ('/opt/couchbase/bin/cbrestore ' +
-                                   system.COUCHBASE_DUMP_DIR + ' ' +
+                                   self._bucket_dump_dir(bucket_name) + ' ' +
                                    system.COUCHBASE_REST_API +
                                    ' --bucket-source=' + bucket_name +
                                    ' --bucket-destination=' + bucket_name +
@@ -199,3 +199,18 @@ class CbBackup(base.RestoreRunner):
         except exception.ProcessExecutionError as p:
             LOG.error(p)
             raise base.RestoreError("Couchbase restore failed.")
+
+    def _bucket_dump_dir(self, bucket_name):
+        """Directory cbrestore reads the bucket's data from."""
+        return system.COUCHBASE_DUMP_DIR
+
+
+class CbBackupStream(CbBackup):
+    """
+    Implementation of Restore Strategy for Couchbase streaming backups.
+    """
+    __strategy_name__ = 'cbbackupstream'
+    base_restore_cmd = 'sudo tar xpf - -C /'
+
+    def _bucket_dump_dir(self, bucket_name):
+        return os.path.join(system.COUCHBASE_BUCKETS_DUMP_DIR, bucket_name)
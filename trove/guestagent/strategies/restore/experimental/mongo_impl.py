@@ -52,3 +52,20 @@ class MongoDump(base.RestoreRunner):
                                    timeout=LARGE_TIMEOUT)
 
         operating_system.remove(MONGO_DUMP_DIR, force=True, as_root=True)
+
+
+class MongoDumpArchive(base.RestoreRunner):
+    """Restores a single-archive mongodump by streaming it straight into
+    mongorestore.
+    """
+    __strategy_name__ = 'mongodumparchive'
+
+    def __init__(self, *args, **kwargs):
+        self.status = mongo_service.MongoDBAppStatus()
+        self.app = mongo_service.MongoDBApp(self.status)
+        super(MongoDumpArchive, self).__init__(*args, **kwargs)
+
+    @property
+    def base_restore_cmd(self):
+        # The command gets %-formatted by the runner.
+        return self.app.archive_cmd('mongorestore').replace('%', '%%')
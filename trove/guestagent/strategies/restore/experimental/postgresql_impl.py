@@ -13,16 +13,25 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import os
 import re
 
 from eventlet.green import subprocess
 from oslo_log import log as logging
 
+from trove.common import cfg
 from trove.common import exception
+from trove.guestagent.common import operating_system
+from trove.guestagent.datastore.experimental.postgresql import pgutil
 from trove.guestagent.strategies.restore import base
 
+CONF = cfg.CONF
 LOG = logging.getLogger(__name__)
 
+PGSQL_DUMP_DIR = CONF.postgresql.mount_point + "/dump"
+PGSQL_GLOBALS_FILE = PGSQL_DUMP_DIR + "/globals.sql"
+PGSQL_DATABASES_DIR = PGSQL_DUMP_DIR + "/databases"
+
 
 class PgDump(base.RestoreRunner):
     """Implementation of Restore Strategy for pg_dump."""
@@ -50,7 +59,8 @@ class PgDump(base.RestoreRunner):
         # Message 'ERROR:  role "postgres" already exists'
         # is expected and does not pose any problems to the restore operation.
 
-        stream = self.storage.load(self.location, self.checksum)
+        stream = self._load_stream(self.location, self.checksum,
+                                   self.compression)
         process = subprocess.Popen(self.restore_cmd, shell=True,
                                    stdin=subprocess.PIPE,
                                    stderr=subprocess.PIPE)
@@ -61,6 +71,7 @@ class PgDump(base.RestoreRunner):
         process.stdin.close()
         self._handle_errors(process)
         LOG.debug("Restored %s bytes from stream." % content_length)
+        self._log_stream_stats(stream)
 
         return content_length
 
@@ -80,3 +91,31 @@ class PgDump(base.RestoreRunner):
                         raise exception(message)
         except OSError:
             pass
+
+
+class PgDumpParallel(base.RestoreRunner):
+    """Implementation of Restore Strategy for pg_dump_parallel.
+    The databases are restored with parallel pg_restore jobs from the
+    dump dir the backup gets untarred into.
+    """
+    __strategy_name__ = 'pg_dump_parallel'
+    base_restore_cmd = 'sudo tar xPf -'
+
+    def post_restore(self):
+        try:
+            # Existing roles (such as postgres) are reported but do not
+            # fail the script.
+            pgutil.execute('psql', '-q', '-f', PGSQL_GLOBALS_FILE,
+                           timeout=None)
+            jobs = str(CONF.postgresql.backup_parallel_jobs)
+            for database in sorted(os.listdir(PGSQL_DATABASES_DIR)):
+                LOG.debug("Restoring database %s." % database)
+                # The maintenance database already exists, the others are
+                # created by pg_restore.
+                create = [] if database == 'postgres' else ['--create']
+                pgutil.execute(
+                    'pg_restore', '--jobs', jobs, '--dbname', 'postgres',
+                    *(create + [os.path.join(PGSQL_DATABASES_DIR, database)]),
+                    timeout=None)
+        finally:
+            operating_system.remove(PGSQL_DUMP_DIR, force=True, as_root=True)
@@ -246,11 +246,11 @@ class InnoBackupExIncremental(InnoBackupEx):
         self.restore_location = kwargs.get('restore_location')
         self.content_length = 0
 
-    def _incremental_restore_cmd(self, incremental_dir):
+    def _incremental_restore_cmd(self, incremental_dir, compression=None):
         """Return a command for a restore with a incremental location."""
         args = {'restore_location': incremental_dir}
         return (self.decrypt_cmd +
-                self.unzip_cmd +
+                self.decompress_cmd(compression) +
                 (self.base_restore_cmd % args))
 
     def _incremental_prepare_cmd(self, incremental_dir):
@@ -296,13 +296,17 @@ class InnoBackupExIncremental(InnoBackupEx):
             # sufficiently unique /var/lib/mysql/data/<checksum>
             incremental_dir = os.path.join(self.restore_location, checksum)
             operating_system.create_directory(incremental_dir, as_root=True)
-            command = self._incremental_restore_cmd(incremental_dir)
+            command = self._incremental_restore_cmd(
+                incremental_dir, metadata.get('compression'))
         else:
-            # The parent (full backup) use the same command from InnobackupEx
-            # super class and do not set an incremental_dir.
-            command = self.restore_cmd
-
-        self.content_length += self._unpack(location, checksum, command)
+            # The parent (full backup) is restored to the restore_location
+            # like an InnobackupEx backup and does not set an incremental_dir.
+            # Every backup in the chain may have used a different codec.
+            command = self._incremental_restore_cmd(
+                self.restore_location, metadata.get('compression'))
+
+        self.content_length += self._unpack(location, checksum, command,
+                                            metadata.get('compression'))
         self._incremental_prepare(incremental_dir)
 
         # Delete unpacked incremental backup metadata
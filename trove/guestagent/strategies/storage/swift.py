@@ -14,8 +14,13 @@
 #    under the License.
 #
 
+import collections
+import functools
 import hashlib
 
+import eventlet
+from eventlet import pools
+from eventlet import queue
 from oslo_log import log as logging
 
 from trove.common import cfg
@@ -28,6 +33,10 @@ CONF = cfg.CONF
 
 CHUNK_SIZE = CONF.backup_chunk_size
 MAX_FILE_SIZE = CONF.backup_segment_max_size
+UPLOAD_CONCURRENCY = CONF.backup_upload_concurrency
+UPLOAD_BUFFER_SIZE = CONF.backup_upload_buffer_size
+DOWNLOAD_CONCURRENCY = CONF.backup_download_concurrency
+DOWNLOAD_BUFFER_SIZE = CONF.backup_download_buffer_size
 BACKUP_CONTAINER = CONF.backup_swift_container
 
 
@@ -112,23 +121,22 @@ class SwiftStorage(base.Storage):
         swift_checksum = hashlib.md5()
 
         # Wrap the output of the backup process to segment it for swift
-        stream_reader = StreamReader(stream, filename)
+        stream_reader = StreamReader(stream, filename, MAX_FILE_SIZE)
 
         url = self.connection.url
         # Full location where the backup manifest is stored
         location = "%s/%s/%s" % (url, BACKUP_CONTAINER, filename)
 
-        # Read from the stream and write to the container in swift
-        while not stream_reader.end_of_file:
-            etag = self.connection.put_object(BACKUP_CONTAINER,
-                                              stream_reader.segment,
-                                              stream_reader)
-
-            segment_checksum = stream_reader.segment_checksum.hexdigest()
+        if UPLOAD_CONCURRENCY > 1:
+            segments = self._save_segments_concurrently(stream_reader)
+        else:
+            segments = self._save_segments(stream_reader)
 
+        for etag, segment_checksum in segments:
             # Check each segment MD5 hash against swift etag
             # Raise an error and mark backup as failed
             if etag != segment_checksum:
+                segments.close()
                 LOG.error(_("Error saving data segment to swift. "
                           "ETAG: %(tag)s Segment MD5: %(checksum)s."),
                           {'tag': etag, 'checksum': segment_checksum})
@@ -168,6 +176,81 @@ class SwiftStorage(base.Storage):
         return (True, "Successfully saved data to Swift!",
                 final_swift_checksum, location)
 
+    def _save_segments(self, stream_reader):
+        """Stream each segment to swift, one at a time.
+
+        Yields the (etag, checksum) of every segment in upload order.
+        """
+        while not stream_reader.end_of_file:
+            etag = self.connection.put_object(BACKUP_CONTAINER,
+                                              stream_reader.segment,
+                                              stream_reader)
+            yield etag, stream_reader.segment_checksum.hexdigest()
+
+    def _save_segments_concurrently(self, stream_reader):
+        """Upload up to UPLOAD_CONCURRENCY segments to swift at once.
+
+        Each segment is streamed to a green thread, with its own swift
+        connection, through a bounded queue, so reading the next segment
+        from the backup process overlaps with the uploads still in flight.
+        UPLOAD_BUFFER_SIZE caps the data buffered across all of them.
+
+        Yields the (etag, checksum) of every segment in upload order.
+        """
+        connections = pools.Pool(
+            max_size=UPLOAD_CONCURRENCY,
+            create=functools.partial(create_swift_client, self.context))
+        queue_size = max(
+            1, UPLOAD_BUFFER_SIZE // (UPLOAD_CONCURRENCY * CHUNK_SIZE))
+
+        def _put_segment(segment, chunks):
+            received = []
+
+            def _contents():
+                for chunk in iter(chunks.get, None):
+                    yield chunk
+                received.append(True)
+
+            try:
+                with connections.item() as connection:
+                    return connection.put_object(BACKUP_CONTAINER, segment,
+                                                 _contents())
+            except Exception:
+                # Keep the reader going until the end of the segment, it
+                # re-raises the error when it waits on us.
+                if not received:
+                    for chunk in iter(chunks.get, None):
+                        pass
+                raise
+
+        pool = eventlet.GreenPool(UPLOAD_CONCURRENCY)
+        uploads = collections.deque()
+        try:
+            while not stream_reader.end_of_file:
+                chunks = queue.LightQueue(queue_size)
+                # Blocks while UPLOAD_CONCURRENCY segments are in flight
+                upload = pool.spawn(_put_segment, stream_reader.segment,
+                                    chunks)
+                read = functools.partial(stream_reader.read, CHUNK_SIZE)
+                for chunk in iter(read, ''):
+                    chunks.put(chunk)
+                chunks.put(None)
+                uploads.append(
+                    (upload, stream_reader.segment_checksum.hexdigest()))
+
+                while uploads and uploads[0][0].dead:
+                    upload, checksum = uploads.popleft()
+                    yield upload.wait(), checksum
+
+            while uploads:
+                upload, checksum = uploads.popleft()
+                yield upload.wait(), checksum
+        finally:
+            # Abandon the outstanding uploads if a segment failed; the
+            # manifest is never written so they can't be downloaded.
+            for upload, checksum in uploads:
+                upload.kill()
+
     def _explodeLocation(self, location):
         storage_url = "/".join(location.split('/')[:-2])
         container = location.split('/')[-2]
@@ -188,6 +271,16 @@ class SwiftStorage(base.Storage):
         """Restore a backup from the input stream to the restore_location."""
         storage_url, container, filename = self._explodeLocation(location)
 
+        if DOWNLOAD_CONCURRENCY > 1:
+            headers = self.connection.head_object(container, filename)
+            manifest = headers.get('x-object-manifest')
+            if manifest:
+                if CONF.verify_swift_checksum_on_restore:
+                    self._verify_checksum(headers.get('etag', ''),
+                                          backup_checksum)
+
+                return self._load_segments_concurrently(manifest)
+
         headers, info = self.connection.get_object(container, filename,
                                                    resp_chunk_size=CHUNK_SIZE)
 
@@ -196,6 +289,69 @@ class SwiftStorage(base.Storage):
 
         return info
 
+    def _load_segments_concurrently(self, manifest):
+        """Download up to DOWNLOAD_CONCURRENCY segments from swift at once.
+
+        The segments behind the manifest are fetched by green threads, each
+        with its own swift connection, into bounded read-ahead queues.
+        DOWNLOAD_BUFFER_SIZE caps the data buffered across all of them.
+
+        Yields the chunks of every segment in segment order.
+        """
+        segment_container, prefix = manifest.split('/', 1)
+        headers, segments = self.connection.get_container(
+            segment_container, prefix=prefix, full_listing=True)
+        segments = iter(sorted(segments, key=lambda segment: segment['name']))
+
+        connections = pools.Pool(
+            max_size=DOWNLOAD_CONCURRENCY,
+            create=functools.partial(create_swift_client, self.context))
+        queue_size = max(
+            1, DOWNLOAD_BUFFER_SIZE // (DOWNLOAD_CONCURRENCY * CHUNK_SIZE))
+
+        def _get_segment(segment, chunks):
+            try:
+                with connections.item() as connection:
+                    headers, body = connection.get_object(
+                        segment_container, segment['name'],
+                        resp_chunk_size=CHUNK_SIZE)
+                    checksum = hashlib.md5()
+                    for chunk in body:
+                        checksum.update(chunk)
+                        chunks.put(chunk)
+
+                if 'hash' in segment:
+                    self._verify_checksum(segment['hash'],
+                                          checksum.hexdigest())
+            except Exception:
+                # The reader re-raises the error when it waits on us.
+                chunks.put(None)
+                raise
+            chunks.put(None)
+
+        downloads = collections.deque()
+
+        def _start_next_download():
+            segment = next(segments, None)
+            if segment is not None:
+                chunks = queue.LightQueue(queue_size)
+                downloads.append(
+                    (eventlet.spawn(_get_segment, segment, chunks), chunks))
+
+        try:
+            for i in range(DOWNLOAD_CONCURRENCY):
+                _start_next_download()
+
+            while downloads:
+                download, chunks = downloads.popleft()
+                for chunk in iter(chunks.get, None):
+                    yield chunk
+                download.wait()
+                _start_next_download()
+        finally:
+            for download, chunks in downloads:
+                download.kill()
+
     def _get_attr(self, original):
         """Get a friendly name from an object header key."""
         key = original.replace('-', '_')
@@ -17,8 +17,8 @@
 """Model classes that form the core of instances functionality."""
 from __builtin__ import setattr
 from datetime import datetime
-from datetime import timedelta
 import re
+import time
 
 from novaclient import exceptions as nova_exceptions
 from oslo_config.cfg import NoSuchOptError
@@ -40,6 +40,8 @@ from trove.datastore import models as datastore_models
 from trove.db import get_db_api
 from trove.db import models as dbmodels
 from trove.extensions.security_group.models import SecurityGroup
+from trove.flavor.models import FLAVOR_CACHE
+from trove.guestagent import models as agent_models
 from trove.instance.tasks import InstanceTask
 from trove.instance.tasks import InstanceTasks
 from trove.quota.quota import run_with_quotas
@@ -160,9 +162,11 @@ class SimpleInstance(object):
         self.db_info = db_info
         self.datastore_status = datastore_status
         self.root_pass = root_password
+        self.ds_version = ds_version
         if ds_version is None:
             self.ds_version = (datastore_models.DatastoreVersion.
                                load_by_uuid(self.db_info.datastore_version_id))
+        self.ds = ds
         if ds is None:
             self.ds = (datastore_models.Datastore.
                        load(self.ds_version.datastore_id))
@@ -526,7 +530,8 @@ class BaseInstance(SimpleInstance):
     -----------
     """
 
-    def __init__(self, context, db_info, server, datastore_status):
+    def __init__(self, context, db_info, server, datastore_status,
+                 ds_version=None, ds=None):
         """
         Creates a new initialized representation of an instance composed of its
         state in the database and its state from Nova
@@ -544,7 +549,8 @@ class BaseInstance(SimpleInstance):
         :type server: novaclient.v2.servers.Server
         :typdatastore_statusus: trove.instance.models.InstanceServiceStatus
         """
-        super(BaseInstance, self).__init__(context, db_info, datastore_status)
+        super(BaseInstance, self).__init__(context, db_info, datastore_status,
+                                           ds_version=ds_version, ds=ds)
         self.server = server
         self._guest = None
         self._nova_client = None
@@ -673,7 +679,7 @@ class Instance(BuiltInstance):
         datastore_cfg = CONF.get(datastore_version.manager)
         client = create_nova_client(context)
         try:
-            flavor = client.flavors.get(flavor_id)
+            flavor = FLAVOR_CACHE.get(context, flavor_id, client=client)
         except nova_exceptions.NotFound:
             raise exception.FlavorNotFound(uuid=flavor_id)
 
@@ -839,8 +845,7 @@ class Instance(BuiltInstance):
                                _create_resources)
 
     def get_flavor(self):
-        client = create_nova_client(self.context)
-        return client.flavors.get(self.flavor_id)
+        return FLAVOR_CACHE.get(self.context, self.flavor_id)
 
     def get_default_configuration_template(self):
         flavor = self.get_flavor()
@@ -868,11 +873,13 @@ class Instance(BuiltInstance):
                                        % self.flavor_id)
         client = create_nova_client(self.context)
         try:
-            new_flavor = client.flavors.get(new_flavor_id)
+            new_flavor = FLAVOR_CACHE.get(self.context, new_flavor_id,
+                                          client=client)
         except nova_exceptions.NotFound:
             raise exception.FlavorNotFound(uuid=new_flavor_id)
 
-        old_flavor = client.flavors.get(self.flavor_id)
+        old_flavor = FLAVOR_CACHE.get(self.context, self.flavor_id,
+                                      client=client)
         if self.volume_support:
             if new_flavor.ephemeral != 0:
                 raise exception.LocalStorageNotSupported()
@@ -967,8 +974,7 @@ class Instance(BuiltInstance):
                                        " source.") % self.id)
         service = InstanceServiceStatus.find_by(instance_id=self.id)
         last_heartbeat_delta = datetime.utcnow() - service.updated_at
-        agent_expiry_interval = timedelta(seconds=CONF.agent_heartbeat_expiry)
-        if last_heartbeat_delta < agent_expiry_interval:
+        if last_heartbeat_delta < agent_models.heartbeat_expiry():
             raise exception.BadRequest(_("Replica Source %s cannot be ejected"
                                          " as it has a current heartbeat")
                                        % self.id)
@@ -1087,8 +1093,12 @@ class Instance(BuiltInstance):
 
 def create_server_list_matcher(server_list):
     # Returns a method which finds a server from the given list.
+    servers_by_id = {}
+    for server in server_list:
+        servers_by_id.setdefault(server.id, []).append(server)
+
     def find_server(instance_id, server_id):
-        matches = [server for server in server_list if server.id == server_id]
+        matches = servers_by_id.get(server_id, [])
         if len(matches) == 1:
             return matches[0]
         elif len(matches) < 1:
@@ -1107,6 +1117,77 @@ def create_server_list_matcher(server_list):
     return find_server
 
 
+class ServerCache(object):
+    """Short lived cache of the Nova servers of each tenant, for listings.
+
+    A cached server list is only used if it holds every server the caller
+    is looking for, so servers created since it was fetched are never
+    reported missing. It is also listed again once an instance of the
+    listing has been updated since the list was fetched, which covers the
+    task changes made by the taskmanager. The list of a tenant is dropped
+    whenever one of its instances is saved in this process.
+    """
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self._servers = {}
+        self.listings = 0
+        self.compute_api_calls = 0
+
+    @property
+    def hit_ratio(self):
+        if not self.listings:
+            return 0.0
+        return 1.0 - float(self.compute_api_calls) / self.listings
+
+    def list(self, context, server_ids=(), last_updated=None):
+        """List the servers of the tenant, from the cache if it holds all
+        of server_ids and was fetched after last_updated.
+        """
+        self.listings += 1
+        servers = self._cached(context.tenant, server_ids, last_updated)
+        if servers is None:
+            LOG.debug("Listing the servers of tenant %s.", context.tenant)
+            now = time.time()
+            fetched = utils.utcnow()
+            servers = create_nova_client(context).servers.list()
+            self.compute_api_calls += 1
+            if self.ttl > 0:
+                self._prune(now)
+                self._servers[context.tenant] = (now + self.ttl, fetched,
+                                                 servers)
+        LOG.debug("Server listings: %(listings)d, compute API calls: "
+                  "%(calls)d, cache hit ratio: %(ratio).2f.",
+                  {'listings': self.listings,
+                   'calls': self.compute_api_calls,
+                   'ratio': self.hit_ratio})
+        return servers
+
+    def _cached(self, tenant_id, server_ids, last_updated):
+        expires, fetched, servers = self._servers.get(tenant_id,
+                                                      (0, None, None))
+        if expires <= time.time():
+            return None
+        if last_updated is not None and last_updated >= fetched:
+            return None
+        cached_ids = set(server.id for server in servers)
+        if not cached_ids.issuperset(server_ids):
+            return None
+        LOG.debug("Using the cached servers of tenant %s.", tenant_id)
+        return servers
+
+    def invalidate(self, tenant_id):
+        self._servers.pop(tenant_id, None)
+
+    def _prune(self, now):
+        for tenant_id, (expires, _, _) in list(self._servers.items()):
+            if expires <= now:
+                del self._servers[tenant_id]
+
+
+SERVER_CACHE = ServerCache(CONF.instances_server_cache_ttl)
+
+
 class Instances(object):
     DEFAULT_LIMIT = CONF.instances_page_size
 
@@ -1118,8 +1199,6 @@ class Instances(object):
 
         if context is None:
             raise TypeError("Argument context not defined.")
-        client = create_nova_client(context)
-        servers = client.servers.list()
 
         if include_clustered:
             db_infos = DBInstance.find_all(tenant_id=context.tenant,
@@ -1136,8 +1215,15 @@ class Instances(object):
                                                   marker=context.marker)
         next_marker = data_view.next_page_marker
 
+        servers = SERVER_CACHE.list(
+            context, [db.compute_instance_id for db in data_view.collection
+                      if db.compute_instance_id and
+                      db.task_status != InstanceTasks.BUILDING],
+            last_updated=max([db.updated for db in data_view.collection
+                              if db.updated] or [None]))
+
         find_server = create_server_list_matcher(servers)
-        for db in db_infos:
+        for db in data_view.collection:
             LOG.debug("Checking for db [id=%(db_id)s, "
                       "compute_instance_id=%(instance_id)s].",
                       {'db_id': db.id, 'instance_id': db.compute_instance_id})
@@ -1156,6 +1242,12 @@ class Instances(object):
 
     @staticmethod
     def _load_servers_status(load_instance, context, db_items, find_server):
+        db_items = list(db_items)
+        # Load the service statuses of the whole page in one query
+        datastore_statuses = dict(
+            (status.instance_id, status) for status in
+            InstanceServiceStatus.find_all_in('instance_id',
+                                              [db.id for db in db_items]))
         ret = []
         for db in db_items:
             server = None
@@ -1175,9 +1267,8 @@ class Instances(object):
                 # TODO(tim.simpson): End of hack.
 
                 # volumes = find_volumes(server.id)
-                datastore_status = InstanceServiceStatus.find_by(
-                    instance_id=db.id)
-                if not datastore_status.status:  # This should never happen.
+                datastore_status = datastore_statuses.get(db.id)
+                if datastore_status is None or not datastore_status.status:
                     LOG.error(_LE("Server status could not be read for "
                                   "instance id(%s)."), db.id)
                     continue
@@ -1215,6 +1306,11 @@ class DBInstance(dbmodels.DatabaseModelBase):
         super(DBInstance, self).__init__(**kwargs)
         self.set_task_status(task_status)
 
+    def save(self):
+        # The server of the instance may be changing
+        SERVER_CACHE.invalidate(self.tenant_id)
+        return super(DBInstance, self).save()
+
     def _validate(self, errors):
         if InstanceTask.from_code(self.task_id) is None:
             errors['task_id'] = "Not valid."
@@ -1266,6 +1362,26 @@ class InstanceServiceStatus(dbmodels.DatabaseModelBase):
         self.status_id = value.code
         self.status_description = value.description
 
+    @classmethod
+    def find_statuses(cls, instance_ids):
+        """
+        Returns the enumerated service statuses of several instances,
+        loaded in a single query
+        :param instance_ids: ids of the instances to look up
+        :return: a dict of instance id to ServiceStatus
+        :raises ModelNotFoundError: if an instance has no status
+        """
+        instance_ids = set(instance_ids)
+        statuses = dict((db_status.instance_id, db_status.get_status())
+                        for db_status in cls.find_all_in('instance_id',
+                                                         instance_ids))
+        missing = instance_ids.difference(statuses)
+        if missing:
+            raise exception.ModelNotFoundError(
+                _("%(s_name)s Not Found for instances: %(ids)s") %
+                {'s_name': cls.__name__, 'ids': ', '.join(sorted(missing))})
+        return statuses
+
     def save(self):
         self['updated_at'] = utils.utcnow()
         return get_db_api().save(self)
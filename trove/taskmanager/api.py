@@ -207,6 +207,14 @@ class API(object):
         cctxt.cast(self.context, "delete_cluster",
                    cluster_id=cluster_id)
 
+    def notify_status_change(self, object_id):
+        LOG.debug("Making async fanout call to notify a status change of "
+                  "%s " % object_id)
+
+        cctxt = self.client.prepare(fanout=True, version=self.version_cap)
+        cctxt.cast(self.context, "notify_status_change",
+                   object_id=object_id)
+
 
 def load(context, manager=None):
     if manager:
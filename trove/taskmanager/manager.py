@@ -14,7 +14,9 @@
 #    under the License.
 
 from sets import Set
+import time
 
+import eventlet
 from oslo_log import log as logging
 import oslo_messaging as messaging
 from oslo_service import periodic_task
@@ -29,8 +31,10 @@ from trove.common.exception import TroveError
 from trove.common.i18n import _
 import trove.common.rpc.version as rpc_version
 from trove.common.strategies.cluster import strategy
+from trove.common import utils
 import trove.extensions.mgmt.instances.models as mgmtmodels
 from trove.instance.tasks import InstanceTasks
+from trove.taskmanager import api as task_api
 from trove.taskmanager import models
 from trove.taskmanager.models import FreshInstanceTasks, BuiltInstanceTasks
 
@@ -80,10 +84,41 @@ class Manager(periodic_task.PeriodicTasks):
             setattr(instance.db_info, 'task_status', status)
             instance.db_info.save()
 
+    def _migrate_replicas(self, replica_models, migrate, error_msg,
+                          old_master, new_master):
+        """Run migrate on each replica concurrently and return the ids of
+        the replicas it failed for, in the order of replica_models.
+        """
+        def _migrate(replica):
+            try:
+                migrate(replica)
+            except exception.TroveError:
+                msg_values = {
+                    "slave": replica.id,
+                    "old_master": old_master.id,
+                    "new_master": new_master.id
+                }
+                LOG.exception(error_msg % msg_values)
+                return replica.id
+
+        pool = eventlet.GreenPool(CONF.replica_failover_concurrency)
+        return [replica_id for replica_id in pool.imap(_migrate,
+                                                       replica_models)
+                if replica_id is not None]
+
+    def _log_phase_timings(self, operation, instance_id, timings):
+        LOG.info(_("%(operation)s %(id)s: %(timings)s") % {
+            "operation": operation,
+            "id": instance_id,
+            "timings": ", ".join("%s took %.2fs" % timing
+                                 for timing in timings)})
+
     def promote_to_replica_source(self, context, instance_id):
 
         def _promote_to_replica_source(old_master, master_candidate,
                                        replica_models):
+            timings = []
+            start = time.time()
             # First, we transition from the old master to new as quickly as
             # possible to minimize the scope of unrecoverable error
             old_master.make_read_only(True)
@@ -97,36 +132,40 @@ class Manager(periodic_task.PeriodicTasks):
             master_candidate.attach_public_ips(master_ips)
             master_candidate.make_read_only(False)
             old_master.attach_public_ips(slave_ips)
+            timings.append(("switching the replica source",
+                            time.time() - start))
 
             # At this point, should something go wrong, there
             # should be a working master with some number of working slaves,
             # and possibly some number of "orphaned" slaves
 
-            exception_replicas = []
-            for replica in replica_models:
-                try:
-                    replica.wait_for_txn(latest_txn_id)
-                    if replica.id != master_candidate.id:
-                        replica.detach_replica(old_master, for_failover=True)
-                        replica.attach_replica(master_candidate)
-                except exception.TroveError:
-                    msg = _("promote-to-replica-source: Unable to migrate "
-                            "replica %(slave)s from old replica source "
-                            "%(old_master)s to new source %(new_master)s.")
-                    msg_values = {
-                        "slave": replica.id,
-                        "old_master": old_master.id,
-                        "new_master": master_candidate.id
-                    }
-                    LOG.exception(msg % msg_values)
-                    exception_replicas.append(replica.id)
-
+            def _migrate(replica):
+                replica.wait_for_txn(latest_txn_id)
+                if replica.id != master_candidate.id:
+                    replica.detach_replica(old_master, for_failover=True)
+                    replica.attach_replica(master_candidate)
+
+            start = time.time()
+            exception_replicas = self._migrate_replicas(
+                replica_models, _migrate,
+                _("promote-to-replica-source: Unable to migrate "
+                  "replica %(slave)s from old replica source "
+                  "%(old_master)s to new source %(new_master)s."),
+                old_master, master_candidate)
+            timings.append(("migrating %d replicas" % len(replica_models),
+                            time.time() - start))
+
+            start = time.time()
             try:
                 old_master.demote_replication_master()
             except Exception:
                 LOG.exception(_("Exception demoting old replica source"))
                 exception_replicas.append(old_master)
+            timings.append(("demoting the old replica source",
+                            time.time() - start))
 
+            self._log_phase_timings("promote-to-replica-source",
+                                    master_candidate.id, timings)
             self._set_task_status([old_master] + replica_models,
                                   InstanceTasks.NONE)
             if exception_replicas:
@@ -162,7 +201,9 @@ class Manager(periodic_task.PeriodicTasks):
 
     # pulled out to facilitate testing
     def _get_replica_txns(self, replica_models):
-        return [[repl] + repl.get_last_txn() for repl in replica_models]
+        pool = eventlet.GreenPool(CONF.replica_failover_concurrency)
+        return list(pool.imap(lambda repl: [repl] + repl.get_last_txn(),
+                              replica_models))
 
     def _most_current_replica(self, old_master, replica_models):
         last_txns = self._get_replica_txns(replica_models)
@@ -175,9 +216,14 @@ class Manager(periodic_task.PeriodicTasks):
     def eject_replica_source(self, context, instance_id):
 
         def _eject_replica_source(old_master, replica_models):
-
+            timings = []
+            start = time.time()
             master_candidate = self._most_current_replica(old_master,
                                                           replica_models)
+            timings.append(("finding the most current replica",
+                            time.time() - start))
+
+            start = time.time()
 
             master_ips = old_master.detach_public_ips()
             slave_ips = master_candidate.detach_public_ips()
@@ -186,25 +232,26 @@ class Manager(periodic_task.PeriodicTasks):
             master_candidate.attach_public_ips(master_ips)
             master_candidate.make_read_only(False)
             old_master.attach_public_ips(slave_ips)
-
-            exception_replicas = []
-            for replica in replica_models:
-                try:
-                    if replica.id != master_candidate.id:
-                        replica.detach_replica(old_master, for_failover=True)
-                        replica.attach_replica(master_candidate)
-                except exception.TroveError:
-                    msg = _("eject-replica-source: Unable to migrate "
-                            "replica %(slave)s from old replica source "
-                            "%(old_master)s to new source %(new_master)s.")
-                    msg_values = {
-                        "slave": replica.id,
-                        "old_master": old_master.id,
-                        "new_master": master_candidate.id
-                    }
-                    LOG.exception(msg % msg_values)
-                    exception_replicas.append(replica.id)
-
+            timings.append(("switching the replica source",
+                            time.time() - start))
+
+            def _migrate(replica):
+                if replica.id != master_candidate.id:
+                    replica.detach_replica(old_master, for_failover=True)
+                    replica.attach_replica(master_candidate)
+
+            start = time.time()
+            exception_replicas = self._migrate_replicas(
+                replica_models, _migrate,
+                _("eject-replica-source: Unable to migrate "
+                  "replica %(slave)s from old replica source "
+                  "%(old_master)s to new source %(new_master)s."),
+                old_master, master_candidate)
+            timings.append(("migrating %d replicas" % len(replica_models),
+                            time.time() - start))
+
+            self._log_phase_timings("eject-replica-source",
+                                    master_candidate.id, timings)
             self._set_task_status([old_master] + replica_models,
                                   InstanceTasks.NONE)
             if exception_replicas:
@@ -243,6 +290,20 @@ class Manager(periodic_task.PeriodicTasks):
             instance_tasks = models.FreshInstanceTasks.load(context,
                                                             instance_id)
             instance_tasks.delete_async()
+        if instance_tasks.cluster_id:
+            # Wake up the cluster deletion waiting on its instances
+            self._notify_status_change(context, instance_tasks.cluster_id)
+
+    def _notify_status_change(self, context, object_id):
+        if CONF.status_change_notifications:
+            # The waiter may be on another taskmanager; this one gets the
+            # fanout as well
+            task_api.API(context).notify_status_change(object_id)
+        else:
+            utils.STATUS_WAITERS.notify(object_id)
+
+    def notify_status_change(self, context, object_id):
+        utils.STATUS_WAITERS.notify(object_id)
 
     def delete_backup(self, context, backup_id):
         models.BackupTasks.delete_backup(context, backup_id)
@@ -263,40 +324,75 @@ class Manager(periodic_task.PeriodicTasks):
         else:
             ids = [instance_id]
             root_passwords = [root_password]
-        replica_number = 0
         replica_backup_id = backup_id
         replica_backup_created = False
         replicas = []
 
+        def _get_snapshot(replica_index, replica_backup_id):
+            LOG.debug("Creating replica %d of %d."
+                      % (replica_index + 1, len(ids)))
+            instance_tasks = FreshInstanceTasks.load(context,
+                                                     ids[replica_index])
+            snapshot = instance_tasks.get_replication_master_snapshot(
+                context, slave_of_id, flavor, replica_backup_id,
+                replica_number=replica_index + 1)
+            return instance_tasks, snapshot
+
+        def _create_replica(instance_tasks, replica_index, snapshot):
+            instance_tasks.create_instance(
+                flavor, image_id, databases, users, datastore_manager,
+                packages, volume_size, snapshot['dataset']['snapshot_id'],
+                availability_zone, root_passwords[replica_index],
+                nics, overrides, None, snapshot)
+            return instance_tasks
+
+        def _load_and_create_replica(replica_index):
+            if replica_index == 0:
+                return _create_replica(first_tasks, 0, first_snapshot)
+            instance_tasks, snapshot = _get_snapshot(replica_index,
+                                                     replica_backup_id)
+            return _create_replica(instance_tasks, replica_index, snapshot)
+
+        def _try_create_replica(replica_index):
+            try:
+                return _load_and_create_replica(replica_index), None
+            except Exception as e:
+                # the other replicas are created regardless, it only
+                # fails if none could be created
+                LOG.exception(_(
+                    "Could not create replica %(num)d of %(count)d.")
+                    % {'num': replica_index + 1, 'count': len(ids)})
+                return None, e
+
         try:
-            for replica_index in range(0, len(ids)):
-                try:
-                    replica_number += 1
-                    LOG.debug("Creating replica %d of %d."
-                              % (replica_number, len(ids)))
-                    instance_tasks = FreshInstanceTasks.load(
-                        context, ids[replica_index])
-                    snapshot = instance_tasks.get_replication_master_snapshot(
-                        context, slave_of_id, flavor, replica_backup_id,
-                        replica_number=replica_number)
-                    replica_backup_id = snapshot['dataset']['snapshot_id']
-                    replica_backup_created = True
-                    instance_tasks.create_instance(
-                        flavor, image_id, databases, users, datastore_manager,
-                        packages, volume_size, replica_backup_id,
-                        availability_zone, root_passwords[replica_index],
-                        nics, overrides, None, snapshot)
-                    replicas.append(instance_tasks)
-                except Exception:
-                    # if it's the first replica, then we shouldn't continue
-                    LOG.exception(_(
-                        "Could not create replica %(num)d of %(count)d.")
-                        % {'num': replica_number, 'count': len(instance_id)})
-                    if replica_number == 1:
-                        raise
+            # The first replica takes the snapshot the others are created
+            # from, so if that fails we shouldn't continue
+            try:
+                first_tasks, first_snapshot = _get_snapshot(
+                    0, replica_backup_id)
+            except Exception:
+                LOG.exception(_(
+                    "Could not create replica %(num)d of %(count)d.")
+                    % {'num': 1, 'count': len(ids)})
+                raise
+            replica_backup_id = first_snapshot['dataset']['snapshot_id']
+            replica_backup_created = True
+
+            pool = eventlet.GreenPool(CONF.replica_create_concurrency)
+            errors = []
+            for replica, error in pool.imap(_try_create_replica,
+                                            range(len(ids))):
+                if replica is not None:
+                    replicas.append(replica)
+                else:
+                    errors.append(error)
+            if not replicas:
+                raise errors[-1]
 
             for replica in replicas:
-                replica.wait_for_instance(CONF.restore_usage_timeout, flavor)
+                pool.spawn_n(replica.wait_for_instance,
+                             CONF.restore_usage_timeout, flavor)
+            pool.waitall()
 
         finally:
             if replica_backup_created:
@@ -58,6 +58,7 @@ from trove.extensions.security_group.models import (
     SecurityGroupInstanceAssociation)
 from trove.extensions.security_group.models import SecurityGroup
 from trove.extensions.security_group.models import SecurityGroupRule
+from trove.flavor.models import FLAVOR_CACHE
 from trove.instance import models as inst_models
 from trove.instance.models import BuiltInstance
 from trove.instance.models import DBInstance
@@ -103,7 +104,8 @@ class NotifyMixin(object):
         publisher_id = CONF.host
         # Grab the instance size from the kwargs or from the nova client
         instance_size = kwargs.pop('instance_size', None)
-        flavor = self.nova_client.flavors.get(self.flavor_id)
+        flavor = FLAVOR_CACHE.get(self.context, self.flavor_id,
+                                  client=self.nova_client)
         server = kwargs.pop('server', None)
         if server is None:
             server = self.nova_client.servers.get(self.server_id)
@@ -219,9 +221,9 @@ class ClusterTasks(Cluster):
 
         def _all_status_ready(ids):
             LOG.debug("Checking service status of instance ids: %s" % ids)
+            statuses = InstanceServiceStatus.find_statuses(ids)
             for instance_id in ids:
-                status = InstanceServiceStatus.find_by(
-                    instance_id=instance_id).get_status()
+                status = statuses[instance_id]
                 if (status == ServiceStatuses.FAILED or
                    status == ServiceStatuses.FAILED_TIMEOUT_GUESTAGENT):
                         # if one has failed, no need to continue polling
@@ -240,20 +242,18 @@ class ClusterTasks(Cluster):
         def _instance_ids_with_failures(ids):
             LOG.debug("Checking for service status failures for "
                       "instance ids: %s" % ids)
-            failed_instance_ids = []
-            for instance_id in ids:
-                status = InstanceServiceStatus.find_by(
-                    instance_id=instance_id).get_status()
-                if (status == ServiceStatuses.FAILED or
-                   status == ServiceStatuses.FAILED_TIMEOUT_GUESTAGENT):
-                        failed_instance_ids.append(instance_id)
-            return failed_instance_ids
+            statuses = InstanceServiceStatus.find_statuses(ids)
+            return [instance_id for instance_id in ids
+                    if statuses[instance_id] in
+                    (ServiceStatuses.FAILED,
+                     ServiceStatuses.FAILED_TIMEOUT_GUESTAGENT)]
 
         LOG.debug("Polling until service status is ready for "
                   "instance ids: %s" % instance_ids)
         try:
-            utils.poll_until(lambda: instance_ids,
+            utils.wait_until(lambda: instance_ids,
                              lambda ids: _all_status_ready(ids),
+                             keys=instance_ids,
                              sleep_time=USAGE_SLEEP_TIME,
                              time_out=CONF.usage_timeout)
         except PollTimeOut:
@@ -281,7 +281,8 @@ class ClusterTasks(Cluster):
             return len(db_instances) == 0
 
         try:
-            utils.poll_until(all_instances_marked_deleted,
+            utils.wait_until(all_instances_marked_deleted,
+                             keys=[cluster_id],
                              sleep_time=2,
                              time_out=CONF.cluster_delete_time_out)
         except PollTimeOut:
@@ -330,7 +331,8 @@ class FreshInstanceTasks(FreshInstance, NotifyMixin, ConfigurationMixin):
         # record to avoid over billing a customer for an instance that
         # fails to build properly.
         try:
-            utils.poll_until(self._service_is_active,
+            utils.wait_until(self._service_is_active,
+                             keys=[self.id],
                              sleep_time=USAGE_SLEEP_TIME,
                              time_out=timeout)
             LOG.info(_("Created instance %s successfully.") % self.id)
@@ -575,7 +577,7 @@ class FreshInstanceTasks(FreshInstance, NotifyMixin, ConfigurationMixin):
         """
         Check that the database guest is active.
 
-        This function is meant to be called with poll_until to check that
+        This function is meant to be called with wait_until to check that
         the guest is alive before sending a 'create' message. This prevents
         over billing a customer for a instance that they can never use.
 
@@ -1134,7 +1136,8 @@ class BuiltInstanceTasks(BuiltInstance, NotifyMixin, ConfigurationMixin):
         LOG.debug("Calling attach_replica on %s" % self.id)
         try:
             replica_info = master.guest.get_replica_context()
-            flavor = self.nova_client.flavors.get(self.flavor_id)
+            flavor = FLAVOR_CACHE.get(self.context, self.flavor_id,
+                                      client=self.nova_client)
             slave_config = self._render_replica_config(flavor).config_contents
             self.guest.attach_replica(replica_info, slave_config)
             self.update_db(slave_of_id=master.id)
@@ -1175,7 +1178,8 @@ class BuiltInstanceTasks(BuiltInstance, NotifyMixin, ConfigurationMixin):
 
     def enable_as_master(self):
         LOG.debug("Calling enable_as_master on %s" % self.id)
-        flavor = self.nova_client.flavors.get(self.flavor_id)
+        flavor = FLAVOR_CACHE.get(self.context, self.flavor_id,
+                                  client=self.nova_client)
         replica_source_config = self._render_replica_source_config(flavor)
         self.update_db(slave_of_id=None)
         self.slave_list = None
@@ -1281,7 +1285,8 @@ class BuiltInstanceTasks(BuiltInstance, NotifyMixin, ConfigurationMixin):
             status = inst_models.InstanceTasks.RESTART_REQUIRED
             self.update_db(task_status=status)
 
-        flavor = self.nova_client.flavors.get(self.flavor_id)
+        flavor = FLAVOR_CACHE.get(self.context, self.flavor_id,
+                                  client=self.nova_client)
 
         config_overrides = self._render_override_config(
             flavor,
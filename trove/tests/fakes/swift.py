@@ -181,6 +181,14 @@ class FakeSwiftConnection(object):
                     object_checksum.update(chunk)
                     chunk = contents.read(chunk_size)
 
+                self.container_objects[name] = object_content
+            elif not isinstance(contents, basestring):
+                # An iterable of chunks is sent chunked, like swiftclient
+                object_content = ""
+                for chunk in contents:
+                    object_content += chunk
+                    object_checksum.update(chunk)
+
                 self.container_objects[name] = object_content
             else:
                 object_checksum.update(contents)
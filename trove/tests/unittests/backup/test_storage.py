@@ -13,6 +13,9 @@
 # limitations under the License.
 
 import hashlib
+import io
+import os
+import socket
 
 from mock import Mock, MagicMock, patch
 
@@ -130,6 +133,98 @@ class SwiftStorageSaveChecksumTests(trove_testtools.TestCase):
                          "Incorrect swift location was returned.")
 
 
+class SwiftStorageConcurrentSaveTests(trove_testtools.TestCase):
+    """SwiftStorage.save uploading several segments at once."""
+
+    def setUp(self):
+        super(SwiftStorageConcurrentSaveTests, self).setUp()
+        self.context = TroveContext()
+        self.swift_client = FakeSwiftConnection()
+        self.create_swift_client_patch = patch.object(
+            swift, 'create_swift_client',
+            MagicMock(return_value=self.swift_client))
+        self.create_swift_client_mock = self.create_swift_client_patch.start()
+        self.addCleanup(self.create_swift_client_patch.stop)
+        self.concurrency_patch = patch.object(swift, 'UPLOAD_CONCURRENCY', 3)
+        self.concurrency_patch.start()
+        self.addCleanup(self.concurrency_patch.stop)
+        self.swift = SwiftStorage(self.context)
+
+    def tearDown(self):
+        super(SwiftStorageConcurrentSaveTests, self).tearDown()
+
+    def test_save_segments_concurrently(self):
+        data = os.urandom(10 * swift.CHUNK_SIZE)
+        stream_reader = StreamReader(io.BytesIO(data), '123.xbstream',
+                                     max_file_size=3 * swift.CHUNK_SIZE)
+
+        results = list(self.swift._save_segments_concurrently(stream_reader))
+
+        segments = sorted(self.swift_client.container_objects.keys())
+        self.assertEqual(len(segments), len(results))
+        self.assertEqual('123_00000000', segments[0])
+        for etag, checksum in results:
+            self.assertEqual(etag, checksum)
+        self.assertEqual(
+            [hashlib.md5(self.swift_client.container_objects[name]).hexdigest()
+             for name in segments],
+            [checksum for etag, checksum in results])
+        self.assertEqual(data, ''.join(
+            self.swift_client.container_objects[name] for name in segments))
+
+    @patch.object(swift, 'UPLOAD_BUFFER_SIZE', 1)
+    def test_save_segments_concurrently_small_buffer(self):
+        data = os.urandom(10 * swift.CHUNK_SIZE)
+        stream_reader = StreamReader(io.BytesIO(data), '123.xbstream',
+                                     max_file_size=3 * swift.CHUNK_SIZE)
+
+        results = list(self.swift._save_segments_concurrently(stream_reader))
+
+        segments = sorted(self.swift_client.container_objects.keys())
+        self.assertEqual(len(segments), len(results))
+        self.assertEqual(data, ''.join(
+            self.swift_client.container_objects[name] for name in segments))
+
+    def test_save_segments_concurrently_upload_failed(self):
+        data = os.urandom(10 * swift.CHUNK_SIZE)
+        stream_reader = StreamReader(io.BytesIO(data), '123.xbstream',
+                                     max_file_size=3 * swift.CHUNK_SIZE)
+        self.swift_client.put_object = MagicMock(
+            side_effect=socket.error(111, 'ECONNREFUSED'))
+
+        self.assertRaises(
+            socket.error, list,
+            self.swift._save_segments_concurrently(stream_reader))
+
+    def test_swift_checksum_save(self):
+        with MockBackupRunner(filename='123',
+                              user='user',
+                              password='password') as runner:
+            (success,
+             note,
+             checksum,
+             location) = self.swift.save(runner.manifest, runner)
+
+        self.assertTrue(success, "The backup should have been successful.")
+        self.assertEqual('http://mockswift/v1/database_backups/123.gz.enc',
+                         location)
+
+    def test_swift_segment_checksum_etag_mismatch(self):
+        with MockBackupRunner(filename='bad_segment_etag_123',
+                              user='user',
+                              password='password') as runner:
+            (success,
+             note,
+             checksum,
+             location) = self.swift.save(runner.manifest, runner)
+
+        self.assertFalse(success, "The backup should have failed!")
+        self.assertTrue(note.startswith("Error saving data to Swift!"))
+        self.assertIsNone(checksum)
+        self.assertIsNone(self.swift_client.manifest_name,
+                          "The manifest should not have been written.")
+
+
 class SwiftStorageUtils(trove_testtools.TestCase):
 
     def setUp(self):
@@ -213,6 +308,74 @@ class SwiftStorageLoad(trove_testtools.TestCase):
                           backup_checksum)
 
 
+class SwiftStorageConcurrentLoadTests(trove_testtools.TestCase):
+    """SwiftStorage.load downloading several segments at once."""
+
+    def setUp(self):
+        super(SwiftStorageConcurrentLoadTests, self).setUp()
+        self.context = TroveContext()
+        self.segments = {'123_00000000': os.urandom(3 * 128),
+                         '123_00000001': os.urandom(3 * 128),
+                         '123_00000002': os.urandom(128)}
+        self.swift_client = MagicMock()
+        self.swift_client.head_object.return_value = {
+            'etag': '"fake-md5-sum"',
+            'x-object-manifest': 'database_backups/123_'}
+        self.swift_client.get_container.return_value = (None, [
+            {'name': name, 'hash': hashlib.md5(data).hexdigest()}
+            for name, data in reversed(sorted(self.segments.items()))])
+        self.swift_client.get_object.side_effect = self._get_object
+        self.create_swift_client_patch = patch.object(
+            swift, 'create_swift_client',
+            MagicMock(return_value=self.swift_client))
+        self.create_swift_client_mock = self.create_swift_client_patch.start()
+        self.addCleanup(self.create_swift_client_patch.stop)
+        for name, value in [('DOWNLOAD_CONCURRENCY', 2),
+                            ('DOWNLOAD_BUFFER_SIZE', 256),
+                            ('CHUNK_SIZE', 128)]:
+            option_patch = patch.object(swift, name, value)
+            option_patch.start()
+            self.addCleanup(option_patch.stop)
+        self.swift = SwiftStorage(self.context)
+
+    def tearDown(self):
+        super(SwiftStorageConcurrentLoadTests, self).tearDown()
+
+    def _get_object(self, container, name, resp_chunk_size=None):
+        data = self.segments[name]
+        return {}, (data[i:i + resp_chunk_size]
+                    for i in range(0, len(data), resp_chunk_size))
+
+    def test_load_segments_in_order(self):
+        location = 'http://mockswift/v1/database_backups/123.xbstream.gz'
+        stream = self.swift.load(location, 'fake-md5-sum')
+
+        self.assertEqual(''.join(data for name, data
+                                 in sorted(self.segments.items())),
+                         ''.join(stream))
+        self.swift_client.get_container.assert_called_once_with(
+            'database_backups', prefix='123_', full_listing=True)
+
+    def test_load_segment_checksum_mismatch(self):
+        self.segments['123_00000001'] = os.urandom(128)
+        location = 'http://mockswift/v1/database_backups/123.xbstream.gz'
+        stream = self.swift.load(location, 'fake-md5-sum')
+
+        self.assertRaises(SwiftDownloadIntegrityError, ''.join, stream)
+
+    def test_load_without_manifest(self):
+        self.swift_client.head_object.return_value = {
+            'etag': '"fake-md5-sum"'}
+        self.swift_client.get_object.side_effect = None
+        self.swift_client.get_object.return_value = (
+            {'etag': '"fake-md5-sum"'}, iter(['fake-data']))
+        location = 'http://mockswift/v1/database_backups/123.xbstream.gz'
+        stream = self.swift.load(location, 'fake-md5-sum')
+
+        self.assertEqual(['fake-data'], list(stream))
+        self.assertFalse(self.swift_client.get_container.called)
+
+
 class MockBackupStream(MockBackupRunner):
 
     def read(self, chunk_size):
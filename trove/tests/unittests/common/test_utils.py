@@ -13,6 +13,9 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 #
+import time
+
+import eventlet
 from mock import Mock
 from testtools import ExpectedException
 from trove.common import exception
@@ -75,3 +78,37 @@ class TestTroveExecuteWithTimeout(trove_testtools.TestCase):
         self.assertEqual(1, utils.unpack_singleton([[[1]]]))
         self.assertEqual([[1], [2]], utils.unpack_singleton([[1], [2]]))
         self.assertEqual(['a', 'b'], utils.unpack_singleton(['a', 'b']))
+
+
+class TestWaitUntil(trove_testtools.TestCase):
+
+    def setUp(self):
+        super(TestWaitUntil, self).setUp()
+        self.waiters = utils.StatusWaiters()
+
+    def test_woken_before_sleep_time(self):
+        values = iter([False, True])
+        eventlet.spawn_after(0.01, self.waiters.notify, 'id1')
+        start = time.time()
+        self.assertTrue(utils.wait_until(lambda: next(values), keys=['id1'],
+                                         sleep_time=60, time_out=120,
+                                         waiters=self.waiters))
+        self.assertLess(time.time() - start, 30)
+        self.assertEqual({}, dict(self.waiters._events))
+
+    def test_other_key_does_not_wake(self):
+        retriever = Mock(return_value=False)
+        eventlet.spawn_after(0.01, self.waiters.notify, 'id2')
+        start = time.time()
+        self.assertRaises(exception.PollTimeOut, utils.wait_until,
+                          retriever, keys=['id1'], sleep_time=10,
+                          time_out=0.5, waiters=self.waiters)
+        self.assertGreaterEqual(time.time() - start, 0.5)
+        # Retrieved once more when the time out was reached
+        self.assertEqual(2, retriever.call_count)
+
+    def test_polls_without_notification(self):
+        values = iter([False, False, True])
+        self.assertTrue(utils.wait_until(lambda: next(values), keys=['id1'],
+                                         sleep_time=0.01, time_out=10,
+                                         waiters=self.waiters))
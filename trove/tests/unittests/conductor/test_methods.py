@@ -12,12 +12,16 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+from mock import patch
+
 from trove.backup import models as bkup_models
 from trove.backup import state
+from trove.common import cfg
 from trove.common import exception as t_exception
 from trove.common.instance import ServiceStatuses
 from trove.common import utils
 from trove.conductor import manager as conductor_manager
+from trove.conductor import models as conductor_models
 from trove.guestagent.common import timeutils
 from trove.instance import models as t_models
 from trove.tests.unittests import trove_testtools
@@ -49,6 +53,11 @@ class ConductorMethodTests(trove_testtools.TestCase):
         iss.save()
         return new_id
 
+    def _notify_status_changes(self):
+        cfg.CONF.set_override('status_change_notifications', True)
+        self.addCleanup(cfg.CONF.clear_override,
+                        'status_change_notifications')
+
     def _get_iss(self, id):
         return t_models.InstanceServiceStatus.find_by(id=id)
 
@@ -136,6 +145,38 @@ class ConductorMethodTests(trove_testtools.TestCase):
         bkup = self._get_backup(bkup_id)
         self.assertEqual(new_name, bkup.name)
 
+    # --- Tests for status change notifications ---
+
+    @patch.object(conductor_manager.task_api, 'API')
+    def test_heartbeat_status_change_notified(self, mock_api):
+        self._notify_status_changes()
+        self._create_iss()
+        self.cond_mgr.heartbeat(None, self.instance_id, {})
+        self.assertFalse(mock_api.called)
+        payload = {'service_status': ServiceStatuses.BUILDING.description}
+        self.cond_mgr.heartbeat(None, self.instance_id, payload)
+        mock_api.return_value.notify_status_change.assert_called_once_with(
+            self.instance_id)
+
+    @patch.object(conductor_manager.task_api, 'API')
+    def test_backup_state_change_notified(self, mock_api):
+        self._notify_status_changes()
+        bkup_id = self._create_backup('notified')
+        self.cond_mgr.update_backup(None, self.instance_id, bkup_id,
+                                    name='renamed')
+        self.assertFalse(mock_api.called)
+        self.cond_mgr.update_backup(None, self.instance_id, bkup_id,
+                                    state=state.BackupState.COMPLETED)
+        mock_api.return_value.notify_status_change.assert_called_once_with(
+            bkup_id)
+
+    @patch.object(conductor_manager.task_api, 'API')
+    def test_status_change_not_notified_by_default(self, mock_api):
+        self._create_iss()
+        payload = {'service_status': ServiceStatuses.BUILDING.description}
+        self.cond_mgr.heartbeat(None, self.instance_id, payload)
+        self.assertFalse(mock_api.called)
+
     # --- Tests for discarding old messages ---
 
     def test_heartbeat_newer_timestamp_accepted(self):
@@ -189,3 +230,162 @@ class ConductorMethodTests(trove_testtools.TestCase):
                                     sent=past, name=new_name)
         bkup = self._get_backup(bkup_id)
         self.assertEqual(old_name, bkup.name)
+
+
+class ConductorHeartbeatCoalescingTests(trove_testtools.TestCase):
+    def setUp(self):
+        super(ConductorHeartbeatCoalescingTests, self).setUp()
+        util.init_db()
+        self.cond_mgr = conductor_manager.Manager()
+        self.cond_mgr.heartbeat_coalesce_interval = 1
+        self.instance_id = utils.generate_uuid()
+        spawn_after_patch = patch.object(conductor_manager.eventlet,
+                                         'spawn_after')
+        self.spawn_after = spawn_after_patch.start()
+        self.addCleanup(spawn_after_patch.stop)
+
+    def _create_iss(self, instance_id=None):
+        iss = t_models.InstanceServiceStatus(
+            id=utils.generate_uuid(),
+            instance_id=instance_id or self.instance_id,
+            status=ServiceStatuses.NEW)
+        iss.save()
+        return iss.id
+
+    def _notify_status_changes(self):
+        cfg.CONF.set_override('status_change_notifications', True)
+        self.addCleanup(cfg.CONF.clear_override,
+                        'status_change_notifications')
+
+    def _get_iss(self, id):
+        return t_models.InstanceServiceStatus.find_by(id=id)
+
+    def _get_sent(self, instance_id):
+        return conductor_models.LastSeen.load(
+            instance_id=instance_id, method_name='heartbeat').sent
+
+    def test_heartbeats_written_on_flush(self):
+        iss_id = self._create_iss()
+        payload = {'service_status': ServiceStatuses.BUILDING.description}
+        now = timeutils.float_utcnow()
+        self.cond_mgr.heartbeat(None, self.instance_id, payload, sent=now)
+        self.assertEqual(ServiceStatuses.NEW, self._get_iss(iss_id).status)
+        self.spawn_after.assert_called_once_with(
+            1, self.cond_mgr._flush_heartbeats)
+
+        self.cond_mgr._flush_heartbeats()
+        self.assertEqual(ServiceStatuses.BUILDING,
+                         self._get_iss(iss_id).status)
+        self.assertEqual(now, self._get_sent(self.instance_id))
+
+    def test_heartbeats_of_instances_written_together(self):
+        other_id = utils.generate_uuid()
+        iss_id = self._create_iss()
+        other_iss_id = self._create_iss(other_id)
+        now = timeutils.float_utcnow()
+        self.cond_mgr.heartbeat(
+            None, self.instance_id,
+            {'service_status': ServiceStatuses.RUNNING.description},
+            sent=now)
+        self.cond_mgr.heartbeat(
+            None, other_id,
+            {'service_status': ServiceStatuses.SHUTDOWN.description},
+            sent=now)
+        self.assertEqual(1, self.spawn_after.call_count)
+
+        with patch.object(conductor_manager, 'get_db_api',
+                          wraps=conductor_manager.get_db_api) as db_api:
+            self.cond_mgr._flush_heartbeats()
+            self.assertEqual(1, db_api.call_count)
+        self.assertEqual(ServiceStatuses.RUNNING,
+                         self._get_iss(iss_id).status)
+        self.assertEqual(ServiceStatuses.SHUTDOWN,
+                         self._get_iss(other_iss_id).status)
+
+    def test_newest_heartbeat_kept(self):
+        iss_id = self._create_iss()
+        now = timeutils.float_utcnow()
+        self.cond_mgr.heartbeat(
+            None, self.instance_id,
+            {'service_status': ServiceStatuses.BUILDING.description},
+            sent=now)
+        self.cond_mgr.heartbeat(
+            None, self.instance_id,
+            {'service_status': ServiceStatuses.RUNNING.description},
+            sent=now + 10)
+        self.cond_mgr.heartbeat(
+            None, self.instance_id,
+            {'service_status': ServiceStatuses.SHUTDOWN.description},
+            sent=now + 5)
+        self.cond_mgr._flush_heartbeats()
+        self.assertEqual(ServiceStatuses.RUNNING,
+                         self._get_iss(iss_id).status)
+        self.assertEqual(now + 10, self._get_sent(self.instance_id))
+
+    def test_status_kept_when_newer_heartbeat_has_none(self):
+        iss_id = self._create_iss()
+        now = timeutils.float_utcnow()
+        self.cond_mgr.heartbeat(
+            None, self.instance_id,
+            {'service_status': ServiceStatuses.RUNNING.description},
+            sent=now)
+        self.cond_mgr.heartbeat(None, self.instance_id, {}, sent=now + 10)
+        self.cond_mgr._flush_heartbeats()
+        self.assertEqual(ServiceStatuses.RUNNING,
+                         self._get_iss(iss_id).status)
+        self.assertEqual(now + 10, self._get_sent(self.instance_id))
+
+    def test_heartbeat_older_than_last_seen_discarded(self):
+        iss_id = self._create_iss()
+        now = timeutils.float_utcnow()
+        conductor_models.LastSeen.create(instance_id=self.instance_id,
+                                         method_name='heartbeat',
+                                         sent=now)
+        self.cond_mgr.heartbeat(
+            None, self.instance_id,
+            {'service_status': ServiceStatuses.RUNNING.description},
+            sent=now - 60)
+        self.cond_mgr._flush_heartbeats()
+        self.assertEqual(ServiceStatuses.NEW, self._get_iss(iss_id).status)
+        self.assertEqual(now, self._get_sent(self.instance_id))
+
+        # Later heartbeats are checked against the cached last seen time
+        self.cond_mgr.heartbeat(None, self.instance_id, {}, sent=now - 30)
+        self.assertEqual({}, self.cond_mgr._heartbeats)
+
+    def test_heartbeat_status_bogus_change(self):
+        self.assertRaises(ValueError, self.cond_mgr.heartbeat,
+                          None, self.instance_id,
+                          {'service_status': 'potato salad'})
+        self.assertEqual({}, self.cond_mgr._heartbeats)
+        self.assertFalse(self.spawn_after.called)
+
+    def test_heartbeat_instance_not_found(self):
+        iss_id = self._create_iss()
+        new_id = utils.generate_uuid()
+        now = timeutils.float_utcnow()
+        self.cond_mgr.heartbeat(None, new_id, {}, sent=now)
+        self.cond_mgr.heartbeat(
+            None, self.instance_id,
+            {'service_status': ServiceStatuses.RUNNING.description},
+            sent=now)
+        self.cond_mgr._flush_heartbeats()
+        self.assertEqual(ServiceStatuses.RUNNING,
+                         self._get_iss(iss_id).status)
+
+    @patch.object(conductor_manager.task_api, 'API')
+    def test_status_change_notified_after_flush(self, mock_api):
+        self._notify_status_changes()
+        other_id = utils.generate_uuid()
+        self._create_iss()
+        self._create_iss(other_id)
+        context = object()
+        self.cond_mgr.heartbeat(
+            context, self.instance_id,
+            {'service_status': ServiceStatuses.RUNNING.description})
+        self.cond_mgr.heartbeat(context, other_id, {})
+        self.assertFalse(mock_api.called)
+        self.cond_mgr._flush_heartbeats()
+        mock_api.assert_called_once_with(context)
+        mock_api.return_value.notify_status_change.assert_called_once_with(
+            self.instance_id)
@@ -0,0 +1,129 @@
+#    Copyright 2015 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from mock import patch
+
+from trove.common import utils
+from trove.conductor import models
+from trove.guestagent.common import timeutils
+from trove.tests.unittests import trove_testtools
+from trove.tests.unittests.util import util
+
+
+class LastSeenCacheTests(trove_testtools.TestCase):
+    def setUp(self):
+        super(LastSeenCacheTests, self).setUp()
+        util.init_db()
+        self.instance_id = utils.generate_uuid()
+        self.now = timeutils.float_utcnow()
+
+    def _get_sent(self, instance_id=None):
+        seen = models.LastSeen.load(
+            instance_id=instance_id or self.instance_id,
+            method_name='heartbeat')
+        return seen.sent if seen else None
+
+    def _write(self, sent, instance_id=None):
+        # A write by another conductor worker
+        models.LastSeen.create(instance_id=instance_id or self.instance_id,
+                               method_name='heartbeat', sent=sent)
+
+    def test_write_through(self):
+        cache = models.LastSeenCache(10)
+        self.assertFalse(cache.message_too_old(self.instance_id, 'heartbeat',
+                                               self.now))
+        self.assertEqual(self.now, self._get_sent())
+        self.assertFalse(cache.message_too_old(self.instance_id, 'heartbeat',
+                                               self.now + 1))
+        self.assertEqual(self.now + 1, self._get_sent())
+
+    def test_old_message_discarded_without_database(self):
+        cache = models.LastSeenCache(10)
+        cache.message_too_old(self.instance_id, 'heartbeat', self.now)
+        with patch.object(models, 'get_db_api') as db_api:
+            self.assertTrue(cache.message_too_old(
+                self.instance_id, 'heartbeat', self.now - 1))
+            self.assertFalse(db_api.called)
+
+    def test_newer_time_from_other_worker_kept(self):
+        cache = models.LastSeenCache(10)
+        cache.message_too_old(self.instance_id, 'heartbeat', self.now)
+        models.get_db_api().update_if_greater(
+            models.LastSeen, 'sent', self.now + 10,
+            instance_id=self.instance_id, method_name='heartbeat')
+        self.assertTrue(cache.message_too_old(self.instance_id, 'heartbeat',
+                                              self.now + 5))
+        self.assertEqual(self.now + 10, self._get_sent())
+        self.assertTrue(cache.message_too_old(self.instance_id, 'heartbeat',
+                                              self.now + 6))
+
+    def test_least_recently_used_evicted(self):
+        cache = models.LastSeenCache(2)
+        ids = [utils.generate_uuid() for i in range(3)]
+        for instance_id in ids:
+            cache.message_too_old(instance_id, 'heartbeat', self.now)
+        self.assertIsNone(cache.peek(ids[0], 'heartbeat'))
+        self.assertEqual(self.now, cache.peek(ids[2], 'heartbeat'))
+        # Evicted times are loaded again from the database
+        self.assertTrue(cache.message_too_old(ids[0], 'heartbeat',
+                                              self.now))
+
+    @patch.object(models.eventlet, 'spawn_after')
+    def test_write_behind(self, spawn_after):
+        cache = models.LastSeenCache(10, flush_interval=5)
+        other_id = utils.generate_uuid()
+        self._write(self.now - 10)
+        self.assertFalse(cache.message_too_old(self.instance_id, 'heartbeat',
+                                               self.now))
+        self.assertFalse(cache.message_too_old(other_id, 'heartbeat',
+                                               self.now))
+        self.assertTrue(cache.message_too_old(self.instance_id, 'heartbeat',
+                                              self.now))
+        spawn_after.assert_called_once_with(5, cache.flush)
+        self.assertEqual(self.now - 10, self._get_sent())
+        self.assertIsNone(self._get_sent(other_id))
+
+        cache.flush()
+        self.assertEqual(self.now, self._get_sent())
+        self.assertEqual(self.now, self._get_sent(other_id))
+
+    @patch.object(models.eventlet, 'spawn_after')
+    def test_write_behind_never_moves_back(self, spawn_after):
+        cache = models.LastSeenCache(10, flush_interval=5)
+        other_id = utils.generate_uuid()
+        self._write(self.now - 10)
+        cache.accept('heartbeat', {self.instance_id: self.now,
+                                   other_id: self.now})
+        # Both rows move further while the times are buffered
+        models.get_db_api().update_if_greater(
+            models.LastSeen, 'sent', self.now + 10,
+            instance_id=self.instance_id, method_name='heartbeat')
+        self._write(self.now + 10, other_id)
+
+        cache.flush()
+        self.assertEqual(self.now + 10, self._get_sent())
+        self.assertEqual(self.now + 10, self._get_sent(other_id))
+        self.assertEqual(set(),
+                         cache.accept('heartbeat',
+                                      {self.instance_id: self.now + 5}))
+
+    def test_accept_batch(self):
+        cache = models.LastSeenCache(10)
+        other_id = utils.generate_uuid()
+        self._write(self.now)
+        accepted = cache.accept('heartbeat', {self.instance_id: self.now - 1,
+                                              other_id: self.now})
+        self.assertEqual(set([other_id]), accepted)
+        self.assertEqual(self.now, self._get_sent())
+        self.assertEqual(self.now, self._get_sent(other_id))
@@ -0,0 +1,74 @@
+#    Copyright 2015 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from mock import Mock, patch
+from novaclient import exceptions as nova_exceptions
+
+from trove.flavor import models
+from trove.tests.unittests import trove_testtools
+
+
+class FlavorCacheTest(trove_testtools.TestCase):
+
+    def setUp(self):
+        super(FlavorCacheTest, self).setUp()
+        self.cache = models.FlavorCache(ttl=60, size=2)
+        self.client = Mock()
+        self.client.flavors.get.side_effect = lambda flavor_id: Mock(
+            id=flavor_id)
+        self.context = Mock(tenant='tenant1')
+
+    def _get(self, flavor_id, context=None):
+        return self.cache.get(context or self.context, flavor_id,
+                              client=self.client)
+
+    def test_flavor_cached(self):
+        flavor = self._get('1')
+        self.assertIs(flavor, self._get(1))
+        self.client.flavors.get.assert_called_once_with('1')
+        self.assertEqual(1, self.cache.hits)
+        self.assertEqual(1, self.cache.misses)
+
+    def test_flavor_cached_per_tenant(self):
+        self._get('1')
+        self._get('1', Mock(tenant='tenant2'))
+        self.assertEqual(2, self.client.flavors.get.call_count)
+
+    def test_flavor_expires(self):
+        self._get('1')
+        with patch.object(models.time, 'time', return_value=2 ** 40):
+            self._get('1')
+        self.assertEqual(2, self.client.flavors.get.call_count)
+
+    def test_least_recently_used_dropped(self):
+        self._get('1')
+        self._get('2')
+        self._get('1')
+        self._get('3')
+        self._get('1')
+        self.assertEqual(3, self.client.flavors.get.call_count)
+        self._get('2')
+        self.assertEqual(4, self.client.flavors.get.call_count)
+
+    def test_not_found_not_cached(self):
+        self.client.flavors.get.side_effect = nova_exceptions.NotFound(404)
+        self.assertRaises(nova_exceptions.NotFound, self._get, '1')
+        self.assertRaises(nova_exceptions.NotFound, self._get, '1')
+        self.assertEqual(2, self.client.flavors.get.call_count)
+
+    def test_disabled(self):
+        self.cache.ttl = 0
+        self._get('1')
+        self._get('1')
+        self.assertEqual(2, self.client.flavors.get.call_count)
@@ -11,6 +11,7 @@
 #    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
 #    License for the specific language governing permissions and limitations
 #    under the License.
+import eventlet
 from eventlet import Timeout
 import mock
 import oslo_messaging as messaging
@@ -471,3 +472,40 @@ class ApiStrategyTest(trove_testtools.TestCase):
         client = guest_client(mock.Mock(), mock.Mock(), 'vertica')
         self.assertFalse(hasattr(client, 'get_public_keys2'))
         self.assertTrue(callable(client.get_public_keys))
+
+
+class CallGuestsTest(trove_testtools.TestCase):
+
+    def _mock_guest(self, id, **kwargs):
+        guest = mock.Mock(id=id)
+        guest.get_last_txn = mock.Mock(**kwargs)
+        return guest
+
+    def test_call_guests(self):
+        guests = [self._mock_guest('id%s' % i, return_value=i)
+                  for i in range(5)]
+        call_results = api.call_guests(guests, 'get_last_txn')
+        self.assertEqual(['id0', 'id1', 'id2', 'id3', 'id4'],
+                         call_results.results.keys())
+        self.assertEqual(range(5), call_results.results.values())
+        self.assertEqual({}, call_results.failures)
+        call_results.raise_on_failure()
+
+    def test_call_guests_with_failure(self):
+        error = exception.GuestError(original_message='failed')
+        guests = [self._mock_guest('id1', return_value='txn'),
+                  self._mock_guest('id2', side_effect=error)]
+        call_results = api.call_guests(guests, 'get_last_txn')
+        self.assertEqual({'id1': 'txn'}, call_results.results)
+        self.assertEqual({'id2': error}, call_results.failures)
+        self.assertRaises(exception.GuestError,
+                          call_results.raise_on_failure)
+
+    def test_call_guests_with_timeout(self):
+        guests = [self._mock_guest('id1', return_value='txn'),
+                  self._mock_guest('id2',
+                                   side_effect=lambda: eventlet.sleep(1))]
+        call_results = api.call_guests(guests, 'get_last_txn', timeout=0.1)
+        self.assertEqual({'id1': 'txn'}, call_results.results)
+        self.assertIsInstance(call_results.failures['id2'],
+                              exception.GuestTimeout)
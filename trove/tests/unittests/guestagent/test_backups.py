@@ -11,12 +11,24 @@
 #    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
 #    License for the specific language governing permissions and limitations
 #    under the License.
+import io
+import os
+import shutil
+import tarfile
+import tempfile
+
 import mock
-from mock import ANY, DEFAULT, patch
+from mock import ANY, call, DEFAULT, patch
+import testtools
 from testtools.testcase import ExpectedException
 from trove.common import exception
 from trove.common import utils
+from trove.guestagent.common import compression
+from trove.guestagent.common import operating_system
 from trove.guestagent.common.operating_system import FileMode
+from trove.guestagent.common import stream
+from trove.guestagent.datastore.experimental.couchbase import (
+    system as couchbase_system)
 from trove.guestagent.strategies.backup import base as backupBase
 from trove.guestagent.strategies.backup import mysql_impl
 from trove.guestagent.strategies.restore import base as restoreBase
@@ -39,14 +51,28 @@ BACKUP_CBBACKUP_CLS = ("trove.guestagent.strategies.backup."
                        "experimental.couchbase_impl.CbBackup")
 RESTORE_CBBACKUP_CLS = ("trove.guestagent.strategies.restore."
                         "experimental.couchbase_impl.CbBackup")
+BACKUP_CBBACKUPSTREAM_CLS = ("trove.guestagent.strategies.backup."
+                             "experimental.couchbase_impl.CbBackupStream")
+RESTORE_CBBACKUPSTREAM_CLS = ("trove.guestagent.strategies.restore."
+                              "experimental.couchbase_impl.CbBackupStream")
 BACKUP_MONGODUMP_CLS = ("trove.guestagent.strategies.backup."
                         "experimental.mongo_impl.MongoDump")
 RESTORE_MONGODUMP_CLS = ("trove.guestagent.strategies.restore."
                          "experimental.mongo_impl.MongoDump")
+BACKUP_PGDUMP_PARALLEL_CLS = ("trove.guestagent.strategies.backup."
+                              "experimental.postgresql_impl.PgDumpParallel")
+RESTORE_PGDUMP_PARALLEL_CLS = ("trove.guestagent.strategies.restore."
+                               "experimental.postgresql_impl.PgDumpParallel")
+BACKUP_MONGOARCHIVE_CLS = ("trove.guestagent.strategies.backup."
+                           "experimental.mongo_impl.MongoDumpArchive")
+RESTORE_MONGOARCHIVE_CLS = ("trove.guestagent.strategies.restore."
+                            "experimental.mongo_impl.MongoDumpArchive")
 
 PIPE = " | "
 ZIP = "gzip"
 UNZIP = "gzip -d -c"
+ZSTD = "zstd -q -c -T0"
+UNZSTD = "zstd -q -d -c"
 ENCRYPT = "openssl enc -aes-256-cbc -salt -pass pass:default_aes_cbc_key"
 DECRYPT = "openssl enc -d -aes-256-cbc -salt -pass pass:default_aes_cbc_key"
 XTRA_BACKUP_RAW = ("sudo innobackupex --stream=xbstream %(extra_opts)s"
@@ -75,6 +101,9 @@ PREPARE = ("sudo innobackupex --apply-log /var/lib/mysql/data "
            "--defaults-file=/var/lib/mysql/data/backup-my.cnf "
            "--ibbackup xtrabackup 2>/tmp/innoprepare.log")
 CRYPTO_KEY = "default_aes_cbc_key"
+OPENSSL_ENCRYPTED_SECRET = ("Salted__\x01\x02\x03\x04\x05\x06\x07\x08"
+                            "\x12]\x8f\x10\xd2\xcauW\xa9o\xbb\x97\xf1\xb5"
+                            "\xf3\xe7")
 
 CBBACKUP_CMD = "tar cpPf - /tmp/backups"
 
@@ -83,6 +112,12 @@ CBBACKUP_RESTORE = "sudo tar xpPf -"
 MONGODUMP_CMD = "sudo tar cPf - /var/lib/mongodb/dump"
 
 MONGODUMP_RESTORE = "sudo tar xPf -"
+MONGO_AUTH_PARAMS = ['--username', 'os_admin', '--password', "pa%s'wd",
+                     '--authenticationDatabase', 'admin']
+MONGO_AUTH_CMD = ("--username os_admin --password 'pa%s'\"'\"'wd' "
+                  "--authenticationDatabase admin")
+MONGOARCHIVE_CMD = "mongodump --archive --quiet " + MONGO_AUTH_CMD
+MONGOARCHIVE_RESTORE = "mongorestore --archive --quiet " + MONGO_AUTH_CMD
 
 
 class GuestAgentBackupTest(trove_testtools.TestCase):
@@ -188,6 +223,109 @@ class GuestAgentBackupTest(trove_testtools.TestCase):
                          bkup.command)
         self.assertEqual("12345.gz.enc", bkup.manifest)
 
+    @patch.object(backupBase.BackupRunner, 'compression', 'zstd')
+    def test_backup_zstd_xtrabackup_command(self):
+        backupBase.BackupRunner.is_encrypted = False
+        RunnerClass = utils.import_class(BACKUP_XTRA_CLS)
+        bkup = RunnerClass(12345, extra_opts="")
+        self.assertEqual(XTRA_BACKUP + PIPE + ZSTD, bkup.command)
+        self.assertEqual("12345.xbstream.zst", bkup.manifest)
+        self.assertEqual('zstd', bkup.codec.name)
+
+    @patch.multiple(backupBase.BackupRunner, compression='pigz',
+                    compression_level=9, compression_threads=4)
+    def test_backup_pigz_mysqldump_command(self):
+        backupBase.BackupRunner.is_encrypted = False
+        RunnerClass = utils.import_class(BACKUP_SQLDUMP_CLS)
+        bkup = RunnerClass(12345, extra_opts="")
+        self.assertEqual(SQLDUMP_BACKUP + PIPE + "pigz -9 -p 4", bkup.command)
+        self.assertEqual("12345.gz", bkup.manifest)
+
+    def test_backup_uncompressed_mysqldump_command(self):
+        backupBase.BackupRunner.is_zipped = False
+        backupBase.BackupRunner.is_encrypted = False
+        RunnerClass = utils.import_class(BACKUP_SQLDUMP_CLS)
+        bkup = RunnerClass(12345, extra_opts="")
+        self.assertEqual(SQLDUMP_BACKUP, bkup.command)
+        self.assertEqual("12345", bkup.manifest)
+        self.assertEqual('none', bkup.codec.name)
+
+    @patch.object(backupBase.BackupRunner, 'compression', 'foo')
+    def test_backup_unknown_codec(self):
+        RunnerClass = utils.import_class(BACKUP_SQLDUMP_CLS)
+        self.assertRaises(compression.UnknownCompressionCodec,
+                          RunnerClass, 12345, extra_opts="")
+
+    def test_restore_zstd_xtrabackup_command(self):
+        restoreBase.RestoreRunner.is_zipped = True
+        restoreBase.RestoreRunner.is_encrypted = True
+        restoreBase.RestoreRunner.decrypt_key = CRYPTO_KEY
+        RunnerClass = utils.import_class(RESTORE_XTRA_CLS)
+        restr = RunnerClass(None, restore_location="/var/lib/mysql/data",
+                            location="filename", checksum="md5",
+                            compression='zstd')
+        self.assertEqual(DECRYPT + PIPE + UNZSTD + PIPE + XTRA_RESTORE,
+                         restr.restore_cmd)
+
+    def test_restore_xtrabackup_incremental_mixed_codecs(self):
+        restoreBase.RestoreRunner.is_zipped = True
+        restoreBase.RestoreRunner.is_encrypted = False
+        RunnerClass = utils.import_class(RESTORE_XTRA_INCR_CLS)
+        restr = RunnerClass(None, restore_location="/var/lib/mysql/data",
+                            location="filename", checksum="md5",
+                            compression='zstd')
+        opts = {'restore_location': '/foo/bar/'}
+        # Parents recorded without a codec were compressed with gzip
+        self.assertEqual(UNZIP + PIPE + (XTRA_RESTORE_RAW % opts),
+                         restr._incremental_restore_cmd('/foo/bar/'))
+        self.assertEqual(UNZSTD + PIPE + (XTRA_RESTORE_RAW % opts),
+                         restr._incremental_restore_cmd('/foo/bar/', 'zstd'))
+
+    @patch.object(backupBase.BackupRunner, 'use_stream_pipeline', True)
+    @patch.object(stream, 'ENCRYPTION_AVAILABLE', True)
+    def test_backup_stream_pipeline_xtrabackup_command(self):
+        backupBase.BackupRunner.is_zipped = True
+        backupBase.BackupRunner.is_encrypted = True
+        RunnerClass = utils.import_class(BACKUP_XTRA_CLS)
+        bkup = RunnerClass(12345, extra_opts="")
+        self.assertEqual(XTRA_BACKUP, bkup.command)
+        self.assertEqual("12345.xbstream.gz.enc", bkup.manifest)
+        self.assertEqual(['gzip', 'encrypt'],
+                         [s.name for s in bkup._stream_stages()])
+
+    @patch.multiple(backupBase.BackupRunner, compression='zstd',
+                    use_stream_pipeline=True)
+    @patch.object(stream, 'ENCRYPTION_AVAILABLE', True)
+    def test_backup_stream_pipeline_shell_codec_command(self):
+        backupBase.BackupRunner.is_encrypted = True
+        RunnerClass = utils.import_class(BACKUP_XTRA_CLS)
+        bkup = RunnerClass(12345, extra_opts="")
+        self.assertEqual(XTRA_BACKUP + PIPE + ZSTD, bkup.command)
+        self.assertEqual(['encrypt'], [s.name for s in bkup._stream_stages()])
+
+    @patch.object(backupBase.BackupRunner, 'use_stream_pipeline', True)
+    @patch.object(stream, 'ENCRYPTION_AVAILABLE', False)
+    def test_backup_stream_pipeline_without_cryptography(self):
+        backupBase.BackupRunner.is_zipped = True
+        backupBase.BackupRunner.is_encrypted = True
+        backupBase.BackupRunner.encrypt_key = CRYPTO_KEY
+        RunnerClass = utils.import_class(BACKUP_XTRA_CLS)
+        bkup = RunnerClass(12345, extra_opts="")
+        self.assertEqual(XTRA_BACKUP + PIPE + ZIP + PIPE + ENCRYPT,
+                         bkup.command)
+
+    @patch.object(restoreBase.RestoreRunner, 'use_stream_pipeline', True)
+    @patch.object(stream, 'ENCRYPTION_AVAILABLE', True)
+    def test_restore_stream_pipeline_xtrabackup_command(self):
+        restoreBase.RestoreRunner.is_zipped = True
+        restoreBase.RestoreRunner.is_encrypted = True
+        RunnerClass = utils.import_class(RESTORE_XTRA_CLS)
+        restr = RunnerClass(None, restore_location="/var/lib/mysql/data",
+                            location="filename", checksum="md5")
+        self.assertEqual(XTRA_RESTORE, restr.restore_cmd)
+        self.assertEqual(['decrypt', 'gunzip'],
+                         [s.name for s in restr._stream_stages()])
+
     def test_restore_decrypted_xtrabackup_command(self):
         restoreBase.RestoreRunner.is_zipped = True
         restoreBase.RestoreRunner.is_encrypted = False
@@ -366,6 +504,117 @@ class GuestAgentBackupTest(trove_testtools.TestCase):
         self.assertEqual(restr.restore_cmd,
                          DECRYPT + PIPE + UNZIP + PIPE + MONGODUMP_RESTORE)
 
+    @patch('trove.guestagent.datastore.experimental.mongodb.service.'
+           'MongoDBApp.admin_cmd_auth_params', return_value=MONGO_AUTH_PARAMS)
+    def test_backup_encrypted_mongodump_archive_command(self, _):
+        backupBase.BackupRunner.is_encrypted = True
+        backupBase.BackupRunner.encrypt_key = CRYPTO_KEY
+        RunnerClass = utils.import_class(BACKUP_MONGOARCHIVE_CLS)
+        bkp = RunnerClass(12345)
+        self.assertEqual(
+            MONGOARCHIVE_CMD + PIPE + ZIP + PIPE + ENCRYPT, bkp.command)
+        self.assertIn("gz.enc", bkp.manifest)
+
+    @patch.object(backupBase.subprocess, 'Popen')
+    @patch.object(backupBase, 'LOG')
+    @patch('trove.guestagent.datastore.experimental.mongodb.service.'
+           'MongoDBApp.admin_cmd_auth_params',
+           return_value=['--username', 'os_admin', '--password', 'secretpw',
+                         '--authenticationDatabase', 'admin'])
+    def test_backup_mongodump_archive_masks_password(self, _, mock_log,
+                                                     mock_popen):
+        RunnerClass = utils.import_class(BACKUP_MONGOARCHIVE_CLS)
+        bkp = RunnerClass(12345)
+        bkp._run()
+        self.assertIn('secretpw', mock_popen.call_args[0][0])
+        logged = ' '.join(str(arg) for arg in mock_log.debug.call_args[0])
+        self.assertNotIn('secretpw', logged)
+
+    @patch('trove.guestagent.datastore.experimental.mongodb.service.'
+           'MongoDBApp.admin_cmd_auth_params', return_value=MONGO_AUTH_PARAMS)
+    def test_restore_encrypted_mongodump_archive_command(self, _):
+        restoreBase.RestoreRunner.is_zipped = True
+        restoreBase.RestoreRunner.is_encrypted = True
+        restoreBase.RestoreRunner.decrypt_key = CRYPTO_KEY
+        RunnerClass = utils.import_class(RESTORE_MONGOARCHIVE_CLS)
+        restr = RunnerClass(None, restore_location="/tmp",
+                            location="filename", checksum="md5")
+        self.assertEqual(restr.restore_cmd,
+                         DECRYPT + PIPE + UNZIP + PIPE + MONGOARCHIVE_RESTORE)
+
+
+class StreamPipelineTests(trove_testtools.TestCase):
+
+    def setUp(self):
+        super(StreamPipelineTests, self).setUp()
+        self.data = os.urandom(100000) + 'X' * 200000
+
+    def _read_all(self, pipeline, chunk_size=2 ** 16):
+        chunks = []
+        for chunk in iter(lambda: pipeline.read(chunk_size), ''):
+            self.assertTrue(len(chunk) <= chunk_size)
+            chunks.append(chunk)
+        return ''.join(chunks)
+
+    def test_gzip_round_trip(self):
+        backup = stream.StreamPipeline(io.BytesIO(self.data),
+                                       [stream.GzipStage()])
+        compressed = self._read_all(backup)
+        self.assertTrue(len(compressed) < len(self.data))
+
+        chunks = [compressed[i:i + 1000]
+                  for i in range(0, len(compressed), 1000)]
+        restore = stream.StreamPipeline(chunks, [stream.GunzipStage()])
+        self.assertEqual(self.data, ''.join(restore))
+
+        stats = backup.stats()[0]
+        self.assertEqual('gzip', stats['stage'])
+        self.assertEqual(len(self.data), stats['bytes_in'])
+        self.assertEqual(len(compressed), stats['bytes_out'])
+
+    @testtools.skipUnless(stream.ENCRYPTION_AVAILABLE,
+                          "cryptography is not installed")
+    def test_encrypted_round_trip(self):
+        backup = stream.StreamPipeline(
+            io.BytesIO(self.data),
+            [stream.GzipStage(), stream.EncryptStage(CRYPTO_KEY)])
+        encrypted = self._read_all(backup, chunk_size=4096)
+        self.assertTrue(encrypted.startswith(stream.OPENSSL_SALT_MAGIC))
+
+        # Split the salt header across chunks
+        chunks = [encrypted[i:i + 10] for i in range(0, 40, 10)]
+        chunks.append(encrypted[40:])
+        restore = stream.StreamPipeline(
+            chunks, [stream.DecryptStage(CRYPTO_KEY), stream.GunzipStage()])
+        self.assertEqual(self.data, ''.join(restore))
+
+    @testtools.skipUnless(stream.ENCRYPTION_AVAILABLE,
+                          "cryptography is not installed")
+    def test_openssl_compatible_encryption(self):
+        # Output of: echo -n secret |
+        #   openssl enc -aes-256-cbc -salt -S 0102030405060708 -pass pass:key
+        encryptor = stream.EncryptStage('key', salt='\x01\x02\x03\x04'
+                                                    '\x05\x06\x07\x08')
+        encrypted = encryptor.process('secret') + encryptor.finish()
+        self.assertEqual(OPENSSL_ENCRYPTED_SECRET, encrypted)
+
+        decryptor = stream.DecryptStage('key')
+        self.assertEqual('secret', decryptor.process(encrypted) +
+                         decryptor.finish())
+
+    @testtools.skipUnless(stream.ENCRYPTION_AVAILABLE,
+                          "cryptography is not installed")
+    def test_decrypt_wrong_key(self):
+        encryptor = stream.EncryptStage(CRYPTO_KEY)
+        encrypted = encryptor.process(self.data) + encryptor.finish()
+        decryptor = stream.DecryptStage('wrong_key')
+        decryptor.process(encrypted)
+        self.assertRaises(stream.StreamError, decryptor.finish)
+
+    def test_pipeline_needs_stages(self):
+        self.assertRaises(stream.StreamError, stream.StreamPipeline,
+                          io.BytesIO(self.data), [])
+
 
 class CouchbaseBackupTests(trove_testtools.TestCase):
 
@@ -406,6 +655,113 @@ class CouchbaseBackupTests(trove_testtools.TestCase):
         self.assertEqual(0, backup_runner_mocks['_run_post_backup'].call_count)
 
 
+class CouchbaseStreamBackupTests(trove_testtools.TestCase):
+
+    def setUp(self):
+        super(CouchbaseStreamBackupTests, self).setUp()
+        self.dump_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dump_dir, True)
+        buckets_dir = os.path.join(self.dump_dir, 'buckets')
+        os.mkdir(buckets_dir)
+        for name, value in (('COUCHBASE_DUMP_DIR', self.dump_dir),
+                            ('COUCHBASE_BUCKETS_DUMP_DIR', buckets_dir)):
+            system_patch = patch.object(couchbase_system, name, value)
+            system_patch.start()
+            self.addCleanup(system_patch.stop)
+
+        backupBase.BackupRunner.is_zipped = True
+        backupBase.BackupRunner.is_encrypted = False
+        self.runner = utils.import_class(BACKUP_CBBACKUPSTREAM_CLS)(12345)
+        self.runner.password = 'password'
+        self.runner.buckets_config = (
+            '[{"name": "b1", "bucketType": "membase"},'
+            ' {"name": "b2", "bucketType": "membase"},'
+            ' {"name": "cache", "bucketType": "memcached"}]')
+
+    def _dump_bucket(self, bucket):
+        bucket_dir = os.path.join(self.dump_dir, 'buckets', bucket)
+        os.mkdir(bucket_dir)
+        with open(os.path.join(bucket_dir, 'data'), 'w') as f:
+            f.write(bucket)
+        return bucket_dir
+
+    def _write_archive(self):
+        output = io.BytesIO()
+        with patch.object(output, 'close'):
+            self.runner._write_archive(output)
+        output.seek(0)
+        return output
+
+    def test_backup_command(self):
+        self.assertEqual('cat' + PIPE + ZIP, self.runner.command)
+
+    def test_write_archive(self):
+        with patch.object(self.runner, '_dump_bucket',
+                          side_effect=self._dump_bucket) as dump:
+            output = self._write_archive()
+
+        self.assertEqual([call('b1'), call('b2')], dump.call_args_list)
+        self.assertTrue(self.runner.check_process())
+        archive = tarfile.open(fileobj=output)
+        prefix = self.dump_dir.lstrip('/')
+        names = archive.getnames()
+        self.assertEqual([prefix, prefix + '/buckets',
+                          prefix + '/buckets.json'], names[:3])
+        self.assertEqual(
+            self.runner.buckets_config,
+            archive.extractfile(prefix + '/buckets.json').read())
+        for bucket in ('b1', 'b2'):
+            data = archive.extractfile(
+                '%s/buckets/%s/data' % (prefix, bucket)).read()
+            self.assertEqual(bucket, data)
+        self.assertEqual([], os.listdir(os.path.join(self.dump_dir,
+                                                     'buckets')))
+
+    def test_write_archive_keeps_password_file_mode(self):
+        pwd_file = os.path.join(self.dump_dir, 'pwd')
+        with open(pwd_file, 'w') as f:
+            f.write('secret')
+        os.chmod(pwd_file, 0o400)
+        self.runner.password = 'secret'
+        with patch.object(couchbase_system, 'pwd_file', pwd_file):
+            with patch.object(self.runner, '_dump_bucket',
+                              side_effect=self._dump_bucket):
+                output = self._write_archive()
+
+        archive = tarfile.open(fileobj=output)
+        info = archive.getmember(
+            self.dump_dir.lstrip('/') + couchbase_system.SECRET_KEY)
+        self.assertEqual(0o400, info.mode)
+        self.assertEqual(os.getuid(), info.uid)
+        self.assertEqual('secret', archive.extractfile(info).read())
+
+    def test_write_archive_dump_failed(self):
+        with patch.object(self.runner, '_dump_bucket',
+                          side_effect=exception.ProcessExecutionError()):
+            self._write_archive()
+
+        self.assertFalse(self.runner.check_process())
+        self.assertFalse(os.path.exists(self.dump_dir))
+
+    @patch.object(backupBase.os, 'killpg')
+    @patch.object(operating_system, 'remove')
+    @patch.object(utils, 'execute_with_timeout')
+    def test_exit_on_error_aborts_stream(self, mock_execute, mock_remove,
+                                         mock_killpg):
+        writer = mock.Mock()
+        self.runner._writer = writer
+        self.runner.process = mock.Mock(pid=1234)
+
+        self.assertFalse(self.runner.__exit__(IOError, IOError(), None))
+
+        writer.kill.assert_called_once_with()
+        mock_execute.assert_called_once_with(
+            'pkill', '-f', os.path.join(self.dump_dir, 'buckets'),
+            check_exit_code=[0, 1])
+        mock_killpg.assert_called_once_with(1234, ANY)
+        mock_remove.assert_called_once_with(self.dump_dir, force=True)
+
+
 class CouchbaseRestoreTests(trove_testtools.TestCase):
 
     def setUp(self):
@@ -446,6 +802,17 @@ class CouchbaseRestoreTests(trove_testtools.TestCase):
         self.assertRaises(exception.ProcessExecutionError,
                           self.restore_runner.restore)
 
+    def test_stream_restore_command(self):
+        restoreBase.RestoreRunner.is_zipped = True
+        restoreBase.RestoreRunner.is_encrypted = False
+        restore_runner = utils.import_class(RESTORE_CBBACKUPSTREAM_CLS)(
+            'swift', location='http://some.where',
+            checksum='True_checksum', restore_location='/tmp/somewhere')
+        self.assertEqual(UNZIP + PIPE + 'sudo tar xpf - -C /',
+                         restore_runner.restore_cmd)
+        self.assertEqual('/tmp/backups/buckets/b1',
+                         restore_runner._bucket_dump_dir('b1'))
+
 
 class MongodbBackupTests(trove_testtools.TestCase):
 
@@ -524,3 +891,62 @@ class MongodbRestoreTests(trove_testtools.TestCase):
         self.restore_runner.post_restore = mock.Mock()
         self.assertRaises(exception.ProcessExecutionError,
                           self.restore_runner.restore)
+
+
+class PgDumpParallelTests(trove_testtools.TestCase):
+
+    def setUp(self):
+        super(PgDumpParallelTests, self).setUp()
+        self.pgutil = patch('trove.guestagent.datastore.experimental.'
+                            'postgresql.pgutil.execute').start()
+        self.remove = patch.object(operating_system, 'remove').start()
+        self.addCleanup(patch.stopall)
+
+    @patch.object(operating_system, 'create_directory')
+    @patch('trove.guestagent.datastore.experimental.postgresql.pgutil.query',
+           return_value=iter([['db1', 'UTF8', 'C\n'], ['postgres']]))
+    def test_backup_dumps_databases(self, query, create_directory):
+        backupBase.BackupRunner.is_encrypted = False
+        bkp = utils.import_class(BACKUP_PGDUMP_PARALLEL_CLS)(12345)
+        self.assertEqual("sudo tar cPf - /var/lib/postgresql/dump" +
+                         PIPE + ZIP, bkp.command)
+        bkp._run_pre_backup()
+        self.pgutil.assert_has_calls([
+            call('pg_dumpall', '--globals-only',
+                 '-f', '/var/lib/postgresql/dump/globals.sql', timeout=None),
+            call('pg_dump', '--format=directory', '--jobs', '4', '--file',
+                 '/var/lib/postgresql/dump/databases/db1', 'db1',
+                 timeout=None),
+            call('pg_dump', '--format=directory', '--jobs', '4', '--file',
+                 '/var/lib/postgresql/dump/databases/postgres', 'postgres',
+                 timeout=None)])
+
+    @patch.object(operating_system, 'create_directory')
+    def test_backup_failure_removes_dump(self, create_directory):
+        self.pgutil.side_effect = exception.ProcessExecutionError('Error')
+        bkp = utils.import_class(BACKUP_PGDUMP_PARALLEL_CLS)(12345)
+        self.assertRaises(exception.ProcessExecutionError,
+                          bkp._run_pre_backup)
+        self.remove.assert_called_with('/var/lib/postgresql/dump',
+                                       force=True, as_root=True)
+
+    @patch.object(os, 'listdir', return_value=['postgres', 'db1'])
+    def test_restore_databases(self, listdir):
+        restoreBase.RestoreRunner.is_zipped = False
+        restoreBase.RestoreRunner.is_encrypted = False
+        restr = utils.import_class(RESTORE_PGDUMP_PARALLEL_CLS)(
+            None, restore_location="/tmp", location="filename",
+            checksum="md5")
+        self.assertEqual("sudo tar xPf -", restr.restore_cmd)
+        restr.post_restore()
+        self.pgutil.assert_has_calls([
+            call('psql', '-q', '-f', '/var/lib/postgresql/dump/globals.sql',
+                 timeout=None),
+            call('pg_restore', '--jobs', '4', '--dbname', 'postgres',
+                 '--create', '/var/lib/postgresql/dump/databases/db1',
+                 timeout=None),
+            call('pg_restore', '--jobs', '4', '--dbname', 'postgres',
+                 '/var/lib/postgresql/dump/databases/postgres',
+                 timeout=None)])
+        self.remove.assert_called_once_with('/var/lib/postgresql/dump',
+                                            force=True, as_root=True)
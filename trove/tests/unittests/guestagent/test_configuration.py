@@ -20,11 +20,13 @@ from mock import MagicMock
 from mock import Mock
 from mock import patch
 import os
+import shutil
 import tempfile
 from trove.common.stream_codecs import IniCodec
 from trove.guestagent.common.configuration import ConfigurationManager
 from trove.guestagent.common.configuration import ImportOverrideStrategy
 from trove.guestagent.common.configuration import OneFileOverrideStrategy
+from trove.guestagent.common.configuration import ParsedFileCache
 from trove.guestagent.common import operating_system
 from trove.guestagent.common.operating_system import FileMode
 from trove.tests.unittests import trove_testtools
@@ -37,7 +39,7 @@ class TestConfigurationManager(trove_testtools.TestCase):
                     chown=DEFAULT, chmod=DEFAULT)
     def test_read_write_configuration(self, read_file, write_file,
                                       chown, chmod):
-        sample_path = Mock()
+        sample_path = '/etc/trove/sample.cfg'
         sample_owner = Mock()
         sample_group = Mock()
         sample_codec = MagicMock()
@@ -449,3 +451,67 @@ class TestConfigurationOverrideStrategy(trove_testtools.TestCase):
             self.assertEqual('pi', manager.get_value('Section_1')['name'])
             self.assertEqual('3.1415', manager.get_value('Section_1')['value'])
             self.assertIsNone(manager.get_value('Section_2'))
+
+
+class TestParsedFileCache(trove_testtools.TestCase):
+
+    def setUp(self):
+        trove_testtools.TestCase.setUp(self)
+        self.codec = IniCodec()
+        fd, self.path = tempfile.mkstemp()
+        os.close(fd)
+        self.addCleanup(os.remove, self.path)
+        self.cache = ParsedFileCache(self.codec)
+
+    def _write(self, contents, age=10):
+        operating_system.write_file(self.path, contents, self.codec)
+        mtime = os.stat(self.path).st_mtime - age
+        os.utime(self.path, (mtime, mtime))
+
+    def test_read_unchanged_file_once(self):
+        self._write({'Section_1': {'name': 'pi'}})
+        with patch.object(operating_system, 'read_file',
+                          wraps=operating_system.read_file) as read_file:
+            self.assertEqual('pi', self.cache.read(self.path)[
+                'Section_1']['name'])
+            self.assertEqual('pi', self.cache.read(self.path)[
+                'Section_1']['name'])
+        self.assertEqual(1, read_file.call_count)
+
+    def test_read_changed_file(self):
+        self._write({'Section_1': {'name': 'pi'}})
+        self.cache.read(self.path)
+        self._write({'Section_1': {'name': 'sqrt(2)'}}, age=5)
+        self.assertEqual('sqrt(2)', self.cache.read(self.path)[
+            'Section_1']['name'])
+
+    def test_recently_modified_file_not_cached(self):
+        self._write({'Section_1': {'name': 'pi'}}, age=0)
+        with patch.object(operating_system, 'read_file',
+                          wraps=operating_system.read_file) as read_file:
+            self.cache.read(self.path)
+            self.cache.read(self.path)
+        self.assertEqual(2, read_file.call_count)
+
+    def test_read_returns_copy(self):
+        self._write({'Section_1': {'name': 'pi'}})
+        self.cache.read(self.path)['Section_1']['name'] = 'e'
+        self.assertEqual('pi', self.cache.read(self.path)[
+            'Section_1']['name'])
+
+    def test_batch_update(self):
+        revision_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, revision_dir)
+        manager = ConfigurationManager(
+            self.path, getpass.getuser(), getpass.getuser(), self.codec,
+            override_strategy=ImportOverrideStrategy(revision_dir, 'ext'))
+        self._write({'Section_1': {'name': 'pi'}})
+        with patch.object(manager, 'parse_configuration',
+                          wraps=manager.parse_configuration) as parse:
+            with manager.batch_update():
+                manager.apply_user_override({'Section_1': {'name': 'e'}})
+                manager.apply_system_override({'Section_2': {'foo': 'bar'}})
+                self.assertEqual(0, parse.call_count)
+            self.assertEqual(1, parse.call_count)
+        self.assertEqual('e', manager.get_value('Section_1')['name'])
+        self.assertEqual('bar', manager.get_value('Section_2')['foo'])
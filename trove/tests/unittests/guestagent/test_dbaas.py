@@ -70,6 +70,7 @@ from trove.guestagent.datastore.mysql.service import MySqlAdmin
 from trove.guestagent.datastore.mysql.service import MySqlApp
 from trove.guestagent.datastore.mysql.service import MySqlAppStatus
 from trove.guestagent.datastore.mysql.service import MySqlRootAccess
+from trove.guestagent.datastore import service as datastore_service
 from trove.guestagent.datastore.service import BaseDbStatus
 from trove.guestagent.db import models
 from trove.guestagent import dbaas as dbaas_sr
@@ -101,6 +102,7 @@ conductor_api.API.heartbeat = Mock()
 class FakeAppStatus(BaseDbStatus):
 
     def __init__(self, id, status):
+        super(FakeAppStatus, self).__init__()
         self.id = id
         self.next_fake_status = status
 
@@ -639,6 +641,35 @@ class MySqlAdminTest(testtools.TestCase):
 
         self.assertTrue("AND Marker >= '" + marker + "'" in args[0].text)
 
+    def _list_users_queries(self, user_count):
+        users = ResultSetStub(
+            [{'User': 'user%03d' % index, 'Host': '%',
+              'Marker': 'user%03d@%%' % index}
+             for index in range(user_count)])
+        grants = [{'grantee': "'user%03d'@'%%'" % index,
+                   'table_schema': 'db%d' % db}
+                  for index in range(user_count) for db in range(2)]
+        with patch.object(dbaas.LocalSqlClient, 'execute',
+                          Mock(side_effect=[users, grants])):
+            listed, next_marker = self.mySqlAdmin.list_users(limit=1000)
+            queries = dbaas.LocalSqlClient.execute.call_args_list
+
+        self.assertEqual(user_count, len(listed))
+        for user in listed:
+            self.assertEqual(['db0', 'db1'],
+                             [db['_name'] for db in user['_databases']])
+        return queries
+
+    def test_list_users_associates_dbs_in_one_query(self):
+        for user_count in (1, 100):
+            queries = self._list_users_queries(user_count)
+            self.assertEqual(2, len(queries))
+
+        args, kwargs = queries[1]
+        self.assertIn("grantee IN (:grantee0, :grantee1,", args[0].text)
+        self.assertEqual(100, len(kwargs))
+        self.assertEqual("'user000'@'%'", kwargs['grantee0'])
+
     @patch.object(dbaas.MySqlAdmin, '_associate_dbs')
     def test_get_user(self, mock_associate_dbs):
         """
@@ -1865,6 +1896,103 @@ class BaseDbStatusTest(testtools.TestCase):
                          wait_for_real_status_to_change_to
                          (rd_instance.ServiceStatuses.SHUTDOWN, 10))
 
+    @patch.object(conductor_api.API, 'heartbeat')
+    def test_update_reports_changes_only(self, mock_heartbeat):
+        cfg.CONF.set_override('report_interval', 30)
+        self.addCleanup(cfg.CONF.clear_override, 'report_interval')
+        self.baseDbStatus = BaseDbStatus()
+        self.baseDbStatus.status = rd_instance.ServiceStatuses.SHUTDOWN
+        self.baseDbStatus._get_actual_db_status = Mock(
+            return_value=rd_instance.ServiceStatuses.RUNNING)
+
+        with patch.object(datastore_service.time, 'time', return_value=0):
+            self.baseDbStatus.update()
+        with patch.object(datastore_service.time, 'time', return_value=10):
+            self.baseDbStatus.update()
+
+        self.assertEqual(1, mock_heartbeat.call_count)
+        self.assertEqual(rd_instance.ServiceStatuses.RUNNING,
+                         self.baseDbStatus.status)
+
+        self.baseDbStatus._get_actual_db_status.return_value = (
+            rd_instance.ServiceStatuses.SHUTDOWN)
+        with patch.object(datastore_service.time, 'time', return_value=20):
+            self.baseDbStatus.update()
+        self.assertEqual(2, mock_heartbeat.call_count)
+
+    @patch.object(conductor_api.API, 'heartbeat')
+    def test_update_heartbeat_interval_backs_off(self, mock_heartbeat):
+        cfg.CONF.set_override('report_interval', 30)
+        cfg.CONF.set_override('agent_keepalive_max_interval', 120)
+        self.addCleanup(cfg.CONF.clear_override, 'report_interval')
+        self.addCleanup(cfg.CONF.clear_override,
+                        'agent_keepalive_max_interval')
+        self.baseDbStatus = BaseDbStatus()
+        self.baseDbStatus.status = rd_instance.ServiceStatuses.RUNNING
+        self.baseDbStatus._get_actual_db_status = Mock(
+            return_value=rd_instance.ServiceStatuses.RUNNING)
+
+        sent = []
+        for tick in range(0, 600, 30):
+            with patch.object(datastore_service.time, 'time',
+                              return_value=tick):
+                self.baseDbStatus.update()
+            if mock_heartbeat.call_count > len(sent):
+                sent.append(tick)
+
+        self.assertEqual([0, 30, 90, 210, 330, 450, 570], sent)
+
+    def test_probe_db_status(self):
+        self.baseDbStatus = BaseDbStatus()
+        probe = Mock()
+        probe.probe.return_value = rd_instance.ServiceStatuses.RUNNING
+        self.baseDbStatus._create_status_probe = Mock(return_value=probe)
+
+        for _ in range(2):
+            self.assertEqual(rd_instance.ServiceStatuses.RUNNING,
+                             self.baseDbStatus._probe_db_status())
+        self.baseDbStatus._create_status_probe.assert_called_once_with()
+
+    def test_probe_db_status_disabled(self):
+        cfg.CONF.set_override('status_probe_enabled', False)
+        self.addCleanup(cfg.CONF.clear_override, 'status_probe_enabled')
+        self.baseDbStatus = BaseDbStatus()
+        self.baseDbStatus._create_status_probe = Mock()
+
+        self.assertIsNone(self.baseDbStatus._probe_db_status())
+        self.assertEqual(0, self.baseDbStatus._create_status_probe.call_count)
+
+
+class StatusProbeTest(testtools.TestCase):
+
+    def setUp(self):
+        super(StatusProbeTest, self).setUp()
+        connection_patch = patch.object(datastore_service.httplib,
+                                        'HTTPConnection')
+        self.connection_class = connection_patch.start()
+        self.addCleanup(connection_patch.stop)
+        self.connection = self.connection_class.return_value
+        self.response = self.connection.getresponse.return_value
+        self.response.status = 200
+        self.probe = couchdb_service.CouchDBStatusProbe(5)
+
+    def test_probe_reuses_connection(self):
+        self.response.read.return_value = '{"couchdb": "Welcome"}'
+
+        for _ in range(2):
+            self.assertEqual(rd_instance.ServiceStatuses.RUNNING,
+                             self.probe.probe())
+        self.connection_class.assert_called_once_with('127.0.0.1', 5984,
+                                                      timeout=5)
+        self.assertIsNotNone(self.probe.latency)
+
+    def test_probe_failure(self):
+        self.response.status = 500
+
+        self.assertIsNone(self.probe.probe())
+        self.connection.close.assert_called_once_with()
+        self.assertIsNotNone(self.probe.latency)
+
 
 class MySqlAppStatusTest(testtools.TestCase):
 
@@ -1879,6 +2007,9 @@ class MySqlAppStatusTest(testtools.TestCase):
         InstanceServiceStatus.create(instance_id=self.FAKE_ID,
                                      status=rd_instance.ServiceStatuses.NEW)
         dbaas.CONF.guest_id = self.FAKE_ID
+        # Exercise the command line checks, the probe is tested below.
+        cfg.CONF.set_override('status_probe_enabled', False)
+        self.addCleanup(cfg.CONF.clear_override, 'status_probe_enabled')
 
     def tearDown(self):
         super(MySqlAppStatusTest, self).tearDown()
@@ -1932,6 +2063,49 @@ class MySqlAppStatusTest(testtools.TestCase):
 
         self.assertEqual(rd_instance.ServiceStatuses.BLOCKED, status)
 
+    @patch.object(dbaas.MySqlStatusProbe, '_check',
+                  return_value=rd_instance.ServiceStatuses.RUNNING)
+    @patch.object(utils, 'execute_with_timeout')
+    def test_get_actual_db_status_probe(self, mock_execute, mock_check):
+        cfg.CONF.set_override('status_probe_enabled', True)
+
+        self.mySqlAppStatus = MySqlAppStatus()
+        status = self.mySqlAppStatus._get_actual_db_status()
+
+        self.assertEqual(rd_instance.ServiceStatuses.RUNNING, status)
+        self.assertEqual(0, mock_execute.call_count)
+
+    @patch.object(dbaas.MySqlStatusProbe, '_check',
+                  side_effect=sqlalchemy.exc.OperationalError('', {}, ''))
+    @patch.object(utils, 'execute_with_timeout',
+                  side_effect=[ProcessExecutionError(),
+                               ("some output", None)])
+    def test_get_actual_db_status_probe_failed(self, mock_execute,
+                                               mock_check):
+        cfg.CONF.set_override('status_probe_enabled', True)
+
+        self.mySqlAppStatus = MySqlAppStatus()
+        status = self.mySqlAppStatus._get_actual_db_status()
+
+        self.assertEqual(rd_instance.ServiceStatuses.BLOCKED, status)
+
+    @patch.object(dbaas, 'get_auth_password', side_effect=['old', 'new'])
+    @patch.object(dbaas.sqlalchemy, 'create_engine')
+    def test_status_probe_new_engine_after_failure(self, mock_create_engine,
+                                                   mock_password):
+        failed_engine = MagicMock()
+        failed_engine.connect.side_effect = (
+            sqlalchemy.exc.OperationalError('', {}, ''))
+        mock_create_engine.side_effect = [failed_engine, MagicMock()]
+        probe = dbaas.MySqlStatusProbe(5)
+
+        self.assertIsNone(probe.probe())
+        self.assertEqual(rd_instance.ServiceStatuses.RUNNING, probe.probe())
+
+        failed_engine.dispose.assert_called_once_with()
+        self.assertEqual(2, mock_create_engine.call_count)
+        self.assertIn(':new@', mock_create_engine.call_args[0][0])
+
 
 class TestRedisApp(testtools.TestCase):
 
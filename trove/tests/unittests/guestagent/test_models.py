@@ -13,9 +13,11 @@
 #    under the License.
 
 from datetime import datetime
+from datetime import timedelta
 
 from mock import Mock, MagicMock, patch
 
+from trove.common import cfg
 from trove.common import utils
 from trove.db import models as dbmodels
 from trove.db.sqlalchemy import api as dbapi
@@ -66,3 +68,17 @@ class AgentHeartBeatTest(trove_testtools.TestCase):
         mock = models.AgentHeartBeat()
         models.AgentHeartBeat.__setitem__(mock, 'updated_at', datetime.now())
         self.assertTrue(models.AgentHeartBeat.is_active(mock))
+
+    def test_is_active_keepalive(self):
+        cfg.CONF.set_override('agent_heartbeat_expiry', 60)
+        cfg.CONF.set_override('agent_keepalive_max_interval', 300)
+        self.addCleanup(cfg.CONF.clear_override, 'agent_heartbeat_expiry')
+        self.addCleanup(cfg.CONF.clear_override,
+                        'agent_keepalive_max_interval')
+        mock = models.AgentHeartBeat()
+        models.AgentHeartBeat.__setitem__(
+            mock, 'updated_at', datetime.now() - timedelta(seconds=500))
+        self.assertTrue(models.AgentHeartBeat.is_active(mock))
+        models.AgentHeartBeat.__setitem__(
+            mock, 'updated_at', datetime.now() - timedelta(seconds=700))
+        self.assertFalse(models.AgentHeartBeat.is_active(mock))
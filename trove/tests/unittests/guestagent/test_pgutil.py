@@ -0,0 +1,117 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import os
+import tempfile
+import uuid
+
+from mock import MagicMock
+from mock import Mock
+from mock import patch
+
+from trove.common import exception
+from trove.guestagent.datastore.experimental.postgresql import pgutil
+from trove.tests.unittests import trove_testtools
+
+
+class FakePgError(Exception):
+    pass
+
+
+class PgUtilTest(trove_testtools.TestCase):
+
+    def setUp(self):
+        super(PgUtilTest, self).setUp()
+        self.psycopg2 = Mock(Error=FakePgError)
+        psycopg2_patch = patch.object(pgutil, 'psycopg2', self.psycopg2)
+        psycopg2_patch.start()
+        self.addCleanup(psycopg2_patch.stop)
+
+        self.conn = MagicMock(closed=False)
+        self.cursor = MagicMock(statusmessage='GRANT')
+        self.cursor.execute = MagicMock()
+        self.cursor.__enter__.return_value = self.cursor
+        self.cursor.__iter__.return_value = iter([('db1', 'UTF8', 'C')])
+        self.conn.cursor.return_value = self.cursor
+        self.psycopg2.connect.return_value = self.conn
+
+        self.pool = pgutil.ConnectionPool(1)
+        pool_patch = patch.object(pgutil, '_pool', self.pool)
+        pool_patch.start()
+        self.addCleanup(pool_patch.stop)
+        disabled_patch = patch.object(pgutil, '_pool_disabled', False)
+        disabled_patch.start()
+        self.addCleanup(disabled_patch.stop)
+
+    def test_query_on_connection(self):
+        results = pgutil.query('SELECT datname FROM pg_database')
+        self.assertEqual([['db1', 'UTF8', 'C']], list(results))
+        self.cursor.execute.assert_called_with(
+            'SELECT datname FROM pg_database')
+        self.conn.rollback.assert_called_once_with()
+        self.assertEqual(self.conn, self.pool.get())
+        self.assertEqual(1, self.psycopg2.connect.call_count)
+
+    def test_query_checks_out_connection_on_iteration(self):
+        results = pgutil.query('SELECT datname FROM pg_database')
+        self.assertEqual(0, self.psycopg2.connect.call_count)
+        next(results)
+        self.assertEqual(1, self.psycopg2.connect.call_count)
+
+    def test_psql_on_connection(self):
+        self.assertEqual(('GRANT', ''), pgutil.psql('GRANT ALL'))
+        self.assertTrue(self.conn.autocommit)
+        self.cursor.execute.assert_called_with('GRANT ALL')
+
+    def test_psql_failure(self):
+        self.cursor.execute.side_effect = [None, FakePgError('failed')]
+        self.assertRaises(exception.ProcessExecutionError,
+                          pgutil.psql, 'GRANT ALL')
+        self.conn.close.assert_called_once_with()
+
+    @patch.object(pgutil, 'execute')
+    def test_psql_fallback(self, execute):
+        self.psycopg2.connect.side_effect = FakePgError('no connection')
+        pgutil.psql('GRANT ALL', timeout=10)
+        execute.assert_called_once_with('psql', '-c', 'GRANT ALL',
+                                        timeout=10)
+
+    @patch.object(pgutil, 'execute')
+    def test_auth_failure_disables_pool(self, execute):
+        self.psycopg2.connect.side_effect = FakePgError(
+            'FATAL:  Peer authentication failed for user "postgres"')
+        pgutil.psql('GRANT ALL')
+        pgutil.psql('GRANT ALL')
+        self.assertEqual(1, self.psycopg2.connect.call_count)
+        self.assertEqual(2, execute.call_count)
+        self.assertIsNone(pgutil._get_pool())
+
+    @patch.object(pgutil.operating_system, 'remove')
+    @patch.object(pgutil.operating_system, 'chmod')
+    @patch.object(pgutil, 'execute')
+    def test_query_rows_same_on_both_paths(self, execute, *args):
+        self.cursor.__iter__.return_value = iter(
+            [('db1', 'UTF8', 'C'), ('db2', None, True)])
+        pooled = list(pgutil.query('SELECT datname FROM pg_database'))
+
+        file_id = uuid.uuid4()
+        csv_file = os.path.join(tempfile.gettempdir(), str(file_id))
+        with open(csv_file, 'w') as f:
+            f.write('db1,UTF8,C\ndb2,,t\n')
+        self.addCleanup(os.remove, csv_file)
+        self.psycopg2.connect.side_effect = FakePgError('no connection')
+        with patch.object(pgutil.uuid, 'uuid4', return_value=file_id):
+            fallback = list(pgutil.query('SELECT datname FROM pg_database'))
+
+        self.assertEqual(1, execute.call_count)
+        self.assertEqual([['db1', 'UTF8', 'C'], ['db2', '', 't']], pooled)
+        self.assertEqual(pooled, fallback)
@@ -0,0 +1,119 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import os
+import shutil
+import stat
+import tempfile
+import threading
+
+from mock import patch
+from testtools import ExpectedException
+
+from trove.common import cfg
+from trove.common import exception
+from trove.common import utils
+from trove.guestagent.common import operating_system
+from trove.guestagent.common import root_helper
+from trove.tests.unittests import trove_testtools
+
+CONF = cfg.CONF
+
+
+class TestRootHelper(trove_testtools.TestCase):
+
+    def setUp(self):
+        super(TestRootHelper, self).setUp()
+        self.tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp_dir)
+        self.socket_path = os.path.join(self.tmp_dir, 'helper.sock')
+
+        # Serve as the current user, the helper would run as root.
+        self.server = root_helper.RootHelperServer(self.socket_path,
+                                                   os.getuid())
+        thread = threading.Thread(target=self.server.serve_forever,
+                                  kwargs={'poll_interval': 0.01})
+        thread.daemon = True
+        thread.start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+
+        self.client = root_helper.RootHelperClient(self.socket_path, 1)
+        client_patch = patch.object(root_helper, '_client', self.client)
+        client_patch.start()
+        self.addCleanup(client_patch.stop)
+        cfg.CONF.set_override('guest_root_helper', True)
+        self.addCleanup(cfg.CONF.clear_override, 'guest_root_helper')
+
+    def test_socket_restricted_to_owner(self):
+        mode = stat.S_IMODE(os.stat(self.socket_path).st_mode)
+        self.assertEqual(0o600, mode)
+
+    def test_run(self):
+        path = os.path.join(self.tmp_dir, 'a', 'b')
+        self.client.run([['mkdir', '-p', path], ['chmod', '700', path]])
+        self.assertTrue(os.path.isdir(path))
+        self.assertEqual(0o700, stat.S_IMODE(os.stat(path).st_mode))
+
+    def test_run_stops_at_failure(self):
+        path = os.path.join(self.tmp_dir, 'dir')
+        missing = os.path.join(self.tmp_dir, 'missing')
+        with ExpectedException(exception.ProcessExecutionError):
+            self.client.run([['chmod', '700', missing], ['mkdir', path]])
+        self.assertFalse(os.path.exists(path))
+
+    def test_run_rejects_other_commands(self):
+        with ExpectedException(exception.ProcessExecutionError,
+                               '.*Command not allowed.*'):
+            self.client.run([['touch', os.path.join(self.tmp_dir, 'f')]])
+        self.assertEqual(['helper.sock'], os.listdir(self.tmp_dir))
+
+    def test_operating_system_uses_helper(self):
+        path = os.path.join(self.tmp_dir, 'dir')
+        with patch.object(utils, 'execute_with_timeout') as exec_call:
+            operating_system.create_directory(path, as_root=True)
+            operating_system.chmod(path, operating_system.FileMode.SET_USR_RW,
+                                   as_root=True)
+        self.assertEqual(0, exec_call.call_count)
+        self.assertEqual(0o600, stat.S_IMODE(os.stat(path).st_mode))
+
+    def test_batch(self):
+        path = os.path.join(self.tmp_dir, 'dir')
+        with patch.object(self.client, 'run',
+                          wraps=self.client.run) as run_call:
+            with root_helper.batch():
+                operating_system.create_directory(path, as_root=True)
+                operating_system.chmod(
+                    path, operating_system.FileMode.SET_USR_RW, as_root=True)
+                self.assertFalse(os.path.exists(path))
+        self.assertEqual(1, run_call.call_count)
+        self.assertEqual(0o600, stat.S_IMODE(os.stat(path).st_mode))
+
+    def test_batch_dropped_on_error(self):
+        path = os.path.join(self.tmp_dir, 'dir')
+        with ExpectedException(ValueError):
+            with root_helper.batch():
+                operating_system.create_directory(path, as_root=True)
+                raise ValueError()
+        self.assertFalse(os.path.exists(path))
+
+    @patch.object(utils, 'execute_with_timeout')
+    def test_fallback_to_sudo(self, exec_call):
+        client = root_helper.RootHelperClient(
+            os.path.join(self.tmp_dir, 'missing.sock'), 1)
+        with patch.object(root_helper, '_client', client):
+            with patch.object(client, '_start',
+                              side_effect=root_helper.RootHelperUnavailable):
+                root_helper.execute('chmod', '700', '/path', timeout=10)
+        exec_call.assert_called_once_with(
+            'chmod', '700', '/path', run_as_root=True, root_helper='sudo',
+            timeout=10)
@@ -11,9 +11,10 @@
 #    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
 #    License for the specific language governing permissions and limitations
 #    under the License.
+import datetime
 import uuid
 
-from mock import Mock, patch
+from mock import ANY, Mock, patch
 
 from trove.backup import models as backup_models
 from trove.common import cfg
@@ -291,3 +292,153 @@ class TestReplication(trove_testtools.TestCase):
                           None, 'name', 2, "UUID", [], [], None,
                           self.datastore_version, 1,
                           None, slave_of_id=self.replica_info.id)
+
+
+class TestInstancesLoadServersStatus(trove_testtools.TestCase):
+
+    def setUp(self):
+        util.init_db()
+        super(TestInstancesLoadServersStatus, self).setUp()
+        self.db_infos = []
+        for status in (ServiceStatuses.RUNNING, ServiceStatuses.SHUTDOWN,
+                       None):
+            db_info = DBInstance(InstanceTasks.NONE,
+                                 id=str(uuid.uuid4()),
+                                 name="TestInstance",
+                                 compute_instance_id=str(uuid.uuid4()),
+                                 datastore_version_id=str(uuid.uuid4()))
+            db_info.save()
+            self.addCleanup(db_info.delete)
+            if status:
+                service_status = InstanceServiceStatus(
+                    status, id=str(uuid.uuid4()), instance_id=db_info.id)
+                service_status.save()
+                self.addCleanup(service_status.delete)
+            self.db_infos.append(db_info)
+        self.server = Mock(status='ACTIVE', addresses={})
+
+    def _load_servers_status(self):
+        def load_instance(context, db, status, server=None):
+            return db, status, server
+
+        return models.Instances._load_servers_status(
+            load_instance, None, self.db_infos,
+            lambda instance_id, server_id: self.server)
+
+    def test_statuses_loaded_in_one_query(self):
+        with patch.object(InstanceServiceStatus, 'find_by') as find_by:
+            with patch.object(InstanceServiceStatus, 'find_all_in',
+                              wraps=InstanceServiceStatus.find_all_in
+                              ) as find_all_in:
+                loaded = self._load_servers_status()
+        self.assertFalse(find_by.called)
+        self.assertEqual(1, find_all_in.call_count)
+        self.assertEqual(
+            [(self.db_infos[0], ServiceStatuses.RUNNING, self.server),
+             (self.db_infos[1], ServiceStatuses.SHUTDOWN, self.server)],
+            [(db, status.status, server) for db, status, server in loaded])
+
+    def test_instance_without_status_skipped(self):
+        loaded = self._load_servers_status()
+        self.assertNotIn(self.db_infos[2], [db for db, _, _ in loaded])
+
+    def test_find_statuses(self):
+        ids = [db_info.id for db_info in self.db_infos[:2]]
+        with patch.object(InstanceServiceStatus, 'find_all_in',
+                          wraps=InstanceServiceStatus.find_all_in
+                          ) as find_all_in:
+            statuses = InstanceServiceStatus.find_statuses(ids)
+        self.assertEqual(1, find_all_in.call_count)
+        self.assertEqual({ids[0]: ServiceStatuses.RUNNING,
+                          ids[1]: ServiceStatuses.SHUTDOWN}, statuses)
+
+    def test_find_statuses_missing(self):
+        self.assertRaises(exception.ModelNotFoundError,
+                          InstanceServiceStatus.find_statuses,
+                          [db_info.id for db_info in self.db_infos])
+
+
+class ServerCacheTest(trove_testtools.TestCase):
+
+    def setUp(self):
+        super(ServerCacheTest, self).setUp()
+        self.servers = [Mock(id='server1'), Mock(id='server2')]
+        self.nova_client = Mock()
+        self.nova_client.servers.list.return_value = self.servers
+        nova_patch = patch.object(models, 'create_nova_client',
+                                  return_value=self.nova_client)
+        nova_patch.start()
+        self.addCleanup(nova_patch.stop)
+        self.context = Mock(tenant='tenant1')
+
+    def test_no_ttl_lists_every_time(self):
+        cache = models.ServerCache(0)
+        self.assertEqual(self.servers, cache.list(self.context))
+        self.assertEqual(self.servers, cache.list(self.context))
+        self.assertEqual(2, self.nova_client.servers.list.call_count)
+        self.assertEqual(2, cache.compute_api_calls)
+        self.assertEqual(2, cache.listings)
+
+    def test_servers_cached(self):
+        cache = models.ServerCache(60)
+        cache.list(self.context, ['server1'])
+        self.assertEqual(self.servers,
+                         cache.list(self.context, ['server1', 'server2']))
+        self.assertEqual(1, self.nova_client.servers.list.call_count)
+        self.assertEqual(1, cache.compute_api_calls)
+        self.assertEqual(2, cache.listings)
+
+    def test_servers_cached_per_tenant(self):
+        cache = models.ServerCache(60)
+        cache.list(self.context)
+        cache.list(Mock(tenant='tenant2'))
+        self.assertEqual(2, self.nova_client.servers.list.call_count)
+
+    def test_expired_servers_listed_again(self):
+        cache = models.ServerCache(60)
+        with patch.object(models.time, 'time', return_value=1000):
+            cache.list(self.context)
+        with patch.object(models.time, 'time', return_value=1061):
+            cache.list(self.context)
+        self.assertEqual(2, self.nova_client.servers.list.call_count)
+
+    def test_unknown_server_listed_again(self):
+        cache = models.ServerCache(60)
+        cache.list(self.context)
+        cache.list(self.context, ['server3'])
+        self.assertEqual(2, self.nova_client.servers.list.call_count)
+
+    def test_updated_instance_listed_again(self):
+        cache = models.ServerCache(60)
+        cache.list(self.context, ['server1'])
+        cache.list(self.context, ['server1'],
+                   last_updated=datetime.datetime.utcnow())
+        self.assertEqual(2, self.nova_client.servers.list.call_count)
+
+    def test_instance_updated_before_fetch_uses_cache(self):
+        cache = models.ServerCache(60)
+        last_updated = (datetime.datetime.utcnow() -
+                        datetime.timedelta(seconds=1))
+        cache.list(self.context, ['server1'])
+        cache.list(self.context, ['server1'], last_updated=last_updated)
+        self.assertEqual(1, self.nova_client.servers.list.call_count)
+
+    def test_hit_ratio_logged(self):
+        cache = models.ServerCache(60)
+        with patch.object(models, 'LOG') as mock_log:
+            cache.list(self.context)
+            cache.list(self.context)
+        self.assertEqual(0.5, cache.hit_ratio)
+        mock_log.debug.assert_called_with(
+            ANY, {'listings': 2, 'calls': 1, 'ratio': 0.5})
+
+    def test_invalidated_on_instance_save(self):
+        with patch.object(models, 'SERVER_CACHE',
+                          models.ServerCache(60)) as cache:
+            cache.list(self.context)
+            db_info = DBInstance(InstanceTasks.NONE, name="TestInstance",
+                                 tenant_id='tenant1')
+            with patch.object(models.dbmodels.DatabaseModelBase, 'save'):
+                db_info.save()
+            cache.list(self.context)
+        self.assertEqual(2, self.nova_client.servers.list.call_count)
@@ -29,6 +29,7 @@ from trove.common import instance as rd_instance
 from trove.common import remote
 from trove.datastore import models as datastore_models
 import trove.extensions.mgmt.instances.models as mgmtmodels
+from trove.flavor.models import FLAVOR_CACHE
 from trove.guestagent.api import API
 from trove.instance.models import DBInstance
 from trove.instance.models import InstanceServiceStatus
@@ -83,6 +84,8 @@ class MockMgmtInstanceTest(trove_testtools.TestCase):
         CONF.set_override('host', 'test_host')
         CONF.set_override('exists_notification_interval', 1)
         CONF.set_override('notification_service_id', {'mysql': '123'})
+        FLAVOR_CACHE.clear()
+        self.addCleanup(FLAVOR_CACHE.clear)
 
         super(MockMgmtInstanceTest, self).setUp()
 
@@ -125,8 +128,8 @@ class TestNotificationTransformer(MockMgmtInstanceTest):
         status = rd_instance.ServiceStatuses.BUILDING.api_status
         instance, service_status = self.build_db_instance(
             status, InstanceTasks.BUILDING)
-        payloads = mgmtmodels.NotificationTransformer(
-            context=self.context)()
+        payloads = list(mgmtmodels.NotificationTransformer(
+            context=self.context)())
         self.assertIsNotNone(payloads)
         payload = payloads[0]
         self.assertThat(payload['audit_period_beginning'],
@@ -135,6 +138,42 @@ class TestNotificationTransformer(MockMgmtInstanceTest):
         self.assertTrue(status.lower() in [db['state'] for db in payloads])
         self.addCleanup(self.do_cleanup, instance, service_status)
 
+    def test_transformer_loads_instances_in_batches(self):
+        self.addCleanup(CONF.clear_override, 'exists_notification_batch_size')
+        CONF.set_override('exists_notification_batch_size', 2)
+        status = rd_instance.ServiceStatuses.RUNNING.api_status
+        instances = []
+        for _ in range(3):
+            instance, service_status = self.build_db_instance(status)
+            self.addCleanup(self.do_cleanup, instance, service_status)
+            instances.append(instance)
+        # an instance without a service status yet is skipped
+        new_instance, new_status = self.build_db_instance(status)
+        self.addCleanup(new_instance.delete)
+        new_status.delete()
+
+        with patch.object(InstanceServiceStatus, 'find_all_in',
+                          wraps=InstanceServiceStatus.find_all_in
+                          ) as find_all_in:
+            with patch.object(datastore_models.DatastoreVersion,
+                              'load_by_uuid',
+                              wraps=datastore_models.DatastoreVersion.
+                              load_by_uuid) as load_version:
+                payloads = mgmtmodels.NotificationTransformer(
+                    context=self.context)()
+                self.assertFalse(find_all_in.called)
+                instance_ids = [payload['instance_id']
+                                for payload in payloads]
+        self.assertEqual(
+            sorted(instance.id for instance in instances),
+            sorted(instance_id for instance_id in instance_ids
+                   if instance_id != new_instance.id))
+        self.assertNotIn(new_instance.id, instance_ids)
+        # One status query per batch of instances
+        total = len(DBInstance.find_all(deleted=False).all())
+        self.assertEqual((total + 1) // 2, find_all_in.call_count)
+        self.assertEqual(1, load_version.call_count)
+
     def test_get_service_id(self):
         id_map = {
             'mysql': '123',
@@ -168,8 +207,12 @@ class TestNovaNotificationTransformer(MockMgmtInstanceTest):
                 context=self.context)
             transformer2 = mgmtmodels.NovaNotificationTransformer(
                 context=self.context)
-            self.assertThat(transformer._flavor_cache,
-                            Not(Is(transformer2._flavor_cache)))
+            self.assertThat(transformer._lookup_flavor('1'),
+                            Equals('db.small'))
+            self.assertThat(transformer2._lookup_flavor('1'),
+                            Equals('db.small'))
+            # the transformers share the process wide flavor cache
+            self.flavor_mgr.get.assert_called_once_with('1')
 
     def test_lookup_flavor(self):
         flavor = MagicMock(spec=Flavor)
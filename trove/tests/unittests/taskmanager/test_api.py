@@ -80,6 +80,14 @@ class ApiTest(trove_testtools.TestCase):
         self._verify_rpc_prepare_before_cast()
         self._verify_cast('delete_cluster', cluster_id='some-cluster-id')
 
+    def test_notify_status_change(self):
+        self.api.notify_status_change('some-instance-id')
+
+        self.api.client.prepare.assert_called_once_with(
+            fanout=True, version=RPC_API_VERSION)
+        self._verify_cast('notify_status_change',
+                          object_id='some-instance-id')
+
     @patch.object(agent_models, 'AgentHeartBeat')
     def test_delete_heartbeat(self, mock_agent_heart_beat):
         mock_heartbeat = Mock()
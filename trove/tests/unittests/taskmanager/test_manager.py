@@ -14,10 +14,13 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import eventlet
 from mock import Mock, patch, PropertyMock
 
 from trove.backup.models import Backup
+from trove.common import cfg
 from trove.common.context import TroveContext
+from trove.common import utils
 from trove.instance.tasks import InstanceTasks
 from trove.taskmanager.manager import Manager
 from trove.taskmanager import models
@@ -184,6 +187,33 @@ class TestManager(trove_testtools.TestCase):
                                     self.manager.eject_replica_source,
                                     self.context, 'some-inst-id')
 
+    def test_migrate_replicas_concurrently(self):
+        replicas = [Mock(id='inst%d' % i) for i in range(8)]
+        running = []
+        most_running = []
+
+        def migrate(replica):
+            running.append(replica)
+            most_running.append(len(running))
+            eventlet.sleep(0.01)
+            running.remove(replica)
+            if replica.id in ('inst2', 'inst5'):
+                raise TroveError('Error')
+
+        failed = self.manager._migrate_replicas(
+            replicas, migrate, '%(slave)s %(old_master)s %(new_master)s',
+            self.mock_old_master, self.mock_master)
+        self.assertEqual(['inst2', 'inst5'], failed)
+        self.assertEqual(8, max(most_running))
+
+    def test_get_replica_txns_keeps_order(self):
+        for i, replica in enumerate([self.mock_slave1, self.mock_slave2]):
+            replica.get_last_txn.return_value = ['master-id', i]
+        self.assertEqual([[self.mock_slave1, 'master-id', 0],
+                          [self.mock_slave2, 'master-id', 1]],
+                         self.manager._get_replica_txns([self.mock_slave1,
+                                                         self.mock_slave2]))
+
     @patch.object(Backup, 'delete')
     def test_create_replication_slave(self, mock_backup_delete):
         mock_tasks = Mock()
@@ -204,6 +234,76 @@ class TestManager(trove_testtools.TestCase):
             replica_number=1)
         mock_backup_delete.assert_called_with(self.context, 'test-id')
 
+    @patch.object(Backup, 'delete')
+    def test_create_replication_slaves_concurrently(self, mock_backup_delete):
+        self.addCleanup(cfg.CONF.clear_override, 'replica_create_concurrency')
+        cfg.CONF.set_override('replica_create_concurrency', 3)
+        mock_snapshot = {'dataset': {'snapshot_id': 'test-id'}}
+        replicas = [Mock(id='id%d' % i) for i in range(1, 5)]
+        for replica in replicas:
+            replica.get_replication_master_snapshot.return_value = (
+                mock_snapshot)
+        replicas[1].create_instance.side_effect = TroveError
+        mock_flavor = Mock()
+        with patch.object(models.FreshInstanceTasks, 'load',
+                          side_effect=replicas):
+            self.manager.create_instance(self.context,
+                                         ['id1', 'id2', 'id3', 'id4'],
+                                         Mock(), mock_flavor, Mock(), None,
+                                         None, 'mysql', 'mysql-server', 2,
+                                         'temp-backup-id', None,
+                                         ['pw1', 'pw2', 'pw3', 'pw4'], None,
+                                         Mock(), 'some-master-id', None)
+        replicas[0].get_replication_master_snapshot.assert_called_with(
+            self.context, 'some-master-id', mock_flavor, 'temp-backup-id',
+            replica_number=1)
+        replicas[3].get_replication_master_snapshot.assert_called_with(
+            self.context, 'some-master-id', mock_flavor, 'test-id',
+            replica_number=4)
+        self.assertEqual('pw3', replicas[2].create_instance.call_args[0][9])
+        for index in (0, 2, 3):
+            replicas[index].wait_for_instance.assert_called_once_with(
+                cfg.CONF.restore_usage_timeout, mock_flavor)
+        self.assertFalse(replicas[1].wait_for_instance.called)
+        mock_backup_delete.assert_called_once_with(self.context, 'test-id')
+
+    @patch.object(Backup, 'delete')
+    def test_create_replication_slaves_first_replica_failed(
+            self, mock_backup_delete):
+        self.addCleanup(cfg.CONF.clear_override, 'replica_create_concurrency')
+        cfg.CONF.set_override('replica_create_concurrency', 2)
+        mock_snapshot = {'dataset': {'snapshot_id': 'test-id'}}
+        replicas = [Mock(id='id1'), Mock(id='id2')]
+        for replica in replicas:
+            replica.get_replication_master_snapshot.return_value = (
+                mock_snapshot)
+        replicas[0].create_instance.side_effect = TroveError
+        with patch.object(models.FreshInstanceTasks, 'load',
+                          side_effect=replicas):
+            self.manager.create_instance(self.context, ['id1', 'id2'],
+                                         Mock(), Mock(), Mock(), None, None,
+                                         'mysql', 'mysql-server', 2,
+                                         'temp-backup-id', None,
+                                         ['pw1', 'pw2'], None, Mock(),
+                                         'some-master-id', None)
+        self.assertFalse(replicas[0].wait_for_instance.called)
+        self.assertTrue(replicas[1].wait_for_instance.called)
+        mock_backup_delete.assert_called_once_with(self.context, 'test-id')
+
+    @patch.object(models.FreshInstanceTasks, 'load')
+    @patch.object(Backup, 'delete')
+    def test_snapshot_failed_create_replication_slave(self, mock_delete,
+                                                      mock_load):
+        mock_load.return_value.get_replication_master_snapshot = Mock(
+            side_effect=TroveError)
+        self.assertRaises(TroveError, self.manager.create_instance,
+                          self.context, ['id1', 'id2'], Mock(), Mock(),
+                          Mock(), None, None, 'mysql', 'mysql-server', 2,
+                          'temp-backup-id', None, 'some_password', None,
+                          Mock(), 'some-master-id', None)
+        self.assertEqual(1, mock_load.call_count)
+        self.assertFalse(mock_delete.called)
+
     @patch.object(models.FreshInstanceTasks, 'load')
     @patch.object(Backup, 'delete')
     def test_exception_create_replication_slave(self, mock_delete, mock_load):
@@ -257,6 +357,20 @@ class TestManager(trove_testtools.TestCase):
         mock_tasks.delete_cluster.assert_called_with(self.context,
                                                      'some-cluster-id')
 
+    @patch.object(utils.STATUS_WAITERS, 'notify')
+    def test_delete_cluster_instance_wakes_cluster(self, mock_notify):
+        mock_tasks = Mock(cluster_id='some-cluster-id')
+        with patch.object(models.BuiltInstanceTasks, 'load',
+                          return_value=mock_tasks):
+            self.manager.delete_instance(self.context, 'some-inst-id')
+        mock_tasks.delete_async.assert_called_with()
+        mock_notify.assert_called_once_with('some-cluster-id')
+
+    @patch.object(utils.STATUS_WAITERS, 'notify')
+    def test_notify_status_change(self, mock_notify):
+        self.manager.notify_status_change(self.context, 'some-inst-id')
+        mock_notify.assert_called_once_with('some-inst-id')
+
 
 class TestTaskManagerService(trove_testtools.TestCase):
     def test_app_factory(self):
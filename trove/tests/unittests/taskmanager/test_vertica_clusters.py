@@ -86,20 +86,21 @@ class VerticaClusterTasksTest(trove_testtools.TestCase):
                                          datastore_version=mock_dv1)
 
     @patch.object(ClusterTasks, 'update_statuses_on_failure')
-    @patch.object(InstanceServiceStatus, 'find_by')
+    @patch.object(InstanceServiceStatus, 'find_statuses')
     def test_all_instances_ready_bad_status(self,
                                             mock_find, mock_update):
-        (mock_find.return_value.
-         get_status.return_value) = ServiceStatuses.FAILED
+        mock_find.side_effect = lambda ids: dict(
+            (instance_id, ServiceStatuses.FAILED) for instance_id in ids)
         ret_val = self.clustertasks._all_instances_ready(["1", "2", "3", "4"],
                                                          self.cluster_id)
         mock_update.assert_called_with(self.cluster_id, None)
         self.assertFalse(ret_val)
 
-    @patch.object(InstanceServiceStatus, 'find_by')
+    @patch.object(InstanceServiceStatus, 'find_statuses')
     def test_all_instances_ready(self, mock_find):
-        (mock_find.return_value.
-         get_status.return_value) = ServiceStatuses.BUILD_PENDING
+        mock_find.side_effect = lambda ids: dict(
+            (instance_id, ServiceStatuses.BUILD_PENDING)
+            for instance_id in ids)
         ret_val = self.clustertasks._all_instances_ready(["1", "2", "3", "4"],
                                                          self.cluster_id)
         self.assertTrue(ret_val)